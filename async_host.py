@@ -0,0 +1,93 @@
+import asyncio
+
+from emulator import Emulator
+from output import AsyncSink
+from inputs import QueueInput, InputBlocked
+from loader.lalg_error import BudgetExceeded
+
+# instructions run between two yields to the event loop
+QUANTUM = 5000
+
+async def run_async(program, reader, writer, quantum=QUANTUM) -> Emulator:
+    ''' Runs a program on asyncio streams, reads await a line from the reader and
+    written values go to the writer. The event loop gets control back only while
+    waiting for input and once every quantum.
+
+    Parameters
+    ----------
+    program : Program
+        compiled program
+    reader : asyncio.StreamReader
+        where read values come from, any whitespace separates them
+    writer : asyncio.StreamWriter
+        where written values go
+    quantum : int
+        instructions run before yielding, checked on jumps back
+
+    Raises
+    ------
+    LalgError
+        if the program fails or reads after the reader ended
+    Exception
+        any other error of the program, e.g. ZeroDivisionError, after the values
+        written before it are sent
+
+    Returns
+    -------
+    Emulator
+        the finished run
+    '''
+    out = AsyncSink(writer)
+    inputs = QueueInput()
+    emulator = Emulator(program, out, inputs, budget=quantum)
+
+    while True:
+        emulator.budget = emulator.executed + quantum
+
+        try:
+            emulator.start()
+        except BudgetExceeded:
+            await out.drain()
+            await asyncio.sleep(0)
+        except InputBlocked:
+            # the output so far must be visible before waiting for the user
+            await out.drain()
+            line = await reader.readline()
+
+            if line:
+                inputs.feed(line.split())
+            else:
+                inputs.close()
+        except Exception:
+            await out.drain()
+            raise
+        else:
+            await out.drain()
+            return emulator
+
+async def serve(program, host='127.0.0.1', port=8023, quantum=QUANTUM) -> None:
+    ''' Serves a program over TCP, every connection gets its own run
+
+    Parameters
+    ----------
+    program : Program
+        compiled program
+    host : str
+        address to listen on
+    port : int
+        port to listen on
+    quantum : int
+        instructions run before yielding, checked on jumps back
+    '''
+    async def session(reader, writer):
+        try:
+            await run_async(program, reader, writer, quantum)
+        except Exception as error:
+            # runtime errors of the program, e.g. a division by zero, end only this session
+            writer.write(f'\nError: {error}\n'.encode('utf8'))
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(session, host, port)
+    async with server:
+        await server.serve_forever()
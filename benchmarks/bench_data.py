@@ -0,0 +1,119 @@
+''' Compares data segment layouts on a program declaring thousands of variables:
+the original dict, a list and a typed array
+
+Run from the repository root:
+
+    python3 benchmarks/bench_data.py [iterations] [variables]
+'''
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from harness import compile_program, execute
+from emulator import Emulator
+from fast import FastEmulator
+from threaded import ThreadedEmulator
+from tiered import TieredEmulator
+from runner import run
+
+# variables updated inside the loop, the bytes array only fits a few hundred statements
+TOUCHED = 100
+
+class DictEmulator(Emulator):
+    ''' Emulator keeping variables in a dict keyed by address, as it first did '''
+
+    def allocate(self, data_segment, instructions) -> object:
+        return {address: value for address, value in enumerate(data_segment) if value is not None}
+
+class ListEmulator(Emulator):
+    ''' Emulator always keeping variables in a list '''
+    TYPED_SEGMENT_SIZE = float('inf')
+
+class ArrayEmulator(Emulator):
+    ''' Emulator keeping variables in a typed array whenever the program allows it '''
+    TYPED_SEGMENT_SIZE = 0
+
+def source(variables) -> str:
+    ''' Generates a program declaring the variables and updating some of them in a loop '''
+    names = [f'v{index}' for index in range(variables)]
+    step = max(1, variables // TOUCHED)
+    touched = names[::step][:TOUCHED]
+    body = [f'{name} := {name} + i;' for name in touched]
+
+    return '\n'.join([
+        'program many;',
+        'var i, n: integer;',
+        f'var {", ".join(names)}: integer;',
+        'begin',
+        'read(n);',
+        'i := 0;',
+        'while i < n do',
+        'begin',
+        *body,
+        'i := i + 1;',
+        'end;',
+        f'write({touched[-1]});',
+        'end.',
+    ])
+
+def division_source(variables) -> str:
+    ''' Generates a program storing a division of literals into an integer variable,
+    the data segment must not be a typed integer array '''
+    names = [f'v{index}' for index in range(variables)]
+
+    return '\n'.join([
+        'program division;',
+        f'var {", ".join(names)}: integer;',
+        'begin',
+        'v0 := 7 / 2;',
+        'write(v0);',
+        'end.',
+    ])
+
+def check_division(variables) -> None:
+    ''' Runs division_source in every engine with a data segment, they must all
+    print the real the division gives '''
+    program = compile_source(division_source(variables))
+
+    for engine in (Emulator, FastEmulator, ThreadedEmulator, TieredEmulator):
+        output = run(program, engine=engine).getvalue()
+        if output != '3.5':
+            raise SystemExit(f'{engine.__name__} printed {output!r} for 7 / 2, expected 3.5')
+
+def compile_source(text) -> object:
+    ''' Parses a generated program into a Program '''
+    with tempfile.NamedTemporaryFile('w', suffix='.lalg', delete=False) as file:
+        file.write(text)
+
+    try:
+        return compile_program(file.name)
+    finally:
+        os.remove(file.name)
+
+def segment_size(emulator_class, program) -> int:
+    ''' Measures the bytes allocated by the data segment once every variable is set '''
+    emulator = emulator_class(program)
+    data_segment = program.data_segment
+    tracemalloc.start()
+    data_array = emulator.allocate(data_segment, [])
+
+    # distinct values, as a running program would leave behind
+    for address in range(len(data_segment)):
+        data_array[address] = address + 1000
+
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    variables = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    check_division(max(variables, Emulator.TYPED_SEGMENT_SIZE))
+    program = compile_source(source(variables))
+    print(f'{program.data_size} variables, {TOUCHED} updated per iteration, {iterations} iterations')
+
+    for name, emulator_class in [('dict', DictEmulator), ('list', ListEmulator), ('array', ArrayEmulator)]:
+        elapsed = min(execute(emulator_class, program, f'{iterations}\n')[0] for _ in range(3))
+        size = segment_size(emulator_class, program)
+        print(f'{name:<6} {elapsed * 1000:>10.2f} ms {size / program.data_size:>8.1f} bytes/variable')
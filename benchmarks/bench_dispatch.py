@@ -0,0 +1,99 @@
+''' Measures how many instructions per second the emulator executes on a while loop
+
+Run from the repository root:
+
+    python3 benchmarks/bench_dispatch.py [iterations]
+'''
+import os
+import sys
+import threading
+
+from harness import CountingEmulator, compile_program, execute
+from helper import byte_unpacker
+from constants import OPCODE, IMMEDIATE_OPCODES
+from emulator import Emulator
+from fast import FastEmulator
+from threaded import ThreadedEmulator
+from transpiler import PythonEmulator
+from tiered import TieredEmulator
+
+PROGRAM = os.path.join('benchmarks', 'while_loop.lalg')
+
+# handlers used by the recursive dispatch, as they were declared in Emulator.start
+LEGACY_HANDLERS = [
+    ('ADD', 'add'), ('CVR', 'cvr'), ('DIV', 'div'), ('DIVIDE', 'divide'), ('DUMP', 'dump'),
+    ('EQL', 'eql'), ('FADD', 'f_add'), ('FDIVIDE', 'f_divide'), ('FMULTIPLY', 'f_multiply'),
+    ('FSUB', 'f_sub'), ('GTE', 'gte'), ('GTR', 'gtr'), ('HALT', 'halt'), ('JFALSE', 'jfalse'),
+    ('JMP', 'jmp'), ('LES', 'les'), ('LTE', 'lte'), ('MULTIPLY', 'multiply'), ('NEQ', 'neq'),
+    ('NEW_LINE', 'print_new_line'), ('POP_CHAR', 'pop_char'), ('POP_REAL_LIT', 'pop_real_lit'),
+    ('POP', 'pop'), ('PRINT_C', 'print_c'), ('PRINT_I', 'print_i'), ('PRINT_ILIT', 'print_ilit'),
+    ('PRINT_R', 'print_r'), ('PRINT_STR_LIT', 'print_str_lit'), ('PUSH_CHAR', 'push_char'),
+    ('PUSH', 'push'), ('PUSHI', 'pushi'), ('RET_AND_PRINT', 'ret_and_print'),
+    ('RETRIEVE', 'retrieve'), ('SUB', 'sub'), ('XCHG', 'xchg'), ('READ_INT', 'read_int'),
+    ('READ_REAL', 'read_real'),
+]
+
+class RecursiveEmulator(Emulator):
+    ''' Emulator using the first dispatch: one recursive call, one new dict and one
+    immediate decoding per instruction '''
+
+    def start(self) -> None:
+        operations = {OPCODE[name]: getattr(self, method) for name, method in LEGACY_HANDLERS}
+        op = self.bytes[self.ip]
+        self.ip += 1
+        operand = None
+
+        if op in IMMEDIATE_OPCODES:
+            operand = byte_unpacker(bytearray(self.bytes[self.ip:self.ip + 4]))
+            self.ip += 4
+
+        operations[op](operand)
+
+        if op != OPCODE['HALT']:
+            self.start()
+
+class ByteLoopEmulator(Emulator):
+    ''' Emulator using a flat loop over the raw bytes, decoding immediates while running '''
+
+    def start(self) -> None:
+        code = self.bytes
+        operations = self.operations
+
+        while True:
+            op = code[self.ip]
+            self.ip += 1
+            operand = None
+
+            if op in IMMEDIATE_OPCODES:
+                operand = byte_unpacker(bytearray(code[self.ip:self.ip + 4]))
+                self.ip += 4
+
+            operations[op](operand)
+
+def report(name, emulator_class, program, iterations) -> None:
+    ''' Prints instructions per second for one emulator class '''
+    _, counter = execute(CountingEmulator, program, f'{iterations}\n')
+    elapsed, _ = execute(emulator_class, program, f'{iterations}\n')
+    print(f'{name:<12} {iterations:>10} iterations {counter.executed:>11} instructions '
+          f'{counter.executed / elapsed:>14,.0f} instructions/s')
+
+def report_recursive(program, iterations) -> None:
+    ''' Runs the recursive dispatch in a thread with a stack large enough for it '''
+    sys.setrecursionlimit(10 * 1000 * 1000)
+    threading.stack_size(512 * 1024 * 1024)
+    thread = threading.Thread(target=report, args=('recursive', RecursiveEmulator, program, iterations))
+    thread.start()
+    thread.join()
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    program = compile_program(PROGRAM)
+
+    # the recursive dispatch needs one frame per instruction, so it only runs short loops
+    report_recursive(program, min(iterations, 5000))
+    report('byte loop', ByteLoopEmulator, program, iterations)
+    report('predecoded', Emulator, program, iterations)
+    report('verified', FastEmulator, program, iterations)
+    report('threaded', ThreadedEmulator, program, iterations)
+    report('tiered', TieredEmulator, program, iterations)
+    report('python', PythonEmulator, program, iterations)
@@ -0,0 +1,44 @@
+''' Compares programs before and after optimizer.optimize on the example programs,
+counting instructions in the bytecode and executed instructions and measuring wall
+time
+
+Run from the repository root:
+
+    python3 benchmarks/bench_peephole.py [iterations]
+'''
+import glob
+import os
+import sys
+
+from harness import CountingEmulator, compile_program, execute
+from optimizer import optimize
+from emulator import Emulator
+from loader.lalg_error import LalgError
+
+def programs() -> list:
+    ''' Gets every program used by the benchmark '''
+    return sorted(glob.glob(os.path.join('examples', '*.lalg'))) + \
+        sorted(glob.glob(os.path.join('benchmarks', '*.lalg')))
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f'{"program":<30} {"size":>6} {"-O1 size":>9} {"executed":>10} {"-O1 executed":>13} '
+          f'{"ms":>8} {"-O1 ms":>8}')
+
+    for path in programs():
+        try:
+            program = compile_program(path)
+        except LalgError as e:
+            print(f'{path:<30} does not compile: {e}')
+            continue
+
+        optimized = optimize(program)
+
+        # every program reads integers, the benchmark loop reads its iteration count
+        user_input = f'{iterations}\n' * 8
+        _, before = execute(CountingEmulator, program, user_input)
+        _, after = execute(CountingEmulator, optimized, user_input)
+        before_time = min(execute(Emulator, program, user_input)[0] for _ in range(3))
+        after_time = min(execute(Emulator, optimized, user_input)[0] for _ in range(3))
+        print(f'{path:<30} {len(program.instructions):>6} {len(optimized.instructions):>9} '
+              f'{before.executed:>10} {after.executed:>13} {before_time * 1000:>8.2f} {after_time * 1000:>8.2f}')
@@ -0,0 +1,52 @@
+''' Compares the stack Emulator with the RegisterVM on the example programs, counting
+executed instructions and measuring wall time
+
+Run from the repository root:
+
+    python3 benchmarks/bench_register.py [iterations]
+'''
+import glob
+import os
+import sys
+
+from harness import CountingEmulator, compile_program, execute
+from register_vm import RegisterVM
+from emulator import Emulator
+from loader.lalg_error import LalgError
+
+class CountingRegisterVM(RegisterVM):
+    ''' RegisterVM that also counts how many instructions are executed '''
+
+    def start(self) -> None:
+        self.executed = 0
+
+        while True:
+            handler, a, b, c = self.code[self.ip]
+            self.ip += 1
+            self.executed += 1
+            handler(a, b, c)
+
+def programs() -> list:
+    ''' Gets every program used by the benchmark '''
+    return sorted(glob.glob(os.path.join('examples', '*.lalg'))) + \
+        sorted(glob.glob(os.path.join('benchmarks', '*.lalg')))
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f'{"program":<30} {"stack instr":>12} {"register instr":>15} {"stack ms":>10} {"register ms":>12}')
+
+    for path in programs():
+        try:
+            program = compile_program(path)
+        except LalgError as e:
+            print(f'{path:<30} does not compile: {e}')
+            continue
+
+        # every program reads integers, the benchmark loop reads its iteration count
+        user_input = f'{iterations}\n' * 8
+        _, stack = execute(CountingEmulator, program, user_input)
+        _, register = execute(CountingRegisterVM, program, user_input)
+        stack_time, _ = execute(Emulator, program, user_input)
+        register_time, _ = execute(RegisterVM, program, user_input)
+        print(f'{path:<30} {stack.executed:>12} {register.executed:>15} '
+              f'{stack_time * 1000:>10.2f} {register_time * 1000:>12.2f}')
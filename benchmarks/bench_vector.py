@@ -0,0 +1,39 @@
+''' Compares running a program once per input in the Emulator with running all of the
+inputs together in the VectorEmulator, with the same and with scattered loop counts
+
+Run from the repository root, needs numpy:
+
+    python3 benchmarks/bench_vector.py [lanes] [iterations]
+'''
+import sys
+import time
+import random
+
+from harness import compile_program, execute
+from emulator import Emulator
+from vector import VectorEmulator
+from inputs import ListInput
+
+PROGRAM = 'benchmarks/while_loop.lalg'
+
+def vector_time(program, vectors) -> tuple:
+    ''' Runs every input vector in one VectorEmulator, returning the elapsed seconds
+    and the emulator used '''
+    emulator = VectorEmulator(program, [ListInput(values) for values in vectors])
+    begin = time.perf_counter()
+    emulator.start()
+    return time.perf_counter() - begin, emulator
+
+if __name__ == '__main__':
+    lanes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    program = compile_program(PROGRAM)
+    print(f'{PROGRAM}, {lanes} lanes')
+
+    for name, counts in [('same', [iterations] * lanes),
+                         ('scattered', [random.randint(0, 2 * iterations) for _ in range(lanes)])]:
+        vectors = [[str(count)] for count in counts]
+        scalar = sum(execute(Emulator, program, values[0])[0] for values in vectors)
+        vector, emulator = vector_time(program, vectors)
+        print(f'{name:<10} emulator {scalar * 1000:>10.2f} ms  vector {vector * 1000:>10.2f} ms  '
+              f'{emulator.steps} vector steps, {emulator.scalar_lanes} lanes run alone')
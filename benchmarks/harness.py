@@ -0,0 +1,64 @@
+''' Helpers shared by the benchmarks, they must run from the repository root '''
+import io
+import os
+import sys
+import time
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from parse import Parser
+from emulator import Emulator, Halted
+from output import NullSink
+from inputs import ListInput
+from tokenizer import get_token
+from loader.lalg_file import LalgFile
+
+class CountingEmulator(Emulator):
+    ''' Emulator that also counts how many instructions are executed '''
+
+    def start(self) -> None:
+        self.executed = 0
+
+        while True:
+            handler, operand = self.code[self.ip]
+            self.ip += 1
+            self.executed += 1
+            handler(operand)
+
+def compile_program(path) -> object:
+    ''' Tokenizes and parses a lalg file into a Program '''
+    parser = Parser(tokens=get_token(LalgFile(input_file=path)))
+    parser.parse()
+    return parser.program()
+
+def execute(emulator_class, program, user_input) -> object:
+    ''' Runs the program once, hiding its output
+
+    Parameters
+    ----------
+    emulator_class : class
+        engine used to run the program
+    program : Program
+        compiled program
+    user_input : str
+        text read by the program
+
+    Returns
+    -------
+    tuple
+        elapsed seconds and the emulator used
+    '''
+    emulator = emulator_class(program, NullSink(), ListInput(user_input.split()))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        begin = time.perf_counter()
+        try:
+            emulator.start()
+        except Halted:
+            pass
+        elapsed = time.perf_counter() - begin
+
+    return elapsed, emulator
@@ -49,5 +49,134 @@ OPCODE = {
     'SUB': 38,
     'XCHG': 39,
     'READ_INT': 40,
-    'READ_REAL': 41
-}
\ No newline at end of file
+    'READ_REAL': 41,
+    'MOV': 42,
+    'PUSH_CONST': 43,
+    'PRINT_STR': 44,
+    'VLOOP': 45,
+    'CALL': 46,
+    'RET': 47,
+    'PUSH_LOCAL': 48,
+    'POP_LOCAL': 49,
+    'PRINT_LOCAL': 50,
+    'READ_INT_LOCAL': 51,
+    'READ_REAL_LOCAL': 52
+}
+
+# op codes followed by a 4 bytes immediate (address, value or jump target)
+IMMEDIATE_OPCODES = {
+    OPCODE['JFALSE'],
+    OPCODE['JMP'],
+    OPCODE['JTRUE'],
+    OPCODE['POP'],
+    OPCODE['POP_CHAR'],
+    OPCODE['POP_REAL_LIT'],
+    OPCODE['PRINT_C'],
+    OPCODE['PRINT_I'],
+    OPCODE['PRINT_ILIT'],
+    OPCODE['PRINT_R'],
+    OPCODE['PRINT_STR'],
+    OPCODE['PUSH'],
+    OPCODE['PUSH_CHAR'],
+    OPCODE['PUSHI'],
+    OPCODE['PUSH_CONST'],
+    OPCODE['READ_INT'],
+    OPCODE['READ_REAL'],
+    OPCODE['VLOOP'],
+    OPCODE['CALL'],
+    OPCODE['PUSH_LOCAL'],
+    OPCODE['POP_LOCAL'],
+    OPCODE['PRINT_LOCAL'],
+    OPCODE['READ_INT_LOCAL'],
+    OPCODE['READ_REAL_LOCAL'],
+}
+
+# op codes whose immediate is an address in the bytes array
+JUMP_OPCODES = {
+    OPCODE['JFALSE'],
+    OPCODE['JMP'],
+    OPCODE['JTRUE'],
+}
+
+# op codes whose immediate is an address in the data segment
+ADDRESS_OPCODES = {
+    OPCODE['POP'],
+    OPCODE['POP_CHAR'],
+    OPCODE['POP_REAL_LIT'],
+    OPCODE['PRINT_C'],
+    OPCODE['PRINT_I'],
+    OPCODE['PRINT_R'],
+    OPCODE['PUSH'],
+    OPCODE['READ_INT'],
+    OPCODE['READ_REAL'],
+}
+
+# op codes for procedure parameters and locals, their immediate is a slot in the
+# frame of the running call
+FRAME_OPCODES = {
+    OPCODE['PUSH']: OPCODE['PUSH_LOCAL'],
+    OPCODE['POP']: OPCODE['POP_LOCAL'],
+    OPCODE['POP_CHAR']: OPCODE['POP_LOCAL'],
+    OPCODE['PRINT_C']: OPCODE['PRINT_LOCAL'],
+    OPCODE['PRINT_I']: OPCODE['PRINT_LOCAL'],
+    OPCODE['PRINT_R']: OPCODE['PRINT_LOCAL'],
+    OPCODE['READ_INT']: OPCODE['READ_INT_LOCAL'],
+    OPCODE['READ_REAL']: OPCODE['READ_REAL_LOCAL'],
+}
+
+# values each op code pops from and pushes to the stack
+STACK_EFFECTS = {
+    OPCODE['ADD']: (2, 1),
+    OPCODE['CVR']: (1, 1),
+    OPCODE['DIV']: (2, 1),
+    OPCODE['DIVIDE']: (2, 1),
+    OPCODE['DUMP']: (2, 0),
+    OPCODE['DUP']: (1, 2),
+    OPCODE['EQL']: (2, 1),
+    OPCODE['FADD']: (2, 1),
+    OPCODE['FDIVIDE']: (2, 1),
+    OPCODE['FMULTIPLY']: (2, 1),
+    OPCODE['FSUB']: (2, 1),
+    OPCODE['GTE']: (2, 1),
+    OPCODE['GTR']: (2, 1),
+    OPCODE['HALT']: (0, 0),
+    OPCODE['JFALSE']: (1, 0),
+    OPCODE['JMP']: (0, 0),
+    OPCODE['JTRUE']: (1, 0),
+    OPCODE['LES']: (2, 1),
+    OPCODE['LTE']: (2, 1),
+    OPCODE['MULTIPLY']: (2, 1),
+    OPCODE['NEQ']: (2, 1),
+    OPCODE['NEW_LINE']: (0, 0),
+    OPCODE['NOT']: (1, 1),
+    OPCODE['OR']: (2, 1),
+    OPCODE['POP']: (1, 0),
+    OPCODE['POP_CHAR']: (1, 0),
+    OPCODE['POP_REAL_LIT']: (1, 0),
+    OPCODE['PRINT_B']: (0, 0),
+    OPCODE['PRINT_C']: (0, 0),
+    OPCODE['PRINT_I']: (0, 0),
+    OPCODE['PRINT_ILIT']: (0, 0),
+    OPCODE['PRINT_R']: (0, 0),
+    OPCODE['PRINT_STR_LIT']: (1, 0),
+    OPCODE['PRINT_STR']: (0, 0),
+    OPCODE['PUSH']: (0, 1),
+    OPCODE['PUSH_CHAR']: (0, 1),
+    OPCODE['PUSHI']: (0, 1),
+    OPCODE['PUSH_CONST']: (0, 1),
+    OPCODE['RET_AND_PRINT']: (1, 0),
+    OPCODE['RETRIEVE']: (1, 1),
+    OPCODE['SUB']: (2, 1),
+    OPCODE['XCHG']: (2, 2),
+    OPCODE['READ_INT']: (0, 0),
+    OPCODE['READ_REAL']: (0, 0),
+    OPCODE['VLOOP']: (0, 0),
+    # pops the arguments of the procedure, see decoder.stack_depths
+    OPCODE['CALL']: (0, 0),
+    OPCODE['RET']: (0, 0),
+    OPCODE['PUSH_LOCAL']: (0, 1),
+    OPCODE['POP_LOCAL']: (1, 0),
+    OPCODE['PRINT_LOCAL']: (0, 0),
+    OPCODE['READ_INT_LOCAL']: (0, 0),
+    OPCODE['READ_REAL_LOCAL']: (0, 0),
+}
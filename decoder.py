@@ -0,0 +1,213 @@
+from helper import *
+from constants import *
+from loader.lalg_error import LalgError
+
+def decode(byte_array, constants=None, strings=None, loops=None, procedures=None) -> list:
+    ''' Decodes the bytes generated by the Parser into a list of instructions.
+
+    Immediates are unpacked once, jump targets are remapped from byte addresses
+    to instruction indexes, literal strings are rebuilt and constant and string
+    pool indexes are replaced by their values, as are counted loop and procedure
+    indexes, so executing an instruction never
+    has to read raw bytes again. Jumps to the next instruction, such as the one
+    left before a for loop that was not vectorized, are dropped. Decoding stops at
+    HALT.
+
+    Parameters
+    ----------
+    byte_array : bytearray
+        bytes generated by the Parser
+    constants : list or None
+        real constant pool generated by the Parser
+    strings : list or None
+        string pool generated by the Parser
+    loops : list or None
+        counted loops found by the Parser, see vectorize
+    procedures : list or None
+        procedures declared in the program, see procedures
+
+    Raises
+    ------
+    LalgError
+        if there is no HALT
+        if a jump target is not the beginning of an instruction
+        if a constant is not in the constant pool
+        if a string is not in the string pool
+        if a counted loop is not in the loop pool or does not exit at an instruction
+        if a procedure is not in the procedure pool or does not start at an instruction
+
+    Returns
+    -------
+    list
+        (op code, operand) pairs, operand is None for op codes without immediate
+    '''
+    instructions = []
+    index_of = {}
+    last_immediate = 0
+    ip = 0
+
+    while ip < len(byte_array):
+        op = byte_array[ip]
+        index_of[ip] = len(instructions)
+        ip += 1
+        operand = None
+
+        if op in IMMEDIATE_OPCODES:
+            operand = byte_unpacker(byte_array[ip:ip + 4])
+            last_immediate = operand
+            ip += 4
+
+            if op == OPCODE['PUSH_CONST']:
+                if constants is None or operand >= len(constants):
+                    raise LalgError(f'Constant {operand} is not in the constant pool')
+
+                operand = constants[operand]
+            elif op == OPCODE['PRINT_STR']:
+                if strings is None or operand >= len(strings):
+                    raise LalgError(f'String {operand} is not in the string pool')
+
+                operand = strings[operand]
+            elif op == OPCODE['VLOOP']:
+                if loops is None or operand >= len(loops):
+                    raise LalgError(f'Loop {operand} is not in the loop pool')
+
+                operand = loops[operand]
+            elif op == OPCODE['CALL']:
+                if procedures is None or operand >= len(procedures):
+                    raise LalgError(f'Procedure {operand} is not in the procedure pool')
+
+                operand = procedures[operand]
+        elif op == OPCODE['PRINT_STR_LIT']:
+            # the string length is the immediate pushed right before it
+            operand = bytes(byte_array[ip:ip + last_immediate]).decode('utf8')
+            ip += last_immediate
+
+        # anything jumping to it lands on the next instruction, which gets its index
+        if op == OPCODE['JMP'] and operand == ip:
+            continue
+
+        instructions.append((op, operand))
+
+        if op == OPCODE['HALT']:
+            break
+    else:
+        raise LalgError('Program does not end with HALT')
+
+    # remaps jump targets to instruction indexes, every call of a procedure shares
+    # one relocated copy
+    relocated = {}
+    for index, (op, operand) in enumerate(instructions):
+        if op in JUMP_OPCODES:
+            if operand not in index_of:
+                raise LalgError(f'Jump target {operand} is not the beginning of an instruction')
+
+            instructions[index] = (op, index_of[operand])
+        elif op == OPCODE['VLOOP']:
+            if operand.exit not in index_of:
+                raise LalgError(f'Loop exit {operand.exit} is not the beginning of an instruction')
+
+            instructions[index] = (op, operand.relocated(index_of[operand.exit]))
+        elif op == OPCODE['CALL']:
+            if operand.entry not in index_of or operand.end not in index_of:
+                raise LalgError(f'Procedure {operand.name} does not start at an instruction')
+
+            if operand.name not in relocated:
+                relocated[operand.name] = operand.relocated(index_of[operand.entry], index_of[operand.end])
+
+            instructions[index] = (op, relocated[operand.name])
+
+    return instructions
+
+def stack_depths(instructions) -> list:
+    ''' Computes the stack depth each decoded instruction starts with, following
+    every path through the jumps.
+
+    Every instruction must be reached with the same stack depth from all of its
+    predecessors. Op codes without a known stack effect end the path, they fail
+    when executed. A call pops the arguments of its procedure and must leave the
+    stack empty, so procedure bodies always start at depth 0.
+
+    Parameters
+    ----------
+    instructions : list
+        (op code, operand) pairs generated by decode
+
+    Raises
+    ------
+    LalgError
+        if an instruction pops more values than the stack holds
+        if an instruction is reached with different stack depths
+        if a call leaves values on the stack
+
+    Returns
+    -------
+    list
+        depth before each instruction, None for instructions never reached
+    '''
+    depths = [None] * len(instructions)
+    pending = [(0, 0)]
+
+    while pending:
+        index, depth = pending.pop()
+
+        while depths[index] is None:
+            depths[index] = depth
+            op, operand = instructions[index]
+
+            if op not in STACK_EFFECTS:
+                break
+
+            pops, pushes = STACK_EFFECTS[op]
+            if op == OPCODE['CALL']:
+                pops = operand.params
+                if depth != pops:
+                    raise LalgError(f'Call at instruction {index} leaves values on the stack')
+
+                pending.append((operand.entry, 0))
+
+            if depth < pops:
+                raise LalgError(f'Stack underflow at instruction {index}')
+
+            depth += pushes - pops
+
+            if op == OPCODE['HALT'] or op == OPCODE['RET']:
+                break
+            elif op == OPCODE['JMP']:
+                index = operand
+            else:
+                if op in JUMP_OPCODES:
+                    pending.append((operand, depth))
+                index += 1
+
+        if depths[index] != depth:
+            raise LalgError(f'Stack depth at instruction {index} is both {depths[index]} and {depth}')
+
+    return depths
+
+def max_stack_depth(instructions) -> int:
+    ''' Computes the largest number of values the stack holds while running the
+    decoded instructions
+
+    Parameters
+    ----------
+    instructions : list
+        (op code, operand) pairs generated by decode
+
+    Raises
+    ------
+    LalgError
+        if the stack depths are not consistent, see stack_depths
+
+    Returns
+    -------
+    int
+        maximum stack depth
+    '''
+    max_depth = 0
+
+    for (op, _), depth in zip(instructions, stack_depths(instructions)):
+        if depth is not None and op in STACK_EFFECTS:
+            pops, pushes = STACK_EFFECTS[op]
+            max_depth = max(max_depth, depth + pushes - pops)
+
+    return max_depth
@@ -1,37 +1,126 @@
+import time
+import zlib
+import struct
+import marshal
+from array import array
+
 from helper import *
 from constants import *
-from loader.lalg_error import LalgError
+from output import BufferedSink
+from inputs import ConsoleInput, InputBlocked
+from loader.lalg_error import LalgError, BudgetExceeded, DeadlineExceeded
+
+# checkpoint header: magic, format version and crc32 of the program bytes
+CHECKPOINT_MAGIC = b'LALGSNAP'
+CHECKPOINT_VERSION = 2
+CHECKPOINT_HEADER = struct.Struct('>8sBI')
+
+# op codes that may store something other than an integer into an integer variable
+NON_INTEGER_OPCODES = {OPCODE['DIV'], OPCODE['DIVIDE'], OPCODE['POP_CHAR']}
+
+class Halted(Exception):
+    ''' Raised by HALT to leave the dispatch loop, the program finished normally '''
+    pass
 
 class Emulator(object):
     ''' Emulator Class - uses bytes generated from tokens to execute code '''
+    # typed arrays box every value read, so they only pay off for large data segments
+    TYPED_SEGMENT_SIZE = 1024
+    # slots preallocated for procedure frames, two per call plus its parameters and locals
+    FRAME_STACK_SIZE = 1 << 16
+
+    # engines whose start runs the limited loop when a budget or deadline is set
+    SUPPORTS_LIMITS = True
+    # engines keeping all of their run state in ip, sp, stack and data_array
+    SUPPORTS_CHECKPOINTS = True
+
+    def __init__(self, program, out=None, inputs=None, budget=None, deadline=None) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        program : Program
+            compiled program, shared by every run
+        out : sink or None
+            where written values go, a BufferedSink over stdout if None
+        inputs : input provider or None
+            where read values come from, the console if None
+        budget : int or None
+            most instructions the run may execute, unlimited if None
+        deadline : float or None
+            time.monotonic() value the run must finish by, unlimited if None
 
-    def __init__(self, bytes) -> None:
-        ''' Initializes artibutes '''
-        self.data_array = {}
-        self.stack = []
-        self.bytes = bytes
-        self.out = []
+        Raises
+        ------
+        LalgError
+            if a limit is set and the engine can not enforce it
+        '''
+        self.limited = budget is not None or deadline is not None
+        if self.limited and not self.SUPPORTS_LIMITS:
+            raise LalgError(f'{type(self).__name__} does not support budgets or deadlines')
+
+        self.budget = budget
+        self.deadline = deadline
+        self.executed = 0
+        self.program = program
+        self.bytes = program.bytecode
+        self.out = BufferedSink() if out is None else out
+        self.inputs = ConsoleInput() if inputs is None else inputs
         self.ip = 0
-        self.pointer = 0
+        self.operations = self.build_operations()
+
+        # fixed size stack, sp is the index of the first free slot
+        self.stack_size = program.stack_size
+        self.stack = [None] * self.stack_size
+        self.sp = 0
+        self.data_array = self.allocate(program.data_segment, program.instructions)
+
+        # frames are pushed from fp, top is the first free slot after the last frame
+        self.frames = [None] * self.FRAME_STACK_SIZE if program.procedures else []
+        self.fp = 0
+        self.top = 0
+        self.code = self.load(program.instructions)
+
+    def allocate(self, data_segment, instructions) -> object:
+        ''' Preallocates the data segment, indexed directly by variable address
+
+        Parameters
+        ----------
+        data_segment : tuple
+            initial value of each slot, None for slots that are not variables
+        instructions : tuple
+            (op code, operand) pairs generated by decoder.decode
+
+        Returns
+        -------
+        array or list
+            a typed array for large int-only and real-only programs, a list otherwise
+        '''
+        if len(data_segment) >= self.TYPED_SEGMENT_SIZE:
+            kinds = {type(value) for value in data_segment if value is not None}
+            ops = {op for op, _ in instructions}
+
+            if kinds == {float}:
+                return array('d', [0.0 if value is None else value for value in data_segment])
+
+            if kinds == {int} and not ops & NON_INTEGER_OPCODES:
+                return array('q', [0 if value is None else value for value in data_segment])
+
+        return [0 if value is None else value for value in data_segment]
 
     def flush(self) -> None:
-        ''' Prints generated output '''
-        print('Flushing...')
+        ''' Sends the output still pending in the sink '''
+        self.out.flush()
 
-        for item in self.out:
-            print(item, end='')
-        
-        print()
+    def build_operations(self) -> list:
+        ''' Builds the handler table, indexed by operation code
 
-    def start(self):
-        ''' For each operation code, executes its respective function 
-        
-        Raises
-        ------
-        LalgError
-            if operation is not defined
+        Returns
+        -------
+        list
+            handler for each possible operation code, None if it is not supported
         '''
-        operations = {
+        handlers = {
             OPCODE['ADD']: self.add,
             OPCODE['CVR']: self.cvr,
             OPCODE['DIV']: self.div,
@@ -59,342 +148,594 @@ class Emulator(object):
             OPCODE['PRINT_I']: self.print_i,
             OPCODE['PRINT_ILIT']: self.print_ilit,
             OPCODE['PRINT_R']: self.print_r,
-            OPCODE['PRINT_STR_LIT']: self.print_str_lit, 
+            OPCODE['PRINT_STR_LIT']: self.print_str_lit,
+            OPCODE['PRINT_STR']: self.print_ilit,
             OPCODE['PUSH_CHAR']: self.push_char,
             OPCODE['PUSH']: self.push,
             OPCODE['PUSHI']: self.pushi,
+            OPCODE['PUSH_CONST']: self.pushi,
             OPCODE['RET_AND_PRINT']: self.ret_and_print,
             OPCODE['RETRIEVE']: self.retrieve,
             OPCODE['SUB']: self.sub,
             OPCODE['XCHG']: self.xchg,
             OPCODE['READ_INT']: self.read_int,
             OPCODE['READ_REAL']: self.read_real,
+            OPCODE['VLOOP']: self.vloop,
+            OPCODE['CALL']: self.call,
+            OPCODE['RET']: self.ret,
+            OPCODE['PUSH_LOCAL']: self.push_local,
+            OPCODE['POP_LOCAL']: self.pop_local,
+            OPCODE['PRINT_LOCAL']: self.print_local,
+            OPCODE['READ_INT_LOCAL']: self.read_int_local,
+            OPCODE['READ_REAL_LOCAL']: self.read_real_local,
         }
 
-        op = self.bytes[self.ip]
-        
-        if op in operations:
-            operations[op]()
+        # one slot per possible byte, so any op code can be used as an index
+        operations = [None] * 256
+        for op, handler in handlers.items():
+            operations[op] = handler
 
-            # if operation is not the last one, recursive call start function
-            if op != OPCODE['HALT']:
-                self.start()
-        else:
-            raise LalgError(f'Operation {op} is not supported')
+        return operations
 
-    def pushi(self) -> None:
-        ''' Pushes integer to stack '''
-        self.ip += 1
-        self.stack.append(self.immediate_value())
+    def load(self, instructions) -> list:
+        ''' Binds each decoded instruction to its handler
 
-    def immediate_value(self) -> object:
-        ''' Generates value from bytes
-        
-        Returns 
+        Parameters
+        ----------
+        instructions : list
+            (op code, operand) pairs generated by decoder.decode
+
+        Returns
         -------
-        number
-            number (int or float) generated from the bytes or variable position
+        list
+            (handler, operand) pairs, executed by start
+        '''
+        code = []
+
+        for op, operand in instructions:
+            handler = self.operations[op]
+
+            # fails only if the instruction is actually executed
+            if handler is None:
+                code.append((self.unsupported, op))
+            else:
+                code.append((handler, operand))
+
+        # limits are checked on jumps back only, a run without loops always ends
+        if self.limited:
+            for index, (op, target) in enumerate(instructions):
+                if op == OPCODE['JMP'] and target <= index:
+                    code[index] = (self.limited_jmp, target)
+                elif op == OPCODE['JFALSE'] and target <= index:
+                    code[index] = (self.limited_jfalse, target)
+
+        return code
+
+    def start(self) -> None:
+        ''' For each instruction, executes its respective function until HALT
+
+        Raises
+        ------
+        BudgetExceeded
+            if the run executes more instructions than its budget
+        DeadlineExceeded
+            if the run is still going once its deadline passes
+        InputBlocked
+            if a read has no value yet, start continues from that read
+        LalgError
+            if an integer does not fit the data segment
         '''
-        
-        immediate = bytearray()
+        try:
+            if self.limited:
+                self.dispatch_limited()
+            else:
+                self.dispatch()
+        except Halted:
+            self.flush()
+        except InputBlocked:
+            # nothing was changed by the read, it is retried once there is input
+            self.ip -= 1
+            if self.limited:
+                self.executed -= 1
+            raise
+        except OverflowError:
+            # only integer arrays are bounded, Python ints never overflow
+            raise LalgError(f'Integer overflow at instruction {self.ip - 1}')
+
+    def dispatch(self) -> None:
+        ''' Executes instructions until one of them raises '''
+        code = self.code
+
+        while True:
+            handler, operand = code[self.ip]
+            self.ip += 1
+            handler(operand)
 
-        for i in range(4):
-            immediate.append(self.bytes[self.ip])
+    def dispatch_limited(self) -> None:
+        ''' Executes instructions until one of them raises, counting each one so the
+        jumps back can check the limits '''
+        code = self.code
+
+        while True:
+            handler, operand = code[self.ip]
             self.ip += 1
-        
-        return byte_unpacker(immediate)
+            self.executed += 1
+            handler(operand)
+
+    def check_limits(self) -> None:
+        ''' Stops the run if it went over its budget or past its deadline
+
+        Raises
+        ------
+        BudgetExceeded
+            if more instructions than the budget were executed
+        DeadlineExceeded
+            if the deadline passed
+        '''
+        if self.budget is not None and self.executed > self.budget:
+            raise BudgetExceeded('Instruction budget exceeded', self.executed, self.ip)
+
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise DeadlineExceeded('Deadline exceeded', self.executed, self.ip)
+
+    def limited_jmp(self, target) -> None:
+        ''' Jumps back to position, then checks the limits '''
+        # the jump is done first, a stopped run resumes at the start of the loop
+        self.ip = target
+        self.check_limits()
+
+    def limited_jfalse(self, target) -> None:
+        ''' Jumps back if false, then checks the limits '''
+        self.sp -= 1
+        if not self.stack[self.sp]:
+            self.ip = target
+            self.check_limits()
+
+    def checkpoint(self) -> bytes:
+        ''' Saves the state of a stopped run, e.g. after a LimitExceeded. Pending
+        output is flushed first, values still kept by the sink are saved.
+
+        Raises
+        ------
+        LalgError
+            if the engine does not keep its state where it can be saved
+
+        Returns
+        -------
+        bytes
+            snapshot, restore continues the run from it
+        '''
+        if not self.SUPPORTS_CHECKPOINTS:
+            raise LalgError(f'{type(self).__name__} does not support checkpoints')
+
+        self.flush()
+        data = self.data_array
 
-    def immediate_data(self) -> object:
+        # typed arrays are saved as their raw bytes
+        if isinstance(data, array):
+            segment = (data.typecode, data.tobytes())
+        else:
+            segment = ('', list(data))
+
+        state = (type(self).__name__, self.ip, self.executed, self.stack[:self.sp], segment,
+                 self.frames[:self.top], self.fp, self.out.unsent(), self.inputs.position)
+        header = CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, zlib.crc32(self.bytes))
+        return header + marshal.dumps(state)
+
+    def restore(self, snapshot) -> None:
+        ''' Loads the state saved by checkpoint, start then continues the run. The
+        emulator must be new, built from the same program, with input that starts
+        where the checkpointed run's input started.
+
+        Parameters
+        ----------
+        snapshot : bytes
+            generated by checkpoint
+
+        Raises
+        ------
+        LalgError
+            if the snapshot is invalid
+            if it was taken by another engine or for another program
+        '''
+        if not self.SUPPORTS_CHECKPOINTS:
+            raise LalgError(f'{type(self).__name__} does not support checkpoints')
+
+        try:
+            magic, version, crc = CHECKPOINT_HEADER.unpack_from(snapshot)
+            state = marshal.loads(snapshot[CHECKPOINT_HEADER.size:])
+        except (struct.error, EOFError, ValueError, TypeError):
+            raise LalgError('Invalid checkpoint')
+
+        if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+            raise LalgError('Invalid checkpoint')
+        if crc != zlib.crc32(self.bytes):
+            raise LalgError('Checkpoint was taken for another program')
+
+        engine, ip, executed, stack, (typecode, data), frames, fp, unsent, position = state
+        if engine != type(self).__name__:
+            raise LalgError(f'Checkpoint was taken by {engine}')
+
+        self.ip = ip
+        self.executed = executed
+        self.stack[:len(stack)] = stack
+        self.sp = len(stack)
+        self.data_array = array(typecode, data) if typecode else data
+        self.frames[:len(frames)] = frames
+        self.fp = fp
+        self.top = len(frames)
+
+        for item in unsent:
+            self.out.append(item)
+
+        self.inputs.skip(position)
+
+    def unsupported(self, op) -> None:
+        ''' Handler for op codes the emulator does not implement
+
+        Raises
+        ------
+        LalgError
+            always
+        '''
+        raise LalgError(f'Operation {op} is not supported')
+
+    def pushi(self, value) -> None:
+        ''' Pushes integer to stack '''
+        self.stack[self.sp] = value
+        self.sp += 1
+
+    def immediate_data(self, address) -> object:
         ''' Generates value from variable
-        
-        Returns 
+
+        Returns
         -------
         object
-            value of a given variable
+            value of a given variable, 0 if it was never assigned
         '''
-        imm = self.immediate_value()
-        if imm not in self.data_array:
-            self.halt()
-
-        return self.data_array[imm]
+        return self.data_array[address]
 
-    def pop(self) -> object:
+    def pop(self, address) -> object:
         ''' Pops value from stack and adds it to the variables array
-        
+
         Returns
         -------
         object
             value from the top of the stack
         '''
-        self.ip += 1
-        popped_value = self.stack.pop()
-        self.pointer = self.immediate_value()
-        self.data_array[self.pointer] = popped_value
-        self.pointer += 1
+        self.sp -= 1
+        popped_value = self.stack[self.sp]
+        self.data_array[address] = popped_value
         return popped_value
 
-    def push(self) -> None:
+    def push(self, address) -> None:
         ''' Pushes value to stack '''
-        self.ip += 1
-        imm = self.immediate_data()
-        self.stack.append(imm)
+        self.stack[self.sp] = self.data_array[address]
+        self.sp += 1
 
-    def print_i(self) -> None:
+    def print_i(self, address) -> None:
         ''' Adds integer to the output array '''
-        self.ip += 1
-        self.out.append(self.immediate_data())
+        self.out.append(self.data_array[address])
 
-    def print_new_line(self) -> None:
+    def print_new_line(self, _) -> None:
         ''' Adds \n to the output array '''
-        self.ip += 1
         self.out.append('\n')
 
-    def sub(self) -> None:
+    def sub(self, _) -> None:
         ''' Subtracts two top values from stack '''
-        self.ip += 1
-        top = self.stack.pop()
-        new_top = self.stack.pop() - top
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp - 1] - stack[sp]
+        self.sp = sp
 
-    def add(self) -> None:
+    def add(self, _) -> None:
         ''' Adds two top values from stack '''
-        self.ip += 1
-        new_top = self.stack.pop() + self.stack.pop()
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] + stack[sp - 1]
+        self.sp = sp
 
-    def multiply(self) -> None:
+    def multiply(self, _) -> None:
         ''' Multiply two top values from stack '''
-        self.ip += 1
-        new_top = self.stack.pop() * self.stack.pop()
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] * stack[sp - 1]
+        self.sp = sp
 
-    def divide(self) -> None:
+    def divide(self, _) -> None:
         ''' Divides two top values from stack '''
-        self.ip += 1
-        denom = self.stack.pop()
-        new_top = self.stack.pop() / float(denom)
-        self.stack.append(new_top)
-    
-    def div(self):
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp - 1] / stack[sp]
+        self.sp = sp
+
+    def div(self, _):
         ''' Integer division between two top values from stack '''
-        self.ip += 1
-        denom = int(self.stack.pop())
-        new_top = int(self.stack.pop()) / denom
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp - 1] / stack[sp]
+        self.sp = sp
 
-    def jfalse(self) -> None:
+    def jfalse(self, target) -> None:
         ''' Jumps if false '''
-        self.ip += 1
-
-        if self.stack.pop():
-            self.immediate_value()
-        else:
-            imm = self.immediate_value()
-            self.ip = imm
+        self.sp -= 1
+        if not self.stack[self.sp]:
+            self.ip = target
 
-    def gte(self) -> None:
+    def gte(self, _) -> None:
         ''' Adds greater or equal than bool result to stack '''
-        self.ip += 1
-        new_top = self.stack.pop() <= self.stack.pop()
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] <= stack[sp - 1]
+        self.sp = sp
 
-    def gtr(self) -> None:
+    def gtr(self, _) -> None:
         ''' Adds greater than bool result to stack '''
-        self.ip += 1
-        new_top = self.stack.pop() > self.stack.pop()
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] > stack[sp - 1]
+        self.sp = sp
 
-    def lte(self) -> None:
+    def lte(self, _) -> None:
         ''' Adds less or equal than operator to stack '''
-        self.ip += 1
-        new_top = self.stack.pop() >= self.stack.pop()
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] >= stack[sp - 1]
+        self.sp = sp
 
-    def les(self) -> None:
+    def les(self, _) -> None:
         ''' Adds less than bool result to stack '''
-        self.ip += 1
-        new_top = self.stack.pop() < self.stack.pop()
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] < stack[sp - 1]
+        self.sp = sp
 
-    def eql(self) -> None:
+    def eql(self, _) -> None:
         ''' Adds equal bool result to stack '''
-        self.ip += 1
-        new_top = self.stack.pop() == self.stack.pop()
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] == stack[sp - 1]
+        self.sp = sp
 
-    def neq(self) -> None:
+    def neq(self, _) -> None:
         ''' Adds not equal bool result to stack '''
-        self.ip += 1
-        new_top = self.stack.pop() != self.stack.pop()
-        self.stack.append(new_top)
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] != stack[sp - 1]
+        self.sp = sp
 
-    def xchg(self) -> None:
+    def xchg(self, _) -> None:
         ''' Swaps two top values from stack '''
-        self.ip += 1
-        self.stack[-1], self.stack[-2] = self.stack[-2], self.stack[-1]
+        stack = self.stack
+        sp = self.sp
+        stack[sp - 1], stack[sp - 2] = stack[sp - 2], stack[sp - 1]
 
-    def cvr(self) -> None:
+    def cvr(self, _) -> None:
         ''' Converts top value to float '''
-        self.ip += 1
-        new_top = float(self.stack.pop())
-        self.stack.append(new_top)
+        self.stack[self.sp - 1] = float(self.stack[self.sp - 1])
 
-    def jmp(self) -> None:
+    def jmp(self, target) -> None:
         ''' Jumps to position '''
-        self.ip += 1
-        self.ip = self.immediate_value()
+        self.ip = target
 
-    def pop_char(self) -> object:
+    def vloop(self, loop) -> None:
+        ''' Computes a whole counted loop at once and jumps past it, or goes on into
+        the compiled loop if it can not '''
+        if loop.run(self.data_array):
+            self.ip = loop.exit
+
+    def call(self, procedure) -> None:
+        ''' Pushes a frame with the return position, the caller frame and the
+        procedure parameters and locals, then jumps into the procedure
+
+        Raises
+        ------
+        LalgError
+            if the frame stack is full, e.g. after too deep a recursion
+        '''
+        frames = self.frames
+        base = self.top
+        fp = base + 2
+        top = fp + procedure.size
+
+        if top > len(frames):
+            raise LalgError(f'Frame stack overflow calling {procedure.name}')
+
+        frames[base] = self.ip
+        frames[base + 1] = self.fp
+
+        # the arguments were pushed in order, the first one is the deepest
+        params = procedure.params
+        sp = self.sp - params
+        frames[fp:fp + params] = self.stack[sp:self.sp]
+        frames[fp + params:top] = procedure.initial
+
+        self.sp = sp
+        self.fp = fp
+        self.top = top
+        self.ip = procedure.entry
+
+    def ret(self, _) -> None:
+        ''' Pops the frame of the running call, its slots are reused by the next one '''
+        base = self.fp - 2
+        self.ip = self.frames[base]
+        self.fp = self.frames[base + 1]
+        self.top = base
+
+    def push_local(self, slot) -> None:
+        ''' Pushes a parameter or local to stack '''
+        self.stack[self.sp] = self.frames[self.fp + slot]
+        self.sp += 1
+
+    def pop_local(self, slot) -> None:
+        ''' Pops value from stack into a parameter or local '''
+        self.sp -= 1
+        self.frames[self.fp + slot] = self.stack[self.sp]
+
+    def print_local(self, slot) -> None:
+        ''' Adds a parameter or local to the output array '''
+        self.out.append(self.frames[self.fp + slot])
+
+    def read_int_local(self, slot) -> None:
+        ''' Reads integer from user into a parameter or local '''
+        self.frames[self.fp + slot] = self.read_value(int)
+
+    def read_real_local(self, slot) -> None:
+        ''' Reads float from user into a parameter or local '''
+        self.frames[self.fp + slot] = self.read_value(float)
+
+    def pop_char(self, address) -> object:
         ''' Pops char from stack and adds it to the variables array '''
-        self.ip += 1
-        top = self.stack.pop()
-        self.pointer = self.immediate_value()
-        self.data_array[self.pointer] = top
-        self.pointer += 1
+        self.sp -= 1
+        top = self.stack[self.sp]
+        self.data_array[address] = top
         return top
 
-    def read_int(self) -> object:
-        ''' Reads integer from user
-        
+    def read_value(self, convert) -> object:
+        ''' Reads a value from user
+
+        Parameters
+        ----------
+        convert : type
+            int or float
+
         Raises
         ------
         LalgError
-            if input value is not int
+            if input value can not be converted
+            if there is no more input
 
         Returns
         -------
-        int
+        int or float
             user input
         '''
-        self.ip += 1
-        user_input = input()
+        # the output so far must be visible before waiting for the user
+        if self.inputs.interactive:
+            self.out.flush()
+
+        user_input = self.inputs.read()
         try:
-            user_input = int(user_input)
+            return convert(user_input)
         except:
             raise LalgError("Value entered is not valid")
-        
-        self.pointer = self.immediate_value()
-        self.data_array[self.pointer] = user_input
-        self.pointer += 1
+
+    def read_int(self, address) -> object:
+        ''' Reads integer from user
+
+        Raises
+        ------
+        LalgError
+            if input value is not int
+            if there is no more input
+
+        Returns
+        -------
+        int
+            user input
+        '''
+        user_input = self.read_value(int)
+        self.data_array[address] = user_input
         return user_input
 
-    def read_real(self) -> object:
+    def read_real(self, address) -> object:
         ''' Reads from from user
-        
+
         Raises
         ------
         LalgError
             if input value is not float
+            if there is no more input
 
         Returns
         -------
         float
             user input
         '''
-        self.ip += 1
-        user_input = input()
-        try:
-            user_input = float(user_input)
-        except:
-            raise LalgError("Value entered is not valid")
-        
-        self.pointer = self.immediate_value()
-        self.data_array[self.pointer] = user_input
-        self.pointer += 1
+        user_input = self.read_value(float)
+        self.data_array[address] = user_input
         return user_input
 
-    def push_char(self) -> None:
+    def push_char(self, value) -> None:
         ''' Pushes char stack '''
-        self.ip += 1
-        new_top = chr(self.immediate_value())
-        self.stack.append(new_top)
+        self.stack[self.sp] = chr(value)
+        self.sp += 1
 
-    def f_divide(self) -> None:
+    def f_divide(self, _) -> None:
         ''' Divides two floats '''
-        self.ip += 1
-        denom = bits_to_float(self.stack.pop())
-        new_top = self.stack.pop() / float(denom)
-        self.stack.append(new_top)
-
-    def f_multiply(self) -> None:
-        ''' Multiply two floats '''
-        self.ip += 1
-        new_top = float(self.stack.pop()) * float(self.stack.pop())
-        self.stack.append(new_top)
-
-    def f_add(self) -> None:
-        ''' Adds two floats '''
-        self.ip += 1
-        new_top = float(self.stack.pop()) + float(self.stack.pop())
-        self.stack.append(new_top)
-
-    def f_sub(self) -> None:
-        ''' Subtracts two floats '''
-        self.ip += 1
-        top = float(self.stack.pop())
-        new_top = float(self.stack.pop()) - top
-        self.stack.append(new_top)
-
-    def dump(self) -> None:
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp - 1] / bits_to_float(stack[sp])
+        self.sp = sp
+
+    def f_multiply(self, _) -> None:
+        ''' Multiply two numbers, at least one of them real '''
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] * stack[sp - 1]
+        self.sp = sp
+
+    def f_add(self, _) -> None:
+        ''' Adds two numbers, at least one of them real '''
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp] + stack[sp - 1]
+        self.sp = sp
+
+    def f_sub(self, _) -> None:
+        ''' Subtracts two numbers, at least one of them real '''
+        stack = self.stack
+        sp = self.sp - 1
+        stack[sp - 1] = stack[sp - 1] - stack[sp]
+        self.sp = sp
+
+    def dump(self, _) -> None:
         ''' Attributes value to variable '''
-        self.ip += 1
-        assignment = self.stack.pop()
-        self.pointer = self.stack.pop()
-        self.data_array[self.pointer] = assignment
-        self.pointer += 1
+        self.sp -= 2
+        self.data_array[self.stack[self.sp]] = self.stack[self.sp + 1]
 
-    def retrieve(self) -> None:
+    def retrieve(self, _) -> None:
         ''' Gets value from variable '''
-        self.ip += 1
-        self.pointer = self.stack.pop()
-        self.stack.append(self.data_array[self.pointer])
-    
-    def print_c(self) -> None:
+        self.stack[self.sp - 1] = self.data_array[self.stack[self.sp - 1]]
+
+    def print_c(self, address) -> None:
         ''' Adds char to output array '''
-        self.ip += 1
-        out_val = self.data_array[self.immediate_value()]
+        out_val = self.data_array[address]
         self.out.append(out_val)
 
-    def print_r(self) -> None:
+    def print_r(self, address) -> None:
         ''' Adds float to output array '''
-        self.ip += 1
-        self.out.append(self.immediate_data())
+        self.out.append(self.data_array[address])
 
-    def print_ilit(self) -> None:
+    def print_ilit(self, value) -> None:
         ''' Adds literal integer to output array '''
-        self.ip += 1
-        val = self.immediate_value()
-        self.out.append(val)
+        self.out.append(value)
 
-    def ret_and_print(self) -> None:
+    def ret_and_print(self, _) -> None:
         ''' Attributes value and adds it to output array '''
-        self.ip += 1
-        self.pointer = self.stack.pop()
-        out_val = self.data_array[self.pointer]
+        self.sp -= 1
+        out_val = self.data_array[self.stack[self.sp]]
         self.out.append(out_val)
 
-    def print_str_lit(self) -> None:
+    def print_str_lit(self, text) -> None:
         ''' Adds literal string to output array '''
-        self.ip += 1
-        text_len = self.stack.pop()
-        text = ''
-
-        for _ in range(text_len):
-            text += chr(self.bytes[self.ip])
-            self.ip += 1
-        
+        # the string length is still pushed right before the string
+        self.sp -= 1
         self.out.append(text)
-    
-    def pop_real_lit(self) -> None:
+
+    def pop_real_lit(self, address) -> None:
         ''' Adds literal float to output array '''
-        self.ip += 1
-        top = self.stack.pop()
+        self.sp -= 1
+        top = self.stack[self.sp]
         new_val = float('{0:.2f}'.format(bits_to_float(top)))
-        self.data_array[self.immediate_value()] = new_val
-        self.pointer += 1
-    
-    def halt(self) -> None:
-        ''' Finishes execution '''
-        print('Done!')
-        self.flush()
-        exit(0)
\ No newline at end of file
+        self.data_array[address] = new_val
+
+    def halt(self, _) -> None:
+        ''' Finishes execution, start returns once it is raised
+
+        Raises
+        ------
+        Halted
+            always
+        '''
+        raise Halted()
@@ -0,0 +1,251 @@
+from helper import *
+from constants import *
+from emulator import Emulator
+from verifier import verify
+from loader.lalg_error import LalgError
+
+class FastEmulator(Emulator):
+    ''' Fast Emulator Class - runs a program the verifier proved safe without any
+    check while running. The stack depth before every instruction is known, so each
+    instruction reads and writes fixed stack slots instead of moving a stack
+    pointer. '''
+    SUPPORTS_LIMITS = False
+    SUPPORTS_CHECKPOINTS = False
+
+    def build_operations(self) -> list:
+        ''' Builds the handler table, indexed by operation code, every handler takes
+        the operand and the stack depth before the instruction
+
+        Returns
+        -------
+        list
+            handler for each possible operation code, None if it is not supported
+        '''
+        handlers = {
+            OPCODE['ADD']: self.add,
+            OPCODE['CVR']: self.cvr,
+            OPCODE['DIV']: self.divide,
+            OPCODE['DIVIDE']: self.divide,
+            OPCODE['EQL']: self.eql,
+            OPCODE['FADD']: self.add,
+            OPCODE['FDIVIDE']: self.f_divide,
+            OPCODE['FMULTIPLY']: self.multiply,
+            OPCODE['FSUB']: self.sub,
+            OPCODE['GTE']: self.gte,
+            OPCODE['GTR']: self.gtr,
+            OPCODE['JFALSE']: self.jfalse,
+            OPCODE['JMP']: self.jmp,
+            OPCODE['LES']: self.les,
+            OPCODE['LTE']: self.lte,
+            OPCODE['MULTIPLY']: self.multiply,
+            OPCODE['NEQ']: self.neq,
+            OPCODE['POP_CHAR']: self.pop,
+            OPCODE['POP_REAL_LIT']: self.pop_real_lit,
+            OPCODE['POP']: self.pop,
+            OPCODE['PUSH_CHAR']: self.push_char,
+            OPCODE['PUSH']: self.push,
+            OPCODE['PUSHI']: self.pushi,
+            OPCODE['PUSH_CONST']: self.pushi,
+            OPCODE['SUB']: self.sub,
+            OPCODE['XCHG']: self.xchg,
+            OPCODE['CALL']: self.call,
+            OPCODE['PUSH_LOCAL']: self.push_local,
+            OPCODE['POP_LOCAL']: self.pop_local,
+        }
+
+        # handlers that do not touch the stack are shared with the Emulator
+        plain = {
+            OPCODE['HALT']: self.halt,
+            OPCODE['NEW_LINE']: self.print_new_line,
+            OPCODE['PRINT_C']: self.print_c,
+            OPCODE['PRINT_I']: self.print_i,
+            OPCODE['PRINT_ILIT']: self.print_ilit,
+            OPCODE['PRINT_R']: self.print_r,
+            OPCODE['PRINT_STR_LIT']: self.print_ilit,
+            OPCODE['PRINT_STR']: self.print_ilit,
+            OPCODE['READ_INT']: self.read_int,
+            OPCODE['READ_REAL']: self.read_real,
+            OPCODE['VLOOP']: self.vloop,
+            OPCODE['RET']: self.ret,
+            OPCODE['PRINT_LOCAL']: self.print_local,
+            OPCODE['READ_INT_LOCAL']: self.read_int_local,
+            OPCODE['READ_REAL_LOCAL']: self.read_real_local,
+        }
+
+        for op, handler in plain.items():
+            handlers[op] = self.without_depth(handler)
+
+        operations = [None] * 256
+        for op, handler in handlers.items():
+            operations[op] = handler
+
+        return operations
+
+    def without_depth(self, handler) -> object:
+        ''' Adapts a handler that only takes the operand '''
+        def call(operand, _):
+            handler(operand)
+
+        return call
+
+    def load(self, instructions) -> list:
+        ''' Verifies the decoded instructions and binds each one to its handler and
+        its stack depth
+
+        Parameters
+        ----------
+        instructions : list
+            (op code, operand) pairs generated by decoder.decode
+
+        Raises
+        ------
+        VerificationError
+            if the program could fail while running
+
+        Returns
+        -------
+        list
+            (handler, operand, depth) triples, executed by start
+        '''
+        operations = self.operations
+        supported = {op for op, handler in enumerate(operations) if handler is not None}
+        depths = verify(instructions, len(self.data_array), supported)
+
+        # instructions never reached keep any depth, they are never executed
+        return [(operations[op], operand, depth or 0) for (op, operand), depth in zip(instructions, depths)]
+
+    def dispatch(self) -> None:
+        ''' Executes instructions until one of them raises '''
+        code = self.code
+
+        while True:
+            handler, operand, depth = code[self.ip]
+            self.ip += 1
+            handler(operand, depth)
+
+    def pushi(self, value, depth) -> None:
+        ''' Pushes integer to stack '''
+        self.stack[depth] = value
+
+    def push_char(self, value, depth) -> None:
+        ''' Pushes char stack '''
+        self.stack[depth] = chr(value)
+
+    def push(self, address, depth) -> None:
+        ''' Pushes value to stack '''
+        self.stack[depth] = self.data_array[address]
+
+    def pop(self, address, depth) -> None:
+        ''' Pops value from stack and adds it to the variables array '''
+        self.data_array[address] = self.stack[depth - 1]
+
+    def pop_real_lit(self, address, depth) -> None:
+        ''' Adds literal float to output array '''
+        self.data_array[address] = float('{0:.2f}'.format(bits_to_float(self.stack[depth - 1])))
+
+    def jfalse(self, target, depth) -> None:
+        ''' Jumps if false '''
+        if not self.stack[depth - 1]:
+            self.ip = target
+
+    def jmp(self, target, _) -> None:
+        ''' Jumps to position '''
+        self.ip = target
+
+    def add(self, _, depth) -> None:
+        ''' Adds two top values from stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 1] + stack[depth - 2]
+
+    def sub(self, _, depth) -> None:
+        ''' Subtracts two top values from stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 2] - stack[depth - 1]
+
+    def multiply(self, _, depth) -> None:
+        ''' Multiply two top values from stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 1] * stack[depth - 2]
+
+    def divide(self, _, depth) -> None:
+        ''' Divides two top values from stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 2] / stack[depth - 1]
+
+    def f_divide(self, _, depth) -> None:
+        ''' Divides two floats '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 2] / bits_to_float(stack[depth - 1])
+
+    def gte(self, _, depth) -> None:
+        ''' Adds greater or equal than bool result to stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 1] <= stack[depth - 2]
+
+    def gtr(self, _, depth) -> None:
+        ''' Adds greater than bool result to stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 1] > stack[depth - 2]
+
+    def lte(self, _, depth) -> None:
+        ''' Adds less or equal than operator to stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 1] >= stack[depth - 2]
+
+    def les(self, _, depth) -> None:
+        ''' Adds less than bool result to stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 1] < stack[depth - 2]
+
+    def eql(self, _, depth) -> None:
+        ''' Adds equal bool result to stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 1] == stack[depth - 2]
+
+    def neq(self, _, depth) -> None:
+        ''' Adds not equal bool result to stack '''
+        stack = self.stack
+        stack[depth - 2] = stack[depth - 1] != stack[depth - 2]
+
+    def xchg(self, _, depth) -> None:
+        ''' Swaps two top values from stack '''
+        stack = self.stack
+        stack[depth - 1], stack[depth - 2] = stack[depth - 2], stack[depth - 1]
+
+    def cvr(self, _, depth) -> None:
+        ''' Converts top value to float '''
+        self.stack[depth - 1] = float(self.stack[depth - 1])
+
+    def call(self, procedure, depth) -> None:
+        ''' Pushes a frame and jumps into the procedure, the arguments are the whole
+        stack
+
+        Raises
+        ------
+        LalgError
+            if the frame stack is full, e.g. after too deep a recursion
+        '''
+        frames = self.frames
+        base = self.top
+        fp = base + 2
+        top = fp + procedure.size
+
+        if top > len(frames):
+            raise LalgError(f'Frame stack overflow calling {procedure.name}')
+
+        frames[base] = self.ip
+        frames[base + 1] = self.fp
+        frames[fp:fp + depth] = self.stack[:depth]
+        frames[fp + depth:top] = procedure.initial
+
+        self.fp = fp
+        self.top = top
+        self.ip = procedure.entry
+
+    def push_local(self, slot, depth) -> None:
+        ''' Pushes a parameter or local to stack '''
+        self.stack[depth] = self.frames[self.fp + slot]
+
+    def pop_local(self, slot, depth) -> None:
+        ''' Pops value from stack into a parameter or local '''
+        self.frames[self.fp + slot] = self.stack[depth - 1]
@@ -0,0 +1,88 @@
+from helper import *
+from constants import *
+
+# largest procedure body, in instructions, copied into its call sites
+INLINE_SIZE = 24
+
+# frame slot op codes, back to the data segment op codes
+GLOBAL_OPCODES = {
+    OPCODE['PUSH_LOCAL']: OPCODE['PUSH'],
+    OPCODE['POP_LOCAL']: OPCODE['POP'],
+    OPCODE['PRINT_LOCAL']: OPCODE['PRINT_I'],
+    OPCODE['READ_INT_LOCAL']: OPCODE['READ_INT'],
+    OPCODE['READ_REAL_LOCAL']: OPCODE['READ_REAL'],
+}
+
+def scan(byte_array) -> list:
+    ''' Splits bytes generated by the Parser into instructions
+
+    Returns
+    -------
+    list or None
+        (address, op code, operand) triples, operand is None for op codes without
+        immediate, None if an instruction has no fixed size
+    '''
+    instructions = []
+    ip = 0
+
+    while ip < len(byte_array):
+        op = byte_array[ip]
+        operand = None
+
+        # literal strings are as long as the value pushed before them
+        if op == OPCODE['PRINT_STR_LIT']:
+            return None
+
+        if op in IMMEDIATE_OPCODES:
+            operand = byte_unpacker(byte_array[ip + 1:ip + 5])
+            instructions.append((ip, op, operand))
+            ip += 5
+        else:
+            instructions.append((ip, op, operand))
+            ip += 1
+
+    return instructions
+
+def relocate(byte_array, origin, destination, base, local, loops) -> bytearray:
+    ''' Rewrites a procedure body to run at another address with its parameters and
+    locals in other slots
+
+    Parameters
+    ----------
+    byte_array : bytes
+        procedure body, without its RET
+    origin : int
+        address the body starts at
+    destination : int
+        address the copy starts at
+    base : int
+        first slot of the parameters and locals in the copy
+    local : bool
+        whether the slots are in the frame of the caller, or in the data segment
+    loops : list
+        counted loop pool, relocated copies of the loops in the body are added
+
+    Returns
+    -------
+    bytearray
+        the copy
+    '''
+    delta = destination - origin
+    copy = bytearray(byte_array)
+
+    for address, op, operand in scan(byte_array):
+        if op in JUMP_OPCODES:
+            operand += delta
+        elif op == OPCODE['VLOOP']:
+            loops.append(loops[operand].relocated(loops[operand].exit + delta))
+            operand = len(loops) - 1
+        elif op in GLOBAL_OPCODES:
+            operand += base
+            if not local:
+                copy[address] = GLOBAL_OPCODES[op]
+        else:
+            continue
+
+        copy[address + 1:address + 5] = bytes(byte_packer(operand))
+
+    return copy
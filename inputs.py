@@ -0,0 +1,176 @@
+import re
+import sys
+import mmap
+import itertools
+from collections import deque
+
+from loader.lalg_error import LalgError
+
+# values are separated by any whitespace, lines included
+TOKEN = re.compile(rb'\S+')
+
+class InputBlocked(Exception):
+    ''' Raised by a read when the value is not available yet, the read is retried
+    once it is '''
+    pass
+
+class ConsoleInput(object):
+    ''' Console Input Class - reads one value per line, waiting for the user '''
+    interactive = True
+
+    def __init__(self) -> None:
+        ''' Initializes artibutes '''
+        self.position = 0
+
+    def read(self) -> str:
+        ''' Gets the next value
+
+        Raises
+        ------
+        LalgError
+            if there is no more input
+
+        Returns
+        -------
+        str
+            line typed by the user
+        '''
+        try:
+            value = input()
+        except EOFError:
+            raise LalgError('No more input to read')
+
+        self.position += 1
+        return value
+
+    def skip(self, count) -> None:
+        ''' Drops values already read by an earlier run, the user types them again '''
+        for _ in range(count):
+            self.read()
+
+class TokenInput(object):
+    ''' Token Input Class - serves values from an iterator over input split once '''
+    interactive = False
+
+    def __init__(self, tokens) -> None:
+        ''' Initializes artibutes '''
+        self.tokens = iter(tokens)
+        self.position = 0
+
+    def read(self) -> object:
+        ''' Gets the next value
+
+        Raises
+        ------
+        LalgError
+            if there is no more input
+
+        Returns
+        -------
+        object
+            next value, int() and float() accept it as it is
+        '''
+        try:
+            value = next(self.tokens)
+        except StopIteration:
+            raise LalgError('No more input to read')
+
+        self.position += 1
+        return value
+
+    def skip(self, count) -> None:
+        ''' Drops values already read by an earlier run
+
+        Raises
+        ------
+        LalgError
+            if there are fewer values than count
+        '''
+        skipped = sum(1 for _ in itertools.islice(self.tokens, count))
+        self.position += skipped
+
+        if skipped < count:
+            raise LalgError('No more input to read')
+
+class StreamInput(TokenInput):
+    ''' Stream Input Class - reads the whole binary stream at once, sys.stdin.buffer
+    by default, and splits it into values '''
+
+    def __init__(self, stream=None) -> None:
+        ''' Initializes artibutes '''
+        stream = sys.stdin.buffer if stream is None else stream
+        super().__init__(stream.read().split())
+
+class FileInput(TokenInput):
+    ''' File Input Class - maps the file into memory and finds its values lazily '''
+
+    def __init__(self, path) -> None:
+        ''' Initializes artibutes '''
+        with open(path, 'rb') as file:
+            # an empty file can not be mapped
+            if file.seek(0, 2) == 0:
+                super().__init__([])
+                return
+
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        super().__init__(match.group() for match in TOKEN.finditer(self.map))
+
+class ListInput(TokenInput):
+    ''' List Input Class - serves values from memory, for tests and batch runs '''
+
+    def __init__(self, values) -> None:
+        ''' Initializes artibutes '''
+        super().__init__(list(values))
+
+class QueueInput(object):
+    ''' Queue Input Class - serves values fed while the program runs, a read with
+    no value blocks the program until more are fed or the input is closed '''
+    interactive = False
+
+    def __init__(self, values=()) -> None:
+        ''' Initializes artibutes '''
+        self.values = deque(values)
+        self.closed = False
+        self.position = 0
+
+    def feed(self, values) -> None:
+        ''' Adds values to be read '''
+        self.values.extend(values)
+
+    def close(self) -> None:
+        ''' Marks the end of the input, reads then fail instead of blocking '''
+        self.closed = True
+
+    def ready(self) -> bool:
+        ''' Checks if a read would not block '''
+        return bool(self.values) or self.closed
+
+    def read(self) -> object:
+        ''' Gets the next value
+
+        Raises
+        ------
+        InputBlocked
+            if no value was fed yet
+        LalgError
+            if there is no more input and it was closed
+
+        Returns
+        -------
+        object
+            next value, int() and float() accept it as it is
+        '''
+        if self.values:
+            self.position += 1
+            return self.values.popleft()
+
+        if self.closed:
+            raise LalgError('No more input to read')
+
+        raise InputBlocked()
+
+    def skip(self, count) -> None:
+        ''' Drops values already read by an earlier run '''
+        for _ in range(count):
+            self.read()
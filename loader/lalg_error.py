@@ -6,4 +6,83 @@ class LalgError(Exception):
     Exception
     '''
 
-    pass
\ No newline at end of file
+    pass
+
+class LimitExceeded(LalgError):
+    ''' Limit Error Class - a run was stopped before it finished
+
+    Extends
+    -------
+    LalgError
+    '''
+
+    def __init__(self, message, executed, ip) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        message : str
+            what limit was reached
+        executed : int
+            instructions executed before the run was stopped
+        ip : int
+            index of the instruction the run resumes at
+        '''
+        super().__init__(f'{message} after {executed} instructions at instruction {ip}')
+        self.executed = executed
+        self.ip = ip
+
+class BudgetExceeded(LimitExceeded):
+    ''' Budget Error Class - a run executed more instructions than allowed
+
+    Extends
+    -------
+    LimitExceeded
+    '''
+
+    pass
+
+class DeadlineExceeded(LimitExceeded):
+    ''' Deadline Error Class - a run was still going when its deadline passed
+
+    Extends
+    -------
+    LimitExceeded
+    '''
+
+    pass
+
+class LanesFailed(LalgError):
+    ''' Lanes Error Class - some of the runs sharing a VectorEmulator failed, the
+    others finished
+
+    Extends
+    -------
+    LalgError
+    '''
+
+    def __init__(self, errors, outs) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        errors : dict
+            lane index to the error that stopped it
+        outs : list
+            one sink per lane, with every value written before the lane finished or failed
+        '''
+        failures = ', '.join(f'lane {lane}: {error!r}' for lane, error in sorted(errors.items()))
+        super().__init__(f'{len(errors)} of {len(outs)} lanes failed ({failures})')
+        self.errors = errors
+        self.outs = outs
+
+class VerificationError(LalgError):
+    ''' Verification Error Class - a program could fail while running, so it can not
+    run without checks
+
+    Extends
+    -------
+    LalgError
+    '''
+
+    pass
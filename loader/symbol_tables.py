@@ -13,6 +13,7 @@ class SymbolObject(object):
         self.name = name
         self.data_type = data_type
         self.object_type = object_type
+        self.local = False
         
         if attribute is not None:
             for attr, value in attribute.items():
@@ -0,0 +1,324 @@
+from helper import *
+from constants import *
+from program import Program
+
+# op codes pushing a value without any other effect, they can be moved past a CVR
+PURE_PUSH_OPCODES = {OPCODE['PUSH'], OPCODE['PUSHI'], OPCODE['PUSH_CONST'], OPCODE['PUSH_CHAR'],
+    OPCODE['PUSH_LOCAL']}
+
+# op codes after which the next instruction only runs if something jumps to it
+END_OPCODES = {OPCODE['JMP'], OPCODE['HALT'], OPCODE['RET']}
+
+def optimize(program) -> Program:
+    ''' Rewrites redundant instruction sequences generated by the Parser, threads
+    jumps to jumps and removes instructions that can never run, see peephole,
+    thread_jumps and dead_code. Passes are repeated until none of them changes
+    anything.
+
+    Parameters
+    ----------
+    program : Program
+        compiled program
+
+    Returns
+    -------
+    Program
+        program with the same behaviour and at most as many instructions, the same
+        program if it prints literal strings, whose length is the previous immediate
+    '''
+    if any(op == OPCODE['PRINT_STR_LIT'] for op, _ in program.instructions):
+        return program
+
+    code = list(program.instructions)
+
+    while True:
+        threaded = thread_jumps(code)
+        size = len(code)
+        code = rebuild(code, peephole(code))
+        code = rebuild(code, dead_code(code))
+
+        if not threaded and len(code) == size:
+            break
+
+    bytecode, constants, strings, loops, procedures = encode(code, program.constants, program.strings)
+    return Program(bytecode, program.data_segment, constants, strings, loops, procedures)
+
+def labels(code) -> set:
+    ''' Lists every instruction something jumps to, including counted loop exits
+    and the boundaries of procedures '''
+    found = set()
+
+    for op, operand in code:
+        if op in JUMP_OPCODES:
+            found.add(operand)
+        elif op == OPCODE['VLOOP']:
+            found.add(operand.exit)
+        elif op == OPCODE['CALL']:
+            found.update((operand.entry, operand.end))
+
+    return found
+
+def thread_jumps(code) -> bool:
+    ''' Makes jumps and counted loop exits that land on a JMP go straight to its
+    target, and a JMP to RET return itself. HALT is left as the last instruction,
+    decoding stops at it
+
+    Parameters
+    ----------
+    code : list
+        (op code, operand) pairs as generated by decoder.decode, changed in place
+
+    Returns
+    -------
+    bool
+        whether an instruction changed
+    '''
+    def final(target):
+        seen = set()
+        while code[target][0] == OPCODE['JMP'] and target not in seen:
+            seen.add(target)
+            target = code[target][1]
+        return target
+
+    changed = False
+
+    for index, (op, operand) in enumerate(code):
+        if op in JUMP_OPCODES:
+            target = final(operand)
+            if op == OPCODE['JMP'] and code[target][0] == OPCODE['RET']:
+                code[index] = code[target]
+                changed = True
+            elif target != operand:
+                code[index] = (op, target)
+                changed = True
+        elif op == OPCODE['VLOOP']:
+            target = final(operand.exit)
+            if target != operand.exit:
+                code[index] = (op, operand.relocated(target))
+                changed = True
+
+    return changed
+
+def peephole(code) -> dict:
+    ''' Finds redundant sequences, none of them may have an instruction other than
+    the first one something jumps to:
+
+    - JMP to the next instruction is removed
+    - PUSH x; POP x, of a variable or a frame slot, is removed
+    - XCHG; XCHG is removed
+    - a push between XCHG; CVR; XCHG moves after a single CVR
+    - PUSHI and PUSH_CONST followed by CVR become one PUSH_CONST of a real
+
+    Parameters
+    ----------
+    code : list
+        (op code, operand) pairs as generated by decoder.decode
+
+    Returns
+    -------
+    dict
+        instruction index to the instructions replacing it, see rebuild
+    '''
+    targets = labels(code)
+    replacements = {}
+    index = 0
+
+    def window(size):
+        if index + size > len(code) or any(position in targets for position in range(index + 1, index + size)):
+            return None
+        return [op for op, _ in code[index:index + size]]
+
+    while index < len(code):
+        op, operand = code[index]
+        pair = window(2)
+        quad = window(4)
+        size = 0
+
+        if op == OPCODE['JMP'] and operand == index + 1:
+            replacement, size = [], 1
+        elif pair in ([OPCODE['PUSH'], OPCODE['POP']], [OPCODE['PUSH_LOCAL'], OPCODE['POP_LOCAL']]) \
+                and operand == code[index + 1][1]:
+            replacement, size = [], 2
+        elif pair == [OPCODE['XCHG'], OPCODE['XCHG']]:
+            replacement, size = [], 2
+        elif quad is not None and op in PURE_PUSH_OPCODES \
+                and quad[1:] == [OPCODE['XCHG'], OPCODE['CVR'], OPCODE['XCHG']]:
+            replacement, size = [(OPCODE['CVR'], None), code[index]], 4
+        elif pair == [OPCODE['PUSHI'], OPCODE['CVR']] and operand < 1 << 31:
+            replacement, size = [(OPCODE['PUSH_CONST'], float(operand))], 2
+        elif pair == [OPCODE['PUSH_CONST'], OPCODE['CVR']]:
+            replacement, size = [code[index]], 2
+
+        if size:
+            replacements[index] = replacement
+            for position in range(index + 1, index + size):
+                replacements[position] = []
+            index += size
+        else:
+            index += 1
+
+    return replacements
+
+def dead_code(code) -> dict:
+    ''' Finds instructions no path from the start reaches, following jumps, calls
+    and counted loop exits
+
+    Parameters
+    ----------
+    code : list
+        (op code, operand) pairs as generated by decoder.decode
+
+    Returns
+    -------
+    dict
+        instruction index to the instructions replacing it, see rebuild
+    '''
+    reached = set()
+    pending = [0]
+
+    while pending:
+        index = pending.pop()
+
+        while index < len(code) and index not in reached:
+            reached.add(index)
+            op, operand = code[index]
+
+            if op in JUMP_OPCODES:
+                pending.append(operand)
+            elif op == OPCODE['VLOOP']:
+                pending.append(operand.exit)
+            elif op == OPCODE['CALL']:
+                pending.append(operand.entry)
+
+            if op in END_OPCODES:
+                break
+
+            index += 1
+
+    return {index: [] for index in range(len(code)) if index not in reached}
+
+def rebuild(code, replacements) -> list:
+    ''' Replaces instructions and moves every jump target, counted loop exit and
+    procedure boundary to where its instruction ends up. A removed instruction is
+    replaced by the next one kept.
+
+    Parameters
+    ----------
+    code : list
+        (op code, operand) pairs as generated by decoder.decode
+    replacements : dict
+        instruction index to the instructions replacing it, operands still refer to
+        the old indexes
+
+    Returns
+    -------
+    list
+        new (op code, operand) pairs
+    '''
+    if not replacements:
+        return code
+
+    position = []
+    instructions = []
+
+    for index, instruction in enumerate(code):
+        position.append(len(instructions))
+        instructions.extend(replacements.get(index, [instruction]))
+
+    position.append(len(instructions))
+
+    # every call of a procedure shares one relocated copy
+    relocated = {}
+    for index, (op, operand) in enumerate(instructions):
+        if op in JUMP_OPCODES:
+            instructions[index] = (op, position[operand])
+        elif op == OPCODE['VLOOP']:
+            instructions[index] = (op, operand.relocated(position[operand.exit]))
+        elif op == OPCODE['CALL']:
+            if operand.name not in relocated:
+                relocated[operand.name] = operand.relocated(position[operand.entry], position[operand.end])
+
+            instructions[index] = (op, relocated[operand.name])
+
+    return instructions
+
+def encode(code, constants, strings) -> tuple:
+    ''' Turns decoded instructions back into bytes, the inverse of decoder.decode
+
+    Parameters
+    ----------
+    code : list
+        (op code, operand) pairs, without literal strings
+    constants : tuple
+        real constant pool of the program, constants added by the passes go last
+    strings : tuple
+        string pool of the program
+
+    Returns
+    -------
+    tuple
+        bytes, constant pool, string pool, counted loops and procedures, the
+        arguments of Program
+    '''
+    addresses = []
+    address = 0
+    for op, _ in code:
+        addresses.append(address)
+        address += 5 if op in IMMEDIATE_OPCODES else 1
+    addresses.append(address)
+
+    constants = list(constants)
+    strings = list(strings)
+    loops = []
+    procedures = []
+    procedure_index = {}
+    bytecode = bytearray()
+
+    for op, operand in code:
+        bytecode.append(op)
+
+        if op not in IMMEDIATE_OPCODES:
+            continue
+
+        if op in JUMP_OPCODES:
+            operand = addresses[operand]
+        elif op == OPCODE['PUSH_CONST']:
+            if operand not in constants:
+                constants.append(operand)
+            operand = constants.index(operand)
+        elif op == OPCODE['PRINT_STR']:
+            operand = strings.index(operand)
+        elif op == OPCODE['VLOOP']:
+            loops.append(operand.relocated(addresses[operand.exit]))
+            operand = len(loops) - 1
+        elif op == OPCODE['CALL']:
+            # procedures no longer called are left out
+            if operand.name not in procedure_index:
+                procedure_index[operand.name] = len(procedures)
+                procedures.append(operand.relocated(addresses[operand.entry], addresses[operand.end]))
+            operand = procedure_index[operand.name]
+
+        bytecode.extend(byte_packer(operand))
+
+    return bytecode, constants, strings, loops, procedures
+
+def report(original, optimized) -> str:
+    ''' Describes how much smaller a program got
+
+    Parameters
+    ----------
+    original : Program
+        program before optimize
+    optimized : Program
+        program returned by optimize
+
+    Returns
+    -------
+    str
+        instructions and bytes before and after
+    '''
+    def change(before, after):
+        return f'{before} -> {after} ({(before - after) / max(before, 1):.1%} smaller)'
+
+    return f'Instructions: {change(len(original.instructions), len(optimized.instructions))}\n' \
+        f'Bytes: {change(len(original.bytecode), len(optimized.bytecode))}'
@@ -0,0 +1,103 @@
+import sys
+
+class BufferedSink(object):
+    ''' Buffered Sink Class - collects written values and sends them to a binary
+    stream in bulk, once the threshold is reached or when flushed '''
+    THRESHOLD = 4096
+
+    def __init__(self, stream=None, threshold=THRESHOLD) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        stream : binary file or None
+            where the output goes, sys.stdout.buffer if None
+        threshold : int
+            number of values kept before they are written
+        '''
+        self.console = stream is None
+        self.stream = sys.stdout.buffer if stream is None else stream
+        self.threshold = threshold
+        self.pending = []
+
+    def append(self, item) -> None:
+        ''' Adds a written value, sending the pending ones once there are enough '''
+        self.pending.append(item)
+
+        if len(self.pending) >= self.threshold:
+            self.flush()
+
+    def flush(self) -> None:
+        ''' Sends every pending value to the stream with a single write '''
+        if self.pending:
+            text = ''.join(map(str, self.pending))
+            self.pending.clear()
+
+            # anything printed to sys.stdout must come out first
+            if self.console:
+                sys.stdout.flush()
+
+            self.stream.write(text.encode('utf8'))
+
+        self.stream.flush()
+
+    def unsent(self) -> list:
+        ''' Gets the values not sent to the stream yet '''
+        return list(self.pending)
+
+class AsyncSink(BufferedSink):
+    ''' Async Sink Class - collects written values for an asyncio stream writer, the
+    host awaits drain when it yields to the event loop '''
+
+    def __init__(self, writer, threshold=BufferedSink.THRESHOLD) -> None:
+        ''' Initializes artibutes '''
+        super().__init__(writer, threshold)
+        self.console = False
+
+    def flush(self) -> None:
+        ''' Hands every pending value to the writer, which sends them without blocking '''
+        if self.pending:
+            text = ''.join(map(str, self.pending))
+            self.pending.clear()
+            self.stream.write(text.encode('utf8'))
+
+    async def drain(self) -> None:
+        ''' Hands the pending values to the writer and waits until it takes more '''
+        self.flush()
+        await self.stream.drain()
+
+class MemorySink(list):
+    ''' Memory Sink Class - keeps every written value, for library use '''
+
+    def flush(self) -> None:
+        ''' Nothing to send, values stay in memory '''
+        pass
+
+    def getvalue(self) -> str:
+        ''' Gets the output as text
+
+        Returns
+        -------
+        str
+            every written value, in order
+        '''
+        return ''.join(map(str, self))
+
+    def unsent(self) -> list:
+        ''' Gets the values kept in memory, which is all of them '''
+        return list(self)
+
+class NullSink(object):
+    ''' Null Sink Class - drops every written value, for benchmarks '''
+
+    def append(self, item) -> None:
+        ''' Drops a written value '''
+        pass
+
+    def flush(self) -> None:
+        ''' Nothing to send '''
+        pass
+
+    def unsent(self) -> list:
+        ''' Nothing is kept '''
+        return []
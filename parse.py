@@ -1,20 +1,69 @@
+import operator
+
 import tokenizer
 from helper import *
 from constants import *
+from program import Program
+from procedures import Procedure
+from inliner import INLINE_SIZE, scan, relocate
+from vectorize import CountedLoop, analyze
 from loader.lalg_error import LalgError
 import loader.symbol_tables as symbol_tables
 
+# op codes computed while parsing when both operands are literals, called with the
+# second and the top values of the stack, as in the Emulator. Divisions are left to
+# run, the Emulator only keeps integer variables in a typed array if there are none
+FOLDING_FUNCTIONS = {
+    OPCODE['ADD']: operator.add,
+    OPCODE['SUB']: operator.sub,
+    OPCODE['MULTIPLY']: operator.mul,
+    OPCODE['FADD']: operator.add,
+    OPCODE['FSUB']: operator.sub,
+    OPCODE['FMULTIPLY']: operator.mul,
+    OPCODE['EQL']: operator.eq,
+    OPCODE['NEQ']: operator.ne,
+    OPCODE['GTE']: operator.ge,
+    OPCODE['GTR']: operator.lt,
+    OPCODE['LTE']: operator.le,
+    OPCODE['LES']: operator.gt,
+}
+
 class Parser(object):
     ''' Parser Class - parses tokens '''
     SIZE = 5000
 
-    def __init__(self, tokens) -> None:
-        ''' Initializes artibutes '''
+    def __init__(self, tokens, inline_size=INLINE_SIZE) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        tokens : iterable
+            tokens generated by the tokenizer
+        inline_size : int
+            largest procedure body, in instructions, copied into its call sites
+            instead of called, 0 to always call
+        '''
         self.tokens = iter(tokens)
         self.curr_token = None
         self.ip = 0
         self.dp = 0
+        self.frame = 0
+
+        # procedure being declared and the initial values of its frame slots
+        self.current = None
+        self.frame_values = []
+
+        # first slot of each procedure copied into the procedure being declared, or
+        # into the program, and the initial values of copied data segment slots
+        self.inline_bases = {}
+        self.inline_values = {}
         self.symbol_table = []
+        self.constants = []
+        self.strings = []
+        self.loops = []
+        self.procedures = []
+        self.inline_size = inline_size
+        self.calls = []
         self.bytes = bytearray(self.SIZE)
 
     def find_name_in_symbol_table(self, name) -> object:
@@ -30,7 +79,8 @@ class Parser(object):
         symbol or None
             if symbol is found returns it, and None otherwise
         '''
-        for symbol in self.symbol_table:
+        # the latest declaration wins, so procedure locals hide globals
+        for symbol in reversed(self.symbol_table):
             if symbol.name == name:
                 return symbol
         
@@ -82,6 +132,51 @@ class Parser(object):
             self.bytes[self.ip] = byte
             self.ip += 1
 
+    def generate_variable(self, op_code, symbol) -> None:
+        ''' Stores an op code that reads or writes a variable and the variable address,
+        a frame slot for procedure parameters and locals
+
+        Parameters
+        ----------
+        op_code : OPCODE element
+            op code for a global variable, see FRAME_OPCODES
+        symbol : SymbolObject
+            variable
+        '''
+        if symbol.local:
+            op_code = FRAME_OPCODES[op_code]
+
+        self.generate_op_code(op_code)
+        self.generate_address(symbol.dp)
+
+    def generate_constant(self, value) -> None:
+        ''' Stores the index of a real constant in the bytes array, adding it to the
+        constant pool if it is not there yet
+
+        Parameters
+        ----------
+        value : float
+            constant value
+        '''
+        if value not in self.constants:
+            self.constants.append(value)
+
+        self.generate_address(self.constants.index(value))
+
+    def generate_string(self, text) -> None:
+        ''' Stores the index of a literal string in the bytes array, adding it to the
+        string pool if it is not there yet
+
+        Parameters
+        ----------
+        text : str
+            literal string without quotes
+        '''
+        if text not in self.strings:
+            self.strings.append(text)
+
+        self.generate_address(self.strings.index(text))
+
     def parse(self) -> object:
         ''' Parses tokens 
         
@@ -101,44 +196,96 @@ class Parser(object):
         self.match(tokenizer.TOKEN_ID)
         self.match(tokenizer.TOKEN_SEMICOLON)
         
-        # consumes comments
-        while self.curr_token.type_of == 'TK_COMMENT':
-            self.match(tokenizer.TOKEN_COMMENT)
-
         # matches watch comes next - variable declarations, procedures or begin
-        if self.curr_token.type_of == 'TK_VAR':
-            self.variable_declaration()
-        elif self.curr_token.type_of == 'TK_PROCEDURE':
-            while self.curr_token.type_of == 'TK_PROCEDURE':
+        while self.curr_token.type_of != 'TK_BEGIN':
+            if self.curr_token.type_of == 'TK_COMMENT':
+                self.match(tokenizer.TOKEN_COMMENT)
+            elif self.curr_token.type_of == 'TK_VAR':
+                self.variable_declaration()
+            elif self.curr_token.type_of == 'TK_PROCEDURE':
                 self.procedure_declaration()
-            self.begin()
-        elif self.curr_token.type_of == 'TK_BEGIN':
-            self.begin()
-        else:
-            raise LalgError(f'Invalid token when parsing')
+            else:
+                raise LalgError(f'Invalid token when parsing')
 
+        self.begin()
         return self.bytes
 
+    def data_segment(self) -> list:
+        ''' Lays out the data segment, one slot per address handed out while parsing
+
+        Returns
+        -------
+        list
+            initial value of each slot, 0 for integers, 0.0 for reals and None for
+            slots that do not hold a variable
+        '''
+        segment = [None] * self.dp
+
+        for symbol in self.symbol_table:
+            if symbol.data_type == tokenizer.TOKEN_DATA_TYPE_INT:
+                segment[symbol.dp] = 0
+            elif symbol.data_type == tokenizer.TOKEN_DATA_TYPE_REAL:
+                segment[symbol.dp] = 0.0
+
+        for address, value in self.inline_values.items():
+            segment[address] = value
+
+        return segment
+
+    def program(self) -> Program:
+        ''' Packs everything generated by parse into a Program, which can be run any
+        number of times without parsing again
+
+        Raises
+        ------
+        LalgError
+            if the generated bytes can not be decoded
+
+        Returns
+        -------
+        Program
+            bytes, data segment, constant pool, string pool, counted loops and procedures
+        '''
+        return Program(self.bytes[:self.ip], self.data_segment(), self.constants, self.strings, self.loops,
+                       self.procedures)
+
     def var_already_declared(self, declarations) -> bool:
         ''' Checks if a variable was already declared '''
         return self.curr_token.value_of in declarations
 
-    def variable_declaration(self, procedure=False) -> None:
+    def variable_declaration(self, local=False) -> None:
         ''' Deals with variable declarations 
         
         Parameters
         ----------
-        procedure : bool
-            whether this comes or not from a procedure
+        local : bool
+            whether the variables are locals of a procedure
+
+        Raises
+        ------
+        LalgError
+            if variable was already declared
+            if variable type is invalid
+        '''
+        self.match('TK_VAR')
+        declarations, data_type = self.variable_list()
+        self.match(tokenizer.TOKEN_SEMICOLON)
+        self.declare(declarations, data_type, local)
+
+    def variable_list(self) -> tuple:
+        ''' Deals with variables declared together, names followed by their type
 
         Raises
         ------
         LalgError
             if variable was already declared
             if variable type is invalid
+
+        Returns
+        -------
+        tuple
+            variable names and their data type
         '''
-        if not procedure:
-            self.match('TK_VAR')
         declarations = []
 
         # gets all variables declared in the same line
@@ -164,29 +311,33 @@ class Parser(object):
         else:
             raise LalgError(f'{self.curr_token.type_of} data type is invalid at {self.curr_token.row} {self.curr_token.column}')
 
-        if procedure:
-            self.match(tokenizer.TOKEN_OPERATOR_RIGHT_PAREN)
-        
-        self.match(tokenizer.TOKEN_SEMICOLON)
-        
-        # adds all variables to the symbols table
+        return declarations, data_type
+
+    def declare(self, declarations, data_type, local=False) -> None:
+        ''' Adds variables to the symbols table, globals get a data segment address
+        and procedure parameters and locals a slot in the frame of each call
+
+        Parameters
+        ----------
+        declarations : list
+            variable names
+        data_type : str
+            type of every variable
+        local : bool
+            whether the variables belong to the procedure being declared
+        '''
         for variable in declarations:
             new_symbol = symbol_tables.SymbolObject(name=variable,
                                                     object_type=symbol_tables.TYPE_VARIABLE,
                                                     data_type=data_type,
-                                                    dp=self.dp)
+                                                    dp=self.frame if local else self.dp,
+                                                    attribute={'local': local})
             self.symbol_table.append(new_symbol)
-            self.dp += 1
-        
-        # Checks what to do next
-        if self.curr_token.type_of == 'TK_VAR':
-            self.variable_declaration()
-        elif self.curr_token.type_of == 'TK_PROCEDURE':
-            self.procedure_declaration()
-        elif self.curr_token.type_of == 'TK_BEGIN':
-            self.begin()
-        else:
-            raise LalgError(f'Invalid token when parsing')
+
+            if local:
+                self.frame += 1
+            else:
+                self.dp += 1
 
     def begin(self) -> None:
         ''' Matches the format of a lalg code '''
@@ -207,7 +358,12 @@ class Parser(object):
             elif type_of == 'TK_READ':
                 self.read_statement()
             elif type_of == tokenizer.TOKEN_ID:
-                self.assignment_statement()
+                symbol = self.find_name_in_symbol_table(self.curr_token.value_of)
+
+                if symbol is not None and symbol.object_type == symbol_tables.TYPE_PROCEDURE:
+                    self.call_statement()
+                else:
+                    self.assignment_statement()
             elif type_of == 'TK_WHILE':
                 self.while_statement()
             elif type_of == 'TK_REPEAT':
@@ -263,14 +419,9 @@ class Parser(object):
 
         # check if variable type and value type match
         if rhs_type == tokenizer.TOKEN_CHARACTER:
-            self.generate_op_code(OPCODE['POP_CHAR'])
-            self.generate_address(symbol.dp)
-        elif lhs_type == tokenizer.TOKEN_DATA_TYPE_REAL and rhs_type == tokenizer.TOKEN_REAL_LIT:
-            self.generate_op_code(OPCODE['POP_REAL_LIT'])
-            self.generate_address(symbol.dp)
+            self.generate_variable(OPCODE['POP_CHAR'], symbol)
         elif lhs_type == rhs_type:
-            self.generate_op_code(OPCODE['POP'])
-            self.generate_address(symbol.dp)
+            self.generate_variable(OPCODE['POP'], symbol)
         else:
             raise LalgError(f'Type mismatch expected {lhs_type} and got {rhs_type}')
 
@@ -294,11 +445,9 @@ class Parser(object):
 
             # adds read opcodes
             if lhs_type == tokenizer.TOKEN_DATA_TYPE_INT:
-                self.generate_op_code(OPCODE['READ_INT'])
-                self.generate_address(symbol.dp)
+                self.generate_variable(OPCODE['READ_INT'], symbol)
             elif lhs_type == tokenizer.TOKEN_DATA_TYPE_REAL:
-                self.generate_op_code(OPCODE['READ_REAL'])
-                self.generate_address(symbol.dp)
+                self.generate_variable(OPCODE['READ_REAL'], symbol)
             else:
                 raise LalgError(f'Invalid type {lhs_type}')
 
@@ -321,6 +470,7 @@ class Parser(object):
             operation result
         '''
         # gets one operator
+        start = self.ip
         t1 = self.t()
 
         # does the operation with the respective operators
@@ -329,8 +479,10 @@ class Parser(object):
 
             op = self.curr_token.type_of
             self.match(op)
+            middle = self.ip
             t2 = self.t()
             t1 = self.emit(op, t1, t2)
+            self.fold(start, middle)
 
         return t1
 
@@ -343,6 +495,7 @@ class Parser(object):
             operation result
         '''
         # gets one operator
+        start = self.ip
         t1 = self.f()
 
         # does the operation with the respective operators
@@ -352,11 +505,63 @@ class Parser(object):
 
             op = self.curr_token.type_of
             self.match(op)
+            middle = self.ip
             t2 = self.f()
             t1 = self.emit(op, t1, t2)
+            self.fold(start, middle)
 
         return t1
 
+    def constant_between(self, start, end) -> object:
+        ''' Gets the value pushed by the code between two addresses
+
+        Returns
+        -------
+        int, float or None
+            the value, None if the code is not a single PUSHI or PUSH_CONST
+        '''
+        if end - start != 5:
+            return None
+
+        operand = byte_unpacker(self.bytes[start + 1:end])
+
+        if self.bytes[start] == OPCODE['PUSHI']:
+            return operand
+        elif self.bytes[start] == OPCODE['PUSH_CONST']:
+            return self.constants[operand]
+
+        return None
+
+    def fold(self, start, middle) -> None:
+        ''' Replaces the code of an operation whose operands are both constants by a
+        single push of its result, computed as the Emulator would. Integer results
+        PUSHI does not hold are left to run.
+
+        Parameters
+        ----------
+        start : int
+            address of the code of the left operand
+        middle : int
+            address of the code of the right operand, the operation is right after it
+        '''
+        op = self.bytes[self.ip - 1]
+        left = self.constant_between(start, middle)
+        right = self.constant_between(middle, self.ip - 1)
+
+        if op not in FOLDING_FUNCTIONS or left is None or right is None:
+            return
+
+        value = FOLDING_FUNCTIONS[op](left, right)
+
+        if isinstance(value, float):
+            self.ip = start
+            self.generate_op_code(OPCODE['PUSH_CONST'])
+            self.generate_constant(value)
+        elif 0 <= value < 1 << 31:
+            self.ip = start
+            self.generate_op_code(OPCODE['PUSHI'])
+            self.generate_address(int(value))
+
     def generate_pushi_and_address(self, to_match):
         ''' Adds value and operator to the operations codes to be executed '''
         self.generate_op_code(OPCODE['PUSHI'])
@@ -383,8 +588,7 @@ class Parser(object):
             symbol = self.find_name_or_error()
 
             if symbol.object_type == symbol_tables.TYPE_VARIABLE:
-                self.generate_op_code(OPCODE['PUSH'])
-                self.generate_address(symbol.dp)
+                self.generate_variable(OPCODE['PUSH'], symbol)
                 self.match(tokenizer.TOKEN_ID)
                 return symbol.data_type
         elif token_type == 'TK_NOT': # not 
@@ -404,10 +608,10 @@ class Parser(object):
             self.match(tokenizer.TOKEN_DATA_TYPE_REAL)
             return tokenizer.TOKEN_DATA_TYPE_REAL
         elif token_type == tokenizer.TOKEN_REAL_LIT: # float literal value
-            self.generate_op_code(OPCODE['PUSHI'])
-            self.generate_address(self.curr_token.value_of)
+            self.generate_op_code(OPCODE['PUSH_CONST'])
+            self.generate_constant(float(self.curr_token.value_of))
             self.match(tokenizer.TOKEN_REAL_LIT)
-            return tokenizer.TOKEN_REAL_LIT
+            return tokenizer.TOKEN_DATA_TYPE_REAL
         else:
             raise LalgError(f'f() does not support {self.curr_token.value_of} {token_type}')
 
@@ -424,6 +628,7 @@ class Parser(object):
         object
             condition result
         '''
+        start = self.ip
         t1 = self.e()
         value_of = self.curr_token.value_of
 
@@ -432,8 +637,10 @@ class Parser(object):
         
         type_of = self.curr_token.type_of
         self.match(type_of)
+        middle = self.ip
         t2 = self.e()
         t1 = self.emit(type_of, t1, t2)
+        self.fold(start, middle)
 
         return t1
 
@@ -453,15 +660,12 @@ class Parser(object):
         -------
         Bool Token or None       
         '''
+        # integers are compared with floats as they are, without conversion
         if t1 == t2:
             self.generate_op_code(op)
         elif t1 == tokenizer.TOKEN_DATA_TYPE_INT and t2 == tokenizer.TOKEN_DATA_TYPE_REAL:
-            self.generate_op_code(OPCODE['XCHG'])
-            self.generate_op_code(OPCODE['CVR'])
-            self.generate_op_code(OPCODE['XCHG'])
             self.generate_op_code(op)
         elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_DATA_TYPE_INT:
-            self.generate_op_code(OPCODE['CVR'])
             self.generate_op_code(op)
         elif t1 == 'TK_CHAR' and t2 == tokenizer.TOKEN_CHARACTER:
             self.generate_op_code(op)
@@ -498,13 +702,9 @@ class Parser(object):
                 self.generate_op_code(OPCODE['ADD'])
                 return tokenizer.TOKEN_DATA_TYPE_INT
             elif t1 == tokenizer.TOKEN_DATA_TYPE_INT and t2 == tokenizer.TOKEN_DATA_TYPE_REAL: # integer and float
-                self.generate_op_code(OPCODE['XCHG'])
-                self.generate_op_code(OPCODE['CVR'])
-                self.generate_op_code(OPCODE['XCHG'])
                 self.generate_op_code(OPCODE['FADD'])
                 return tokenizer.TOKEN_DATA_TYPE_REAL
             elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_DATA_TYPE_INT: # float and int
-                self.generate_op_code(OPCODE['CVR'])
                 self.generate_op_code(OPCODE['FADD'])
                 return tokenizer.TOKEN_DATA_TYPE_REAL
             elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_DATA_TYPE_REAL: # float and float
@@ -518,13 +718,9 @@ class Parser(object):
                 self.generate_op_code(OPCODE['SUB'])
                 return tokenizer.TOKEN_DATA_TYPE_INT
             elif t1 == tokenizer.TOKEN_DATA_TYPE_INT and t2 == tokenizer.TOKEN_DATA_TYPE_REAL: # int and float
-                self.generate_op_code(OPCODE['XCHG'])
-                self.generate_op_code(OPCODE['CVR'])
-                self.generate_op_code(OPCODE['XCHG'])
                 self.generate_op_code(OPCODE['FSUB'])
                 return tokenizer.TOKEN_DATA_TYPE_REAL
             elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_DATA_TYPE_INT: # float and int
-                self.generate_op_code(OPCODE['CVR'])
                 self.generate_op_code(OPCODE['FSUB'])
                 return tokenizer.TOKEN_DATA_TYPE_REAL
             elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_DATA_TYPE_REAL: # between floats
@@ -538,21 +734,14 @@ class Parser(object):
                 if t1 == tokenizer.TOKEN_DATA_TYPE_INT:
                     self.generate_op_code(OPCODE['DIVIDE'])
                 elif t2 == tokenizer.TOKEN_DATA_TYPE_REAL:
-                    self.generate_op_code(OPCODE['FDIVIDE'])
+                    self.generate_op_code(OPCODE['DIVIDE'])
                 return t1
             elif t1 == tokenizer.TOKEN_DATA_TYPE_INT and t2 == tokenizer.TOKEN_DATA_TYPE_REAL: # int and float
-                self.generate_op_code(OPCODE['XCHG'])
-                self.generate_op_code(OPCODE['CVR'])
-                self.generate_op_code(OPCODE['XCHG'])
                 self.generate_op_code(OPCODE['DIVIDE'])
                 return tokenizer.TOKEN_DATA_TYPE_REAL
             elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_DATA_TYPE_INT: # float and int
-                self.generate_op_code(OPCODE['CVR'])
                 self.generate_op_code(OPCODE['DIVIDE'])
                 return tokenizer.TOKEN_DATA_TYPE_REAL
-            elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_REAL_LIT: # float and literal float
-                self.generate_op_code(OPCODE['FDIVIDE'])
-                return t1
             else:
                 raise LalgError(f'Unable to match operation / with types {t1} and {t2}')
 
@@ -568,13 +757,9 @@ class Parser(object):
                 self.generate_op_code(OPCODE['MULTIPLY'])
                 return tokenizer.TOKEN_DATA_TYPE_INT
             elif t1 == tokenizer.TOKEN_DATA_TYPE_INT and t2 == tokenizer.TOKEN_DATA_TYPE_REAL: # int and float
-                self.generate_op_code(OPCODE['XCHG'])
-                self.generate_op_code(OPCODE['CVR'])
-                self.generate_op_code(OPCODE['XCHG'])
                 self.generate_op_code(OPCODE['FMULTIPLY'])
                 return tokenizer.TOKEN_DATA_TYPE_REAL
             elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_DATA_TYPE_INT: # float and int
-                self.generate_op_code(OPCODE['CVR'])
                 self.generate_op_code(OPCODE['FMULTIPLY'])
                 return tokenizer.TOKEN_DATA_TYPE_REAL
             elif t1 == tokenizer.TOKEN_DATA_TYPE_REAL and t2 == tokenizer.TOKEN_DATA_TYPE_REAL: # between floats
@@ -619,17 +804,19 @@ class Parser(object):
         while True:
             if self.curr_token.type_of == tokenizer.TOKEN_ID: # prints variable
                 symbol = self.find_name_or_error()
+
+                # the expression only gives the type, the variable itself is printed,
+                # so its code is dropped instead of leaving a value on the stack
+                save = self.ip
                 expression = self.e()
+                self.ip = save
 
                 if expression == tokenizer.TOKEN_DATA_TYPE_INT:
-                    self.generate_op_code(OPCODE['PRINT_I'])
-                    self.generate_address(symbol.dp)
+                    self.generate_variable(OPCODE['PRINT_I'], symbol)
                 elif expression == tokenizer.TOKEN_DATA_TYPE_CHAR:
-                    self.generate_op_code(OPCODE['PRINT_C'])
-                    self.generate_address(symbol.dp)
+                    self.generate_variable(OPCODE['PRINT_C'], symbol)
                 elif expression == tokenizer.TOKEN_DATA_TYPE_REAL:
-                    self.generate_op_code(OPCODE['PRINT_R'])
-                    self.generate_address(symbol.dp)
+                    self.generate_variable(OPCODE['PRINT_R'], symbol)
                 else:
                     raise LalgError(f'write does not support symbol {str(symbol)}')
 
@@ -642,15 +829,8 @@ class Parser(object):
                 self.generate_address(self.curr_token.value_of)
                 self.match(tokenizer.TOKEN_CHARACTER)
             elif self.curr_token.type_of == tokenizer.TOKEN_STRING_LIT: # literal string
-                self.generate_op_code(OPCODE['PUSHI'])
-                s = self.curr_token.value_of[1:-1]
-                self.generate_address(len(s))
-                self.generate_op_code(OPCODE['PRINT_STR_LIT'])
-
-                for byte in bytearray(s, encoding='utf8'):
-                    self.bytes[self.ip] = byte
-                    self.ip += 1
-
+                self.generate_op_code(OPCODE['PRINT_STR'])
+                self.generate_string(self.curr_token.value_of[1:-1])
                 self.match(tokenizer.TOKEN_STRING_LIT)
 
             # checks if there are more variables to read
@@ -697,19 +877,25 @@ class Parser(object):
         ''' Deals with if statements '''
 
         self.match('TK_IF')
+        start = self.ip
         self.condition()
         self.match('TK_THEN')
+
+        # a constant condition keeps only the code of the branch it takes
+        value = self.constant_between(start, self.ip)
+        if value is not None:
+            self.ip = start
+            self.constant_branch(self.then_branch, value)
+
+            if self.curr_token.type_of == 'TK_ELSE':
+                self.match('TK_ELSE')
+                self.constant_branch(self.statements, not value)
+            return
+
         self.generate_op_code(OPCODE['JFALSE'])
         hole = self.ip
         self.generate_address(0)
-
-        # nested begins
-        if self.curr_token.type_of == 'TK_BEGIN':
-            self.match('TK_BEGIN')
-            self.statements()
-            self.match('TK_END')
-        else:
-            self.statements()
+        self.then_branch()
 
         # checks for an else
         if self.curr_token.type_of == 'TK_ELSE':
@@ -729,19 +915,58 @@ class Parser(object):
         self.generate_address(save)
         self.ip = save
 
+    def then_branch(self) -> None:
+        ''' Deals with the statements run when the condition of an if holds '''
+        # nested begins
+        if self.curr_token.type_of == 'TK_BEGIN':
+            self.match('TK_BEGIN')
+            self.statements()
+            self.match('TK_END')
+        else:
+            self.statements()
+
+    def constant_branch(self, parse, taken) -> None:
+        ''' Parses a branch of an if whose condition is constant, its code is dropped
+        if it is never taken
+
+        Parameters
+        ----------
+        parse : function
+            parses the branch
+        taken : bool
+            whether the branch runs
+        '''
+        save = self.ip
+        pools = (self.loops, self.calls, self.constants, self.strings, self.frame_values)
+        sizes = [len(pool) for pool in pools]
+        slots = (self.dp, self.frame, dict(self.inline_bases), dict(self.inline_values))
+        parse()
+
+        # loops, calls, constants and inlined slots of the dropped code go with it
+        if not taken:
+            self.ip = save
+            for pool, size in zip(pools, sizes):
+                del pool[size:]
+            self.dp, self.frame, self.inline_bases, self.inline_values = slots
+
     def for_statement(self):
         ''' Deals with for statements '''
         self.match('TK_FOR')
         value_of = self.curr_token.value_of
         self.assignment_statement()
-        target = self.ip
         symbol = self.find_name_in_symbol_table(value_of)
 
+        # a jump to the next instruction, replaced by VLOOP if the body can be vectorized
+        placeholder = self.ip
+        self.generate_op_code(OPCODE['JMP'])
+        self.generate_address(self.ip + 4)
+        target = self.ip
+
         self.match('TK_TO')
-        self.generate_op_code(OPCODE['PUSH'])
-        self.generate_address(symbol.dp)
+        bound = self.curr_token.value_of
+        self.generate_variable(OPCODE['PUSH'], symbol)
         self.generate_op_code(OPCODE['PUSHI'])
-        self.generate_address(self.curr_token.value_of)
+        self.generate_address(bound)
         self.generate_op_code(OPCODE['LTE'])
         self.match(tokenizer.TOKEN_DATA_TYPE_INT)
 
@@ -749,19 +974,19 @@ class Parser(object):
         self.generate_op_code(OPCODE['JFALSE'])
         hole = self.ip
         self.generate_address(0)
+        body = self.ip
 
         self.match('TK_BEGIN')
         self.statements()
 
         self.match('TK_END')
         self.match(tokenizer.TOKEN_SEMICOLON)
-        self.generate_op_code(OPCODE['PUSH'])
-        self.generate_address(symbol.dp)
+        body_end = self.ip
+        self.generate_variable(OPCODE['PUSH'], symbol)
         self.generate_op_code(OPCODE['PUSHI'])
         self.generate_address(1)
         self.generate_op_code(OPCODE['ADD'])
-        self.generate_op_code(OPCODE['POP'])
-        self.generate_address(symbol.dp)
+        self.generate_variable(OPCODE['POP'], symbol)
         self.generate_op_code(OPCODE['JMP'])
         self.generate_address(target)
         save = self.ip
@@ -769,6 +994,15 @@ class Parser(object):
         self.generate_address(save)
         self.ip = save
 
+        # counted loops compute over the data segment, a local counter is in a frame
+        statements = None if symbol.local else analyze(bytes(self.bytes[body:body_end]), self.constants, symbol.dp)
+        if statements:
+            self.loops.append(CountedLoop(symbol.dp, int(bound), save, statements))
+            self.ip = placeholder
+            self.generate_op_code(OPCODE['VLOOP'])
+            self.generate_address(len(self.loops) - 1)
+            self.ip = save
+
     def case_statement(self):
         ''' Deals with case statements '''
         self.match('TK_CASE')
@@ -806,8 +1040,7 @@ class Parser(object):
                 symbol = self.find_name_in_symbol_table(checker.value_of)
 
                 if symbol is not None:
-                    self.generate_op_code(OPCODE['PUSH'])
-                    self.generate_address(symbol.dp)
+                    self.generate_variable(OPCODE['PUSH'], symbol)
 
         self.match('TK_END')
         self.match(tokenizer.TOKEN_SEMICOLON)
@@ -820,43 +1053,215 @@ class Parser(object):
         self.ip = save
 
     def procedure_declaration(self) -> None:
-        ''' Deals with procedure declarations '''
+        ''' Deals with procedure declarations, the body is skipped by a jump and run by
+        CALL with the parameters and locals in a frame of its own
+
+        Raises
+        ------
+        LalgError
+            if the procedure was already declared
+        '''
         # matches procedure format
         self.match('TK_PROCEDURE')
-        procedure = self.curr_token
+        name = self.curr_token.value_of
         self.match(tokenizer.TOKEN_ID)
+
+        if any(procedure.name == name for procedure in self.procedures):
+            raise LalgError(f'Procedure already declared: {name}')
+
+        # the symbol is added first, so the body can call the procedure itself
+        symbol = symbol_tables.SymbolObject(name=name,
+                                            object_type=symbol_tables.TYPE_PROCEDURE,
+                                            data_type=None,
+                                            attribute={
+                                                'index': len(self.procedures),
+                                                'params': []
+                                            })
+        self.symbol_table.append(symbol)
+        scope = len(self.symbol_table)
+        self.frame = 0
+        self.current = name
+        self.inline_bases = {}
+
+        # parameters are groups of variables separated by semicolons
         self.match(tokenizer.TOKEN_OPERATOR_LEFT_PAREN)
-        self.variable_declaration(procedure=True)
+        while self.curr_token.type_of == tokenizer.TOKEN_ID:
+            declarations, data_type = self.variable_list()
+            self.declare(declarations, data_type, local=True)
+            symbol.params.extend([data_type] * len(declarations))
+
+            if self.curr_token.type_of == tokenizer.TOKEN_SEMICOLON:
+                self.match(tokenizer.TOKEN_SEMICOLON)
+        self.match(tokenizer.TOKEN_OPERATOR_RIGHT_PAREN)
         self.match(tokenizer.TOKEN_SEMICOLON)
 
+        while self.curr_token.type_of == 'TK_VAR':
+            self.variable_declaration(local=True)
+
+        self.frame_values = [0 if local.data_type == tokenizer.TOKEN_DATA_TYPE_INT else 0.0
+                             for local in self.symbol_table[scope:]]
+
         self.generate_op_code(OPCODE['JMP'])
         hole = self.ip
         self.generate_address(0)
-
-        # adds symbol for the procedure
-        symbol = symbol_tables.SymbolObject(name=procedure.value_of,
-                                            object_type='TK_PROCEDURE',
-                                            data_type=symbol_tables.TYPE_PROCEDURE,
-                                            dp=self.dp,
-                                            attribute={
-                                                'ip': self.ip,
-                                                'ret': -1
-                                            })
+        entry = self.ip
 
         # matches the procedure itself
         self.match('TK_BEGIN')
         self.statements()
         self.match('TK_END')
         self.match(tokenizer.TOKEN_SEMICOLON)
+        self.generate_op_code(OPCODE['RET'])
 
-        self.generate_op_code(OPCODE['JMP'])
-        symbol.ret = self.ip
-        self.generate_address(0)
+        # the frame also holds the slots of the procedures copied into the body
+        params = len(symbol.params)
+        self.procedures.append(Procedure(name, entry, self.ip, params, self.frame_values[params:]))
 
-        self.symbol_table.append(symbol)
-        self.dp += 1
+        # parameters and locals are only visible inside the procedure
+        del self.symbol_table[scope:]
+        self.current = None
+        self.inline_bases = {}
 
         save = self.ip
         self.ip = hole
         self.generate_address(save)
-        self.ip = save
\ No newline at end of file
+        self.ip = save
+
+    def call_statement(self) -> None:
+        ''' Deals with procedure calls, the arguments are pushed in order and CALL
+        moves them into the frame of the call. Small procedures are copied instead,
+        see inline
+
+        Raises
+        ------
+        LalgError
+            if the number of arguments does not match the parameters
+            if an argument type does not match its parameter
+        '''
+        symbol = self.find_name_or_error()
+        row, column = self.curr_token.row, self.curr_token.column
+        self.match(tokenizer.TOKEN_ID)
+        arguments = 0
+
+        if self.curr_token.type_of == tokenizer.TOKEN_OPERATOR_LEFT_PAREN:
+            self.match(tokenizer.TOKEN_OPERATOR_LEFT_PAREN)
+
+            while self.curr_token.type_of != tokenizer.TOKEN_OPERATOR_RIGHT_PAREN:
+                if arguments == len(symbol.params):
+                    raise LalgError(f'Too many arguments for procedure {symbol.name}')
+
+                # integers are converted for real parameters
+                param_type = symbol.params[arguments]
+                arg_type = self.e()
+                if param_type == tokenizer.TOKEN_DATA_TYPE_REAL and arg_type == tokenizer.TOKEN_DATA_TYPE_INT:
+                    self.generate_op_code(OPCODE['CVR'])
+                elif param_type != arg_type:
+                    raise LalgError(f'Type mismatch expected {param_type} and got {arg_type}')
+
+                arguments += 1
+                if self.curr_token.type_of == tokenizer.TOKEN_OPERATOR_COMMA:
+                    self.match(tokenizer.TOKEN_OPERATOR_COMMA)
+
+            self.match(tokenizer.TOKEN_OPERATOR_RIGHT_PAREN)
+
+        if arguments != len(symbol.params):
+            raise LalgError(f'Procedure {symbol.name} expects {len(symbol.params)} arguments, got {arguments}')
+
+        reason = self.inline_refusal(symbol)
+        if reason is None:
+            self.inline(symbol)
+        else:
+            self.generate_op_code(OPCODE['CALL'])
+            self.generate_address(symbol.index)
+
+        self.calls.append((self.current, symbol.name, row, column, reason))
+
+    def procedure_body(self, procedure) -> bytes:
+        ''' Gets the bytes of a procedure, without its RET '''
+        return bytes(self.bytes[procedure.entry:procedure.end - 1])
+
+    def inline_refusal(self, symbol) -> str:
+        ''' Checks if a call can be replaced by a copy of the procedure body
+
+        Returns
+        -------
+        str or None
+            why the procedure is called instead, None if it can be copied
+        '''
+        # the procedure being declared is not complete, it calls itself
+        if symbol.index >= len(self.procedures):
+            return 'recursive'
+
+        procedure = self.procedures[symbol.index]
+        instructions = scan(self.procedure_body(procedure))
+
+        if instructions is None:
+            return 'body can not be copied'
+        if any(op == OPCODE['CALL'] and operand == symbol.index for _, op, operand in instructions):
+            return 'recursive'
+        if len(instructions) > self.inline_size:
+            return f'{len(instructions)} instructions'
+
+        return None
+
+    def inline(self, symbol) -> None:
+        ''' Copies the body of a procedure in place of a call, its parameters and
+        locals get slots of the procedure being declared, or of the data segment in
+        the program. The arguments already pushed are popped into the parameters.
+        '''
+        procedure = self.procedures[symbol.index]
+        values = [0 if data_type == tokenizer.TOKEN_DATA_TYPE_INT else 0.0 for data_type in symbol.params]
+        values.extend(procedure.initial)
+        local = self.current is not None
+
+        # every copy of a procedure shares its slots, copies never run nested
+        if procedure.name not in self.inline_bases:
+            if local:
+                self.inline_bases[procedure.name] = self.frame
+                self.frame += len(values)
+                self.frame_values.extend(values)
+            else:
+                self.inline_bases[procedure.name] = self.dp
+                for value in values:
+                    self.inline_values[self.dp] = value
+                    self.dp += 1
+
+        base = self.inline_bases[procedure.name]
+        pop = OPCODE['POP_LOCAL'] if local else OPCODE['POP']
+
+        # the last argument is on top of the stack
+        for slot in reversed(range(procedure.params)):
+            self.generate_op_code(pop)
+            self.generate_address(base + slot)
+
+        # locals start from their initial value on every call
+        for slot, value in enumerate(procedure.initial, procedure.params):
+            if isinstance(value, float):
+                self.generate_op_code(OPCODE['PUSH_CONST'])
+                self.generate_constant(value)
+            else:
+                self.generate_op_code(OPCODE['PUSHI'])
+                self.generate_address(value)
+
+            self.generate_op_code(pop)
+            self.generate_address(base + slot)
+
+        copy = relocate(self.procedure_body(procedure), procedure.entry, self.ip, base, local, self.loops)
+        self.bytes[self.ip:self.ip + len(copy)] = copy
+        self.ip += len(copy)
+
+    def inline_report(self) -> str:
+        ''' Describes every procedure call, copied or not
+
+        Returns
+        -------
+        str
+            one line per call
+        '''
+        lines = [f'Inline size: {self.inline_size} instructions']
+
+        for caller, name, row, column, reason in self.calls:
+            where = f'{name} in {caller or "program"} at {row}:{column}'
+            lines.append(f'inlined {where}' if reason is None else f'called {where}, {reason}')
+
+        return '\n'.join(lines)
@@ -0,0 +1,35 @@
+class Procedure(object):
+    ''' Procedure Class - a procedure declared in a lalg program, run by CALL. Its
+    parameters and locals live in a frame pushed by each call and popped by RET,
+    parameters in the first slots and locals after them. '''
+
+    def __init__(self, name, entry, end, params, initial) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        name : str
+            procedure name
+        entry : int
+            byte address, or instruction index once decoded, of the first instruction
+        end : int
+            byte address, or instruction index once decoded, right after RET
+        params : int
+            number of parameters, popped from the stack into the new frame
+        initial : tuple
+            initial value of each local, 0 for integers and 0.0 for reals
+        '''
+        self.name = name
+        self.entry = entry
+        self.end = end
+        self.params = params
+        self.initial = tuple(initial)
+        self.size = params + len(self.initial)
+
+    def relocated(self, entry, end) -> object:
+        ''' Creates the same procedure at other addresses '''
+        return Procedure(self.name, entry, end, self.params, self.initial)
+
+    def __repr__(self) -> str:
+        ''' Creates a string representation of the class '''
+        return f'<procedure {self.name}, {self.params} parameters, {len(self.initial)} locals>'
@@ -0,0 +1,65 @@
+from constants import *
+from decoder import decode, max_stack_depth
+
+class Program(object):
+    ''' Program Class - compiled program, generated by the Parser. It is immutable,
+    so the same Program can be run any number of times, each run keeps its own
+    state in a new Emulator '''
+    __slots__ = ('bytecode', 'data_segment', 'constants', 'strings', 'loops', 'procedures',
+        'instructions', 'stack_size')
+
+    def __init__(self, bytecode, data_segment=None, constants=(), strings=(), loops=(), procedures=()) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        bytecode : bytes
+            bytes generated by the Parser
+        data_segment : list or None
+            initial value of each variable slot, generated by Parser.data_segment. If
+            None, it is sized from the highest address used by the instructions
+        constants : list
+            real constant pool
+        strings : list
+            string pool
+        loops : list
+            counted loops run by VLOOP, see vectorize
+        procedures : list
+            procedures run by CALL, see procedures
+
+        Raises
+        ------
+        LalgError
+            if the bytes can not be decoded
+            if the stack does not balance
+        '''
+        instructions = tuple(decode(bytecode, list(constants), list(strings), list(loops),
+                                   list(procedures)))
+
+        if data_segment is None:
+            addresses = [operand for op, operand in instructions if op in ADDRESS_OPCODES]
+            data_segment = [0] * (max(addresses, default=-1) + 1)
+
+        # decoding and the stack analysis are done once, not once per run
+        object.__setattr__(self, 'bytecode', bytes(bytecode))
+        object.__setattr__(self, 'data_segment', tuple(data_segment))
+        object.__setattr__(self, 'constants', tuple(constants))
+        object.__setattr__(self, 'strings', tuple(strings))
+        object.__setattr__(self, 'loops', tuple(loops))
+        object.__setattr__(self, 'procedures', tuple(procedures))
+        object.__setattr__(self, 'instructions', instructions)
+        object.__setattr__(self, 'stack_size', max_stack_depth(instructions))
+
+    def __setattr__(self, name, value) -> None:
+        ''' Forbids changes, a Program is shared by all of its runs '''
+        raise AttributeError('Program is immutable')
+
+    @property
+    def data_size(self) -> int:
+        ''' Number of slots in the data segment '''
+        return len(self.data_segment)
+
+    def __repr__(self) -> str:
+        ''' Creates a string representation of the class '''
+        return f'<program {len(self.instructions)} instructions, {self.data_size} variables, ' \
+            f'{len(self.constants)} constants, {len(self.strings)} strings>'
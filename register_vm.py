@@ -0,0 +1,461 @@
+from helper import *
+from constants import *
+from emulator import Emulator, Halted
+from output import BufferedSink
+from inputs import ConsoleInput
+from loader.lalg_error import LalgError
+
+# op codes combining the two top values of the stack into one
+BINARY_OPCODES = {
+    OPCODE['ADD'], OPCODE['SUB'], OPCODE['MULTIPLY'], OPCODE['DIVIDE'], OPCODE['DIV'],
+    OPCODE['FADD'], OPCODE['FSUB'], OPCODE['FMULTIPLY'], OPCODE['FDIVIDE'],
+    OPCODE['GTE'], OPCODE['GTR'], OPCODE['LTE'], OPCODE['LES'], OPCODE['EQL'], OPCODE['NEQ'],
+}
+
+# op codes that write a variable with the top of the stack
+STORE_OPCODES = {OPCODE['POP'], OPCODE['POP_CHAR'], OPCODE['POP_REAL_LIT']}
+
+# op codes that add a variable to the output
+PRINT_OPCODES = {OPCODE['PRINT_I'], OPCODE['PRINT_R'], OPCODE['PRINT_C']}
+
+# op codes with a variable address as operand
+VARIABLE_OPCODES = STORE_OPCODES | PRINT_OPCODES | {
+    OPCODE['PUSH'], OPCODE['READ_INT'], OPCODE['READ_REAL'],
+}
+
+class RegisterCompiler(object):
+    ''' Register Compiler Class - generates register code from the stack code.
+
+    Every register instruction names its destination and source slots, e.g.
+    `a := b + c` becomes ADD a, b, c instead of PUSH, PUSH, ADD, POP. The slots
+    hold, in this order, the variables, the constants, the values left on the
+    stack across jumps and the temporaries of a basic block.
+    '''
+
+    def __init__(self, instructions, data_segment=None) -> None:
+        ''' Initializes artibutes '''
+        self.instructions = instructions
+        self.data_segment = data_segment or []
+        self.code = []
+        self.constants = {}
+        self.constant_values = []
+        self.stack_slots = 0
+        self.temps = 0
+        self.max_temps = 0
+        self.variables = 1 + max([operand for op, operand in instructions if op in VARIABLE_OPCODES], default=-1)
+        self.variables = max(self.variables, len(self.data_segment))
+
+    def constant(self, value) -> tuple:
+        ''' Gets the slot of a constant, adding it if needed '''
+        key = (type(value).__name__, value)
+
+        if key not in self.constants:
+            self.constants[key] = len(self.constant_values)
+            self.constant_values.append(value)
+
+        return ('k', self.constants[key])
+
+    def new_temp(self) -> tuple:
+        ''' Gets a slot for an intermediate value of the current block '''
+        self.temps += 1
+        self.max_temps = max(self.max_temps, self.temps)
+        return ('t', self.temps - 1)
+
+    def emit(self, op, a=None, b=None, c=None) -> None:
+        ''' Adds a register instruction '''
+        self.code.append((op, a, b, c))
+
+    def spill_readers(self, address, stack, position) -> None:
+        ''' Copies to temporaries the pending stack values that are a variable about to
+        be written, the copies are inserted before the given code position '''
+        for index, slot in enumerate(stack):
+            if slot == ('v', address):
+                temp = self.new_temp()
+                self.code.insert(position, (OPCODE['MOV'], temp, slot, None))
+                position += 1
+                stack[index] = temp
+
+    def materialize(self, stack) -> None:
+        ''' Moves the values left on the stack to the slots of their stack position,
+        which is where the code after a jump expects them '''
+        self.stack_slots = max(self.stack_slots, len(stack))
+
+        # values already in another stack position are copied first, so none is overwritten
+        for index, slot in enumerate(stack):
+            if slot[0] == 's' and slot != ('s', index):
+                temp = self.new_temp()
+                self.emit(OPCODE['MOV'], temp, slot)
+                stack[index] = temp
+
+        for index, slot in enumerate(stack):
+            if slot != ('s', index):
+                self.emit(OPCODE['MOV'], ('s', index), slot)
+
+    def compile(self) -> list:
+        ''' Translates every stack instruction
+
+        Raises
+        ------
+        LalgError
+            if the stack depth is not the same on every path into an instruction
+            if the program calls procedures, their frames have no registers
+
+        Returns
+        -------
+        list
+            (op code, a, b, c) register instructions, slots still symbolic
+        '''
+        if any(op == OPCODE['CALL'] for op, _ in self.instructions):
+            raise LalgError('Register code does not support procedure calls')
+
+        targets = {operand for op, operand in self.instructions if op in JUMP_OPCODES}
+        depths = {}
+        index_of = {}
+        stack = []
+        live = True
+
+        def check_depth(target, depth):
+            if depths.setdefault(target, depth) != depth:
+                raise LalgError(f'Stack depth differs between paths into instruction {target}')
+
+        for index, (op, operand) in enumerate(self.instructions):
+            # a jump target starts a new block with the stack in its fixed slots
+            if index in targets:
+                if live:
+                    self.materialize(stack)
+                    check_depth(index, len(stack))
+
+                stack = [('s', position) for position in range(depths.get(index, 0))]
+                self.temps = 0
+                live = True
+
+            # nothing jumps past a JMP or HALT, e.g. into a procedure body
+            if not live:
+                continue
+
+            index_of[index] = len(self.code)
+
+            if op == OPCODE['PUSHI'] or op == OPCODE['PUSH_CONST']:
+                stack.append(self.constant(operand))
+            elif op == OPCODE['PUSH_CHAR']:
+                stack.append(self.constant(chr(operand)))
+            elif op == OPCODE['PUSH']:
+                stack.append(('v', operand))
+            elif op == OPCODE['XCHG']:
+                stack[-1], stack[-2] = stack[-2], stack[-1]
+            elif op in BINARY_OPCODES:
+                top = stack.pop()
+                second = stack.pop()
+                temp = self.new_temp()
+                self.emit(op, temp, second, top)
+                stack.append(temp)
+            elif op == OPCODE['CVR']:
+                temp = self.new_temp()
+                self.emit(op, temp, stack.pop())
+                stack.append(temp)
+            elif op in STORE_OPCODES:
+                self.store(op, operand, stack)
+            elif op == OPCODE['READ_INT'] or op == OPCODE['READ_REAL']:
+                self.spill_readers(operand, stack, len(self.code))
+                self.emit(op, ('v', operand))
+            elif op in PRINT_OPCODES:
+                self.emit(OPCODE['PRINT_I'], ('v', operand))
+            elif op == OPCODE['PRINT_ILIT'] or op == OPCODE['PRINT_STR']:
+                self.emit(OPCODE['PRINT_I'], self.constant(operand))
+            elif op == OPCODE['NEW_LINE']:
+                self.emit(OPCODE['PRINT_I'], self.constant('\n'))
+            elif op == OPCODE['PRINT_STR_LIT']:
+                # the string length is still pushed right before the string
+                stack.pop()
+                self.emit(OPCODE['PRINT_I'], self.constant(operand))
+            elif op == OPCODE['JMP']:
+                self.materialize(stack)
+                check_depth(operand, len(stack))
+                self.emit(op, operand)
+                live = False
+            elif op == OPCODE['JFALSE']:
+                condition = stack.pop()
+                if condition[0] == 's' and condition[1] < len(stack):
+                    temp = self.new_temp()
+                    self.emit(OPCODE['MOV'], temp, condition)
+                    condition = temp
+
+                self.materialize(stack)
+                check_depth(operand, len(stack))
+                self.emit(op, operand, condition)
+            elif op == OPCODE['HALT']:
+                self.emit(op)
+                live = False
+            elif op == OPCODE['VLOOP']:
+                # registers are not a data segment, the loop that follows runs as compiled
+                pass
+            else:
+                # fails only if the instruction is actually executed
+                self.emit(op, op)
+                live = False
+
+        # jump targets become register instruction indexes
+        for position, (op, a, b, c) in enumerate(self.code):
+            if op in JUMP_OPCODES:
+                self.code[position] = (op, index_of[a], b, c)
+
+        return self.code
+
+    def store(self, op, address, stack) -> None:
+        ''' Translates a write of the top of the stack into a variable '''
+        value = stack.pop()
+        target = ('v', address)
+
+        if op == OPCODE['POP_REAL_LIT']:
+            if value[0] != 'k':
+                raise LalgError('Literal float is not a constant')
+
+            # literal floats are packed as bits, they are decoded here once
+            bits = self.constant_values[value[1]]
+            value = self.constant(float('{0:.2f}'.format(bits_to_float(bits))))
+
+        last = self.code[-1] if self.code else None
+
+        # the value was just computed into a temporary, so it is computed into the variable
+        if value[0] == 't' and last is not None and last[1] == value and last[0] != OPCODE['MOV']:
+            self.spill_readers(address, stack, len(self.code) - 1)
+            op, _, b, c = self.code[-1]
+            self.code[-1] = (op, target, b, c)
+        else:
+            self.spill_readers(address, stack, len(self.code))
+            self.emit(OPCODE['MOV'], target, value)
+
+    def registers(self) -> list:
+        ''' Builds the initial register file: variables start as laid out by the
+        parser (0 when unknown), then come the constants, the stack slots and the
+        temporaries '''
+        variables = [0 if value is None else value for value in self.data_segment]
+        variables += [0] * (self.variables - len(variables))
+        return variables + self.constant_values + [None] * (self.stack_slots + self.max_temps)
+
+    def resolve(self, slot) -> int:
+        ''' Gets the register index of a symbolic slot '''
+        if not isinstance(slot, tuple):
+            return slot
+
+        kind, index = slot
+        base = {
+            'v': 0,
+            'k': self.variables,
+            's': self.variables + len(self.constant_values),
+            't': self.variables + len(self.constant_values) + self.stack_slots,
+        }
+        return base[kind] + index
+
+    def generate(self) -> tuple:
+        ''' Compiles the stack code
+
+        Returns
+        -------
+        tuple
+            register instructions with register indexes and the initial register file
+        '''
+        code = [(op, self.resolve(a), self.resolve(b), self.resolve(c)) for op, a, b, c in self.compile()]
+        return code, self.registers()
+
+class RegisterVM(Emulator):
+    ''' Register VM Class - runs the register code generated from the stack code,
+    variables live in the register file, so the data array is the register file '''
+    SUPPORTS_CHECKPOINTS = False
+
+    def __init__(self, program, out=None, inputs=None) -> None:
+        ''' Initializes artibutes '''
+        self.program = program
+        self.out = BufferedSink() if out is None else out
+        self.inputs = ConsoleInput() if inputs is None else inputs
+        self.stack = []
+        self.bytes = program.bytecode
+        self.ip = 0
+        self.operations = self.build_operations()
+        instructions, self.data_array = RegisterCompiler(program.instructions, program.data_segment).generate()
+        self.code = self.load(instructions)
+
+    def build_operations(self) -> list:
+        ''' Builds the handler table, indexed by operation code
+
+        Returns
+        -------
+        list
+            handler for each possible operation code, None if it is not supported
+        '''
+        handlers = {
+            OPCODE['ADD']: self.add,
+            OPCODE['CVR']: self.cvr,
+            OPCODE['DIV']: self.div,
+            OPCODE['DIVIDE']: self.divide,
+            OPCODE['EQL']: self.eql,
+            OPCODE['FADD']: self.f_add,
+            OPCODE['FDIVIDE']: self.f_divide,
+            OPCODE['FMULTIPLY']: self.f_multiply,
+            OPCODE['FSUB']: self.f_sub,
+            OPCODE['GTE']: self.gte,
+            OPCODE['GTR']: self.gtr,
+            OPCODE['HALT']: self.halt,
+            OPCODE['JFALSE']: self.jfalse,
+            OPCODE['JMP']: self.jmp,
+            OPCODE['LES']: self.les,
+            OPCODE['LTE']: self.lte,
+            OPCODE['MOV']: self.mov,
+            OPCODE['MULTIPLY']: self.multiply,
+            OPCODE['NEQ']: self.neq,
+            OPCODE['PRINT_I']: self.print_i,
+            OPCODE['SUB']: self.sub,
+            OPCODE['READ_INT']: self.read_int,
+            OPCODE['READ_REAL']: self.read_real,
+        }
+
+        operations = [None] * 256
+        for op, handler in handlers.items():
+            operations[op] = handler
+
+        return operations
+
+    def load(self, instructions) -> list:
+        ''' Binds each register instruction to its handler
+
+        Returns
+        -------
+        list
+            (handler, a, b, c) tuples, executed by start
+        '''
+        code = []
+
+        for op, a, b, c in instructions:
+            handler = self.operations[op]
+
+            # fails only if the instruction is actually executed
+            if handler is None:
+                code.append((self.unsupported_register, op, None, None))
+            else:
+                code.append((handler, a, b, c))
+
+        return code
+
+    def start(self) -> None:
+        ''' For each register instruction, executes its respective function until HALT '''
+        code = self.code
+
+        try:
+            while True:
+                handler, a, b, c = code[self.ip]
+                self.ip += 1
+                handler(a, b, c)
+        except Halted:
+            self.flush()
+
+    def unsupported_register(self, op, b, c) -> None:
+        ''' Handler for op codes the register VM does not implement '''
+        self.unsupported(op)
+
+    def mov(self, dst, src, _) -> None:
+        ''' Copies one register into another '''
+        self.data_array[dst] = self.data_array[src]
+
+    def add(self, dst, second, top) -> None:
+        ''' Adds two registers '''
+        r = self.data_array
+        r[dst] = r[second] + r[top]
+
+    def sub(self, dst, second, top) -> None:
+        ''' Subtracts two registers '''
+        r = self.data_array
+        r[dst] = r[second] - r[top]
+
+    def multiply(self, dst, second, top) -> None:
+        ''' Multiply two registers '''
+        r = self.data_array
+        r[dst] = r[second] * r[top]
+
+    def divide(self, dst, second, top) -> None:
+        ''' Divides two registers '''
+        r = self.data_array
+        r[dst] = r[second] / r[top]
+
+    def div(self, dst, second, top) -> None:
+        ''' Integer division between two registers '''
+        r = self.data_array
+        r[dst] = r[second] / r[top]
+
+    def f_add(self, dst, second, top) -> None:
+        ''' Adds two floats '''
+        r = self.data_array
+        r[dst] = r[second] + r[top]
+
+    def f_sub(self, dst, second, top) -> None:
+        ''' Subtracts two floats '''
+        r = self.data_array
+        r[dst] = r[second] - r[top]
+
+    def f_multiply(self, dst, second, top) -> None:
+        ''' Multiply two floats '''
+        r = self.data_array
+        r[dst] = r[second] * r[top]
+
+    def f_divide(self, dst, second, top) -> None:
+        ''' Divides two floats '''
+        r = self.data_array
+        r[dst] = r[second] / bits_to_float(r[top])
+
+    def gte(self, dst, second, top) -> None:
+        ''' Greater or equal than '''
+        r = self.data_array
+        r[dst] = r[second] >= r[top]
+
+    def gtr(self, dst, second, top) -> None:
+        ''' Top greater than second, emitted for < '''
+        r = self.data_array
+        r[dst] = r[second] < r[top]
+
+    def lte(self, dst, second, top) -> None:
+        ''' Less or equal than '''
+        r = self.data_array
+        r[dst] = r[second] <= r[top]
+
+    def les(self, dst, second, top) -> None:
+        ''' Top less than second, emitted for > '''
+        r = self.data_array
+        r[dst] = r[second] > r[top]
+
+    def eql(self, dst, second, top) -> None:
+        ''' Equal '''
+        r = self.data_array
+        r[dst] = r[second] == r[top]
+
+    def neq(self, dst, second, top) -> None:
+        ''' Not equal '''
+        r = self.data_array
+        r[dst] = r[second] != r[top]
+
+    def cvr(self, dst, src, _) -> None:
+        ''' Converts a register to float '''
+        self.data_array[dst] = float(self.data_array[src])
+
+    def jmp(self, target, b, c) -> None:
+        ''' Jumps to position '''
+        self.ip = target
+
+    def jfalse(self, target, condition, _) -> None:
+        ''' Jumps if the condition register is false '''
+        if not self.data_array[condition]:
+            self.ip = target
+
+    def print_i(self, src, b, c) -> None:
+        ''' Adds a register to the output array '''
+        self.out.append(self.data_array[src])
+
+    def read_int(self, dst, b, c) -> None:
+        ''' Reads integer from user into a register '''
+        super().read_int(dst)
+
+    def read_real(self, dst, b, c) -> None:
+        ''' Reads float from user into a register '''
+        super().read_real(dst)
+
+    def halt(self, a, b=None, c=None) -> None:
+        ''' Finishes execution '''
+        super().halt(a)
@@ -1,16 +1,59 @@
+import sys
+import time
+import asyncio
 import argparse
 
 from parse import Parser
+from inliner import INLINE_SIZE
+from optimizer import optimize, report
 from emulator import Emulator
+from fast import FastEmulator
+from threaded import ThreadedEmulator
+from transpiler import PythonEmulator
+from tiered import TieredEmulator
+from register_vm import RegisterVM
+from async_host import serve
+from output import BufferedSink
+from inputs import ConsoleInput, StreamInput, FileInput
 from tokenizer import get_token
 from loader.lalg_file import LalgFile
+from loader.lalg_error import LimitExceeded
+
+ENGINES = {
+    'emulator': Emulator,
+    'fast': FastEmulator,
+    'threaded': ThreadedEmulator,
+    'python': PythonEmulator,
+    'tiered': TieredEmulator,
+    'register': RegisterVM,
+}
 
 if __name__ == '__main__':
     # add argument parser
     parser = argparse.ArgumentParser()
     parser.add_argument('--input', '-i', type=str, required=True)
     parser.add_argument('--output', '-o', type=str)
+    parser.add_argument('--engine', type=str, choices=ENGINES.keys(), default='emulator')
+    parser.add_argument('--hot-threshold', type=int, default=TieredEmulator.HOT_THRESHOLD)
+    parser.add_argument('--tier-report', action='store_true')
+    parser.add_argument('--inline-size', type=int, default=INLINE_SIZE)
+    parser.add_argument('--inline-report', action='store_true')
+    parser.add_argument('-O', dest='optimization', type=int, choices=(0, 1), default=0,
+                        help='1 runs the peephole and dead code passes and prints how many instructions '
+                             'and bytes the program lost, executed instruction counts only come from '
+                             'benchmarks/bench_peephole.py')
+    parser.add_argument('--flush-threshold', type=int, default=BufferedSink.THRESHOLD)
+    parser.add_argument('--stdin-file', type=str)
+    parser.add_argument('--max-instructions', type=int)
+    parser.add_argument('--timeout', type=float)
+    parser.add_argument('--checkpoint', type=str)
+    parser.add_argument('--resume', type=str)
+    parser.add_argument('--serve', type=int, metavar='PORT')
     args = parser.parse_args()
+
+    limited = args.max_instructions is not None or args.timeout is not None
+    if limited and args.engine != 'emulator':
+        parser.error('--max-instructions and --timeout need --engine emulator')
     
     # uses LalgFile to read code
     print('Reading file...')
@@ -18,10 +61,74 @@ if __name__ == '__main__':
 
     # uses parser to parse tokens
     print('Parsing...')
-    parser = Parser(tokens=tokens)
-    byte_array = parser.parse()
-    
+    parser = Parser(tokens=tokens, inline_size=args.inline_size)
+    parser.parse()
+    program = parser.program()
+
+    if args.inline_report:
+        print(parser.inline_report())
+
+    if args.optimization >= 1:
+        print('Optimizing...')
+        original, program = program, optimize(program)
+        print(report(original, program))
+
+    # every connection runs the program with its socket as input and output
+    if args.serve is not None:
+        print(f'Serving on port {args.serve}...')
+        asyncio.run(serve(program, port=args.serve))
+
+        # a server that stops must not fall through into a local run reading stdin
+        sys.exit(0)
+
     # uses bytes to execute the code
     print('Emulating...')
-    emulator = Emulator(byte_array)
-    emulator.start()
\ No newline at end of file
+    options = {}
+    if args.engine == 'tiered':
+        options['hot_threshold'] = args.hot_threshold
+    if args.max_instructions is not None:
+        options['budget'] = args.max_instructions
+    if args.timeout is not None:
+        options['deadline'] = time.monotonic() + args.timeout
+
+    # program output goes to the output file when given, to stdout otherwise,
+    # a resumed run adds to the output of the run it continues
+    stream = open(args.output, 'ab' if args.resume else 'wb') if args.output else None
+    out = BufferedSink(stream, args.flush_threshold)
+
+    # piped input is read at once, only a terminal is read line by line
+    if args.stdin_file:
+        inputs = FileInput(args.stdin_file)
+    elif sys.stdin.isatty():
+        inputs = ConsoleInput()
+    else:
+        inputs = StreamInput()
+
+    emulator = ENGINES[args.engine](program, out, inputs, **options)
+
+    if args.resume:
+        with open(args.resume, 'rb') as file:
+            emulator.restore(file.read())
+
+    try:
+        emulator.start()
+        print()
+        print('Done!')
+    except LimitExceeded as error:
+        # a stopped run is saved, so it can be resumed later
+        if not args.checkpoint:
+            raise
+
+        with open(args.checkpoint, 'wb') as file:
+            file.write(emulator.checkpoint())
+
+        print()
+        print(f'{error}, checkpoint saved to {args.checkpoint}')
+    finally:
+        out.flush()
+
+        if stream is not None:
+            stream.close()
+
+        if args.tier_report and args.engine == 'tiered':
+            print(emulator.report())
\ No newline at end of file
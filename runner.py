@@ -0,0 +1,93 @@
+''' Library entry points, compile a lalg file once and run it any number of times '''
+from parse import Parser
+from inliner import INLINE_SIZE
+from optimizer import optimize
+from emulator import Emulator
+from output import MemorySink
+from inputs import ListInput
+from vector import VectorEmulator
+from tokenizer import get_token
+from loader.lalg_file import LalgFile
+
+def compile_file(path, inline_size=INLINE_SIZE, optimization=0) -> object:
+    ''' Tokenizes and parses a lalg file
+
+    Parameters
+    ----------
+    path : str
+        lalg file to compile
+    inline_size : int
+        largest procedure body, in instructions, copied into its call sites
+    optimization : int
+        1 to run the peephole and dead code passes, see optimizer.optimize
+
+    Raises
+    ------
+    LalgError
+        if the file is not a valid lalg program
+
+    Returns
+    -------
+    Program
+        compiled program, immutable and reusable
+    '''
+    parser = Parser(tokens=get_token(LalgFile(input_file=path)), inline_size=inline_size)
+    parser.parse()
+    program = parser.program()
+    return optimize(program) if optimization >= 1 else program
+
+def run(program, inputs=(), engine=Emulator, **options) -> list:
+    ''' Runs a compiled program once, returning when it halts instead of exiting
+
+    Parameters
+    ----------
+    program : Program
+        compiled program, it is not changed by the run
+    inputs : iterable
+        values read by the program, in order
+    engine : class
+        engine used to run the program, Emulator by default
+    options : dict
+        extra engine arguments, e.g. hot_threshold for the TieredEmulator
+
+    Raises
+    ------
+    LalgError
+        if the program fails or reads more values than given
+
+    Returns
+    -------
+    list
+        every value written by the program, a MemorySink whose getvalue gives the text
+    '''
+    out = MemorySink()
+    engine(program, out, ListInput(inputs), **options).start()
+    return out
+
+def run_lanes(program, input_vectors) -> list:
+    ''' Runs a compiled program once per input vector, all of them together in a
+    VectorEmulator
+
+    Parameters
+    ----------
+    program : Program
+        compiled program, it is not changed by the runs
+    input_vectors : list
+        values read by each run, in order
+
+    Raises
+    ------
+    LalgError
+        if NumPy is not installed or an integer overflows
+    LanesFailed
+        if some runs fail, its outs holds the output of every run, the others
+        finished as they would alone
+
+    Returns
+    -------
+    list
+        one MemorySink per input vector, with every value written by that run
+    '''
+    emulator = VectorEmulator(program, [ListInput(values) for values in input_vectors])
+    emulator.start()
+    return emulator.outs
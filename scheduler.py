@@ -0,0 +1,165 @@
+import time
+from collections import deque
+
+from emulator import Emulator
+from output import MemorySink
+from inputs import QueueInput, InputBlocked
+from loader.lalg_error import BudgetExceeded
+
+class Job(object):
+    ''' Job Class - one run of a program managed by the Scheduler '''
+
+    def __init__(self, name, emulator) -> None:
+        ''' Initializes artibutes '''
+        self.name = name
+        self.emulator = emulator
+        self.state = 'ready'
+        self.error = None
+        self.quanta = 0
+        self.queued_at = time.monotonic()
+        self.waited = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def executed(self) -> int:
+        ''' Instructions executed so far '''
+        return self.emulator.executed
+
+    @property
+    def output(self) -> object:
+        ''' Sink the job writes to '''
+        return self.emulator.out
+
+    def __repr__(self) -> str:
+        ''' Creates a string representation of the class '''
+        mean = self.waited / self.quanta if self.quanta else 0.0
+        return f'<job {self.name}, {self.state}, {self.executed} instructions, {self.quanta} quanta, ' \
+            f'queue latency {mean * 1000:.3f} ms mean {self.max_wait * 1000:.3f} ms max>'
+
+class Scheduler(object):
+    ''' Scheduler Class - runs many programs in one thread, each one for a quantum of
+    instructions in turn. Jobs waiting for input are left out of the turns until
+    they are fed. '''
+    QUANTUM = 10000
+
+    def __init__(self, quantum=QUANTUM) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        quantum : int
+            instructions each job runs per turn, checked on jumps back so a turn
+            ends at the first loop iteration past it
+        '''
+        self.quantum = quantum
+        self.queue = deque()
+        self.jobs = []
+
+    def submit(self, program, inputs=None, out=None, name=None) -> Job:
+        ''' Adds a run of a program to the end of the queue
+
+        Parameters
+        ----------
+        program : Program
+            compiled program
+        inputs : input provider or None
+            where read values come from, a QueueInput fed through feed if None
+        out : sink or None
+            where written values go, a MemorySink if None
+        name : str or None
+            shown in the report, the job number if None
+
+        Returns
+        -------
+        Job
+            the new job
+        '''
+        out = MemorySink() if out is None else out
+        inputs = QueueInput() if inputs is None else inputs
+        emulator = Emulator(program, out, inputs, budget=self.quantum)
+
+        job = Job(len(self.jobs) if name is None else name, emulator)
+        self.jobs.append(job)
+        self.queue.append(job)
+        return job
+
+    def feed(self, job, values, close=False) -> None:
+        ''' Adds input to a job, putting it back in the queue if it was waiting
+
+        Parameters
+        ----------
+        job : Job
+            job reading the values, its input must be a QueueInput
+        values : iterable
+            values to be read
+        close : bool
+            if no more values will be fed
+        '''
+        job.emulator.inputs.feed(values)
+        if close:
+            job.emulator.inputs.close()
+
+        if job.state == 'blocked' and job.emulator.inputs.ready():
+            self.enqueue(job)
+
+    def enqueue(self, job) -> None:
+        ''' Puts a job at the end of the queue '''
+        job.state = 'ready'
+        job.queued_at = time.monotonic()
+        self.queue.append(job)
+
+    def step(self) -> bool:
+        ''' Runs one quantum of the job at the front of the queue
+
+        Returns
+        -------
+        bool
+            False if no job is ready to run
+        '''
+        if not self.queue:
+            return False
+
+        job = self.queue.popleft()
+        emulator = job.emulator
+
+        wait = time.monotonic() - job.queued_at
+        job.waited += wait
+        job.max_wait = max(job.max_wait, wait)
+        job.quanta += 1
+
+        emulator.budget = emulator.executed + self.quantum
+
+        try:
+            emulator.start()
+        except BudgetExceeded:
+            self.enqueue(job)
+        except InputBlocked:
+            job.state = 'blocked'
+        except Exception as error:
+            # a failing program only ends its own job, e.g. on a division by zero
+            job.state = 'failed'
+            job.error = error
+        else:
+            job.state = 'done'
+
+        return True
+
+    def run(self) -> None:
+        ''' Runs quanta until every job is done, failed or waiting for input '''
+        while self.step():
+            pass
+
+    def report(self) -> str:
+        ''' Describes every job
+
+        Returns
+        -------
+        str
+            one line per job
+        '''
+        lines = [f'Quantum: {self.quantum} instructions']
+
+        for job in self.jobs:
+            lines.append(repr(job))
+
+        return '\n'.join(lines)
@@ -0,0 +1,599 @@
+from helper import *
+from constants import *
+from emulator import Emulator, Halted
+from loader.lalg_error import LalgError
+
+# op codes whose compiler also takes the op code
+READ_OPCODES = {OPCODE['READ_INT'], OPCODE['READ_REAL'], OPCODE['READ_INT_LOCAL'], OPCODE['READ_REAL_LOCAL']}
+
+class ThreadedEmulator(Emulator):
+    ''' Threaded Emulator Class - compiles every instruction into a closure with its
+    operand already bound, each closure returns the index of the next one '''
+    SUPPORTS_LIMITS = False
+    SUPPORTS_CHECKPOINTS = False
+
+    def build_operations(self) -> list:
+        ''' Builds the compiler table, indexed by operation code
+
+        Returns
+        -------
+        list
+            closure factory for each possible operation code, None if it is not supported
+        '''
+        compilers = {
+            OPCODE['ADD']: self.compile_add,
+            OPCODE['CVR']: self.compile_cvr,
+            OPCODE['DIV']: self.compile_div,
+            OPCODE['DIVIDE']: self.compile_divide,
+            OPCODE['DUMP']: self.compile_dump,
+            OPCODE['EQL']: self.compile_eql,
+            OPCODE['FADD']: self.compile_f_add,
+            OPCODE['FDIVIDE']: self.compile_f_divide,
+            OPCODE['FMULTIPLY']: self.compile_f_multiply,
+            OPCODE['FSUB']: self.compile_f_sub,
+            OPCODE['GTE']: self.compile_gte,
+            OPCODE['GTR']: self.compile_gtr,
+            OPCODE['HALT']: self.compile_halt,
+            OPCODE['JFALSE']: self.compile_jfalse,
+            OPCODE['JMP']: self.compile_jmp,
+            OPCODE['LES']: self.compile_les,
+            OPCODE['LTE']: self.compile_lte,
+            OPCODE['MULTIPLY']: self.compile_multiply,
+            OPCODE['NEQ']: self.compile_neq,
+            OPCODE['NEW_LINE']: self.compile_print_new_line,
+            OPCODE['POP_CHAR']: self.compile_pop,
+            OPCODE['POP_REAL_LIT']: self.compile_pop_real_lit,
+            OPCODE['POP']: self.compile_pop,
+            OPCODE['PRINT_C']: self.compile_print_c,
+            OPCODE['PRINT_I']: self.compile_print_i,
+            OPCODE['PRINT_ILIT']: self.compile_print_lit,
+            OPCODE['PRINT_R']: self.compile_print_i,
+            OPCODE['PRINT_STR_LIT']: self.compile_print_str_lit,
+            OPCODE['PRINT_STR']: self.compile_print_lit,
+            OPCODE['PUSH_CHAR']: self.compile_push_char,
+            OPCODE['PUSH']: self.compile_push,
+            OPCODE['PUSHI']: self.compile_pushi,
+            OPCODE['PUSH_CONST']: self.compile_pushi,
+            OPCODE['RET_AND_PRINT']: self.compile_ret_and_print,
+            OPCODE['RETRIEVE']: self.compile_retrieve,
+            OPCODE['SUB']: self.compile_sub,
+            OPCODE['XCHG']: self.compile_xchg,
+            OPCODE['READ_INT']: self.compile_read,
+            OPCODE['READ_REAL']: self.compile_read,
+            OPCODE['VLOOP']: self.compile_vloop,
+            OPCODE['CALL']: self.compile_call,
+            OPCODE['RET']: self.compile_ret,
+            OPCODE['PUSH_LOCAL']: self.compile_push_local,
+            OPCODE['POP_LOCAL']: self.compile_pop_local,
+            OPCODE['PRINT_LOCAL']: self.compile_print_local,
+            OPCODE['READ_INT_LOCAL']: self.compile_read_local,
+            OPCODE['READ_REAL_LOCAL']: self.compile_read_local,
+        }
+
+        operations = [None] * 256
+        for op, compiler in compilers.items():
+            operations[op] = compiler
+
+        return operations
+
+    def load(self, instructions) -> list:
+        ''' Compiles each decoded instruction into a closure
+
+        Parameters
+        ----------
+        instructions : list
+            (op code, operand) pairs generated by decoder.decode
+
+        Returns
+        -------
+        list
+            closures, executed by start
+        '''
+        # closures can not share a stack pointer, they push to and pop from a list
+        self.stack = []
+        code = []
+
+        for index, (op, operand) in enumerate(instructions):
+            compiler = self.operations[op]
+
+            # fails only if the instruction is actually executed
+            if compiler is None:
+                code.append(self.compile_unsupported(op))
+            elif op in READ_OPCODES:
+                code.append(compiler(op, operand, index + 1))
+            else:
+                code.append(compiler(operand, index + 1))
+
+        return code
+
+    def start(self) -> None:
+        ''' Runs the chain of closures until HALT '''
+        code = self.code
+        ip = self.ip
+
+        try:
+            while ip >= 0:
+                ip = code[ip]()
+        except Halted:
+            self.flush()
+        except OverflowError:
+            # only integer arrays are bounded, Python ints never overflow
+            raise LalgError(f'Integer overflow at instruction {ip}')
+
+    def compile_unsupported(self, op) -> object:
+        ''' Compiles an op code the emulator does not implement '''
+        def unsupported():
+            raise LalgError(f'Operation {op} is not supported')
+
+        return unsupported
+
+    def compile_pushi(self, value, nxt) -> object:
+        ''' Compiles push of an integer '''
+        push = self.stack.append
+
+        def pushi():
+            push(value)
+            return nxt
+
+        return pushi
+
+    def compile_push(self, address, nxt) -> object:
+        ''' Compiles push of a variable '''
+        push = self.stack.append
+        data = self.data_array
+
+        def push_variable():
+            push(data[address])
+            return nxt
+
+        return push_variable
+
+    def compile_push_char(self, value, nxt) -> object:
+        ''' Compiles push of a char '''
+        push = self.stack.append
+        char = chr(value)
+
+        def push_char():
+            push(char)
+            return nxt
+
+        return push_char
+
+    def compile_pop(self, address, nxt) -> object:
+        ''' Compiles pop of the top value into a variable '''
+        pop = self.stack.pop
+        data = self.data_array
+
+        def pop_variable():
+            data[address] = pop()
+            return nxt
+
+        return pop_variable
+
+    def compile_pop_real_lit(self, address, nxt) -> object:
+        ''' Compiles pop of a literal float into a variable '''
+        pop = self.stack.pop
+        data = self.data_array
+
+        def pop_real_lit():
+            data[address] = float('{0:.2f}'.format(bits_to_float(pop())))
+            return nxt
+
+        return pop_real_lit
+
+    def compile_dump(self, _, nxt) -> object:
+        ''' Compiles attribution through an address on the stack '''
+        pop = self.stack.pop
+        data = self.data_array
+
+        def dump():
+            assignment = pop()
+            data[pop()] = assignment
+            return nxt
+
+        return dump
+
+    def compile_retrieve(self, _, nxt) -> object:
+        ''' Compiles retrieval through an address on the stack '''
+        stack = self.stack
+        data = self.data_array
+
+        def retrieve():
+            stack[-1] = data[stack[-1]]
+            return nxt
+
+        return retrieve
+
+    def compile_add(self, _, nxt) -> object:
+        ''' Compiles sum of the two top values '''
+        stack = self.stack
+        pop = stack.pop
+
+        def add():
+            top = pop()
+            stack[-1] = top + stack[-1]
+            return nxt
+
+        return add
+
+    def compile_sub(self, _, nxt) -> object:
+        ''' Compiles subtraction of the two top values '''
+        stack = self.stack
+        pop = stack.pop
+
+        def sub():
+            top = pop()
+            stack[-1] = stack[-1] - top
+            return nxt
+
+        return sub
+
+    def compile_multiply(self, _, nxt) -> object:
+        ''' Compiles multiplication of the two top values '''
+        stack = self.stack
+        pop = stack.pop
+
+        def multiply():
+            top = pop()
+            stack[-1] = top * stack[-1]
+            return nxt
+
+        return multiply
+
+    def compile_divide(self, _, nxt) -> object:
+        ''' Compiles division of the two top values '''
+        stack = self.stack
+        pop = stack.pop
+
+        def divide():
+            denom = pop()
+            stack[-1] = stack[-1] / denom
+            return nxt
+
+        return divide
+
+    def compile_div(self, _, nxt) -> object:
+        ''' Compiles integer division of the two top values '''
+        stack = self.stack
+        pop = stack.pop
+
+        def div():
+            denom = pop()
+            stack[-1] = stack[-1] / denom
+            return nxt
+
+        return div
+
+    def compile_f_add(self, _, nxt) -> object:
+        ''' Compiles sum of two numbers, at least one of them real '''
+        stack = self.stack
+        pop = stack.pop
+
+        def f_add():
+            top = pop()
+            stack[-1] = top + stack[-1]
+            return nxt
+
+        return f_add
+
+    def compile_f_sub(self, _, nxt) -> object:
+        ''' Compiles subtraction of two numbers, at least one of them real '''
+        stack = self.stack
+        pop = stack.pop
+
+        def f_sub():
+            top = pop()
+            stack[-1] = stack[-1] - top
+            return nxt
+
+        return f_sub
+
+    def compile_f_multiply(self, _, nxt) -> object:
+        ''' Compiles multiplication of two numbers, at least one of them real '''
+        stack = self.stack
+        pop = stack.pop
+
+        def f_multiply():
+            top = pop()
+            stack[-1] = top * stack[-1]
+            return nxt
+
+        return f_multiply
+
+    def compile_f_divide(self, _, nxt) -> object:
+        ''' Compiles division of two floats '''
+        stack = self.stack
+        pop = stack.pop
+
+        def f_divide():
+            denom = bits_to_float(pop())
+            stack[-1] = stack[-1] / denom
+            return nxt
+
+        return f_divide
+
+    def compile_cvr(self, _, nxt) -> object:
+        ''' Compiles conversion of the top value to float '''
+        stack = self.stack
+
+        def cvr():
+            stack[-1] = float(stack[-1])
+            return nxt
+
+        return cvr
+
+    def compile_xchg(self, _, nxt) -> object:
+        ''' Compiles swap of the two top values '''
+        stack = self.stack
+
+        def xchg():
+            stack[-1], stack[-2] = stack[-2], stack[-1]
+            return nxt
+
+        return xchg
+
+    def compile_gte(self, _, nxt) -> object:
+        ''' Compiles greater or equal than '''
+        stack = self.stack
+        pop = stack.pop
+
+        def gte():
+            top = pop()
+            stack[-1] = top <= stack[-1]
+            return nxt
+
+        return gte
+
+    def compile_gtr(self, _, nxt) -> object:
+        ''' Compiles greater than '''
+        stack = self.stack
+        pop = stack.pop
+
+        def gtr():
+            top = pop()
+            stack[-1] = top > stack[-1]
+            return nxt
+
+        return gtr
+
+    def compile_lte(self, _, nxt) -> object:
+        ''' Compiles less or equal than '''
+        stack = self.stack
+        pop = stack.pop
+
+        def lte():
+            top = pop()
+            stack[-1] = top >= stack[-1]
+            return nxt
+
+        return lte
+
+    def compile_les(self, _, nxt) -> object:
+        ''' Compiles less than '''
+        stack = self.stack
+        pop = stack.pop
+
+        def les():
+            top = pop()
+            stack[-1] = top < stack[-1]
+            return nxt
+
+        return les
+
+    def compile_eql(self, _, nxt) -> object:
+        ''' Compiles equal '''
+        stack = self.stack
+        pop = stack.pop
+
+        def eql():
+            top = pop()
+            stack[-1] = top == stack[-1]
+            return nxt
+
+        return eql
+
+    def compile_neq(self, _, nxt) -> object:
+        ''' Compiles not equal '''
+        stack = self.stack
+        pop = stack.pop
+
+        def neq():
+            top = pop()
+            stack[-1] = top != stack[-1]
+            return nxt
+
+        return neq
+
+    def compile_jmp(self, target, _) -> object:
+        ''' Compiles unconditional jump '''
+        def jmp():
+            return target
+
+        return jmp
+
+    def compile_vloop(self, loop, nxt) -> object:
+        ''' Compiles a counted loop computed at once '''
+        run = loop.run
+        data = self.data_array
+        exit = loop.exit
+
+        def vloop():
+            if run(data):
+                return exit
+            return nxt
+
+        return vloop
+
+    def compile_jfalse(self, target, nxt) -> object:
+        ''' Compiles jump if false '''
+        pop = self.stack.pop
+
+        def jfalse():
+            if pop():
+                return nxt
+            return target
+
+        return jfalse
+
+    def compile_read(self, op, address, nxt) -> object:
+        ''' Compiles read of an integer or a float '''
+        read = self.read_int if op == OPCODE['READ_INT'] else self.read_real
+
+        def read_value():
+            read(address)
+            return nxt
+
+        return read_value
+
+    def compile_call(self, procedure, nxt) -> object:
+        ''' Compiles a call, the arguments are the whole stack '''
+        stack = self.stack
+        frames = self.frames
+        entry = procedure.entry
+        size = procedure.size
+        initial = procedure.initial
+
+        def call():
+            base = self.top
+            fp = base + 2
+            top = fp + size
+
+            if top > len(frames):
+                raise LalgError(f'Frame stack overflow calling {procedure.name}')
+
+            frames[base] = nxt
+            frames[base + 1] = self.fp
+            frames[fp:top] = stack + list(initial)
+            stack.clear()
+
+            self.fp = fp
+            self.top = top
+            return entry
+
+        return call
+
+    def compile_ret(self, _, nxt) -> object:
+        ''' Compiles a return to the caller '''
+        frames = self.frames
+
+        def ret():
+            base = self.fp - 2
+            self.fp = frames[base + 1]
+            self.top = base
+            return frames[base]
+
+        return ret
+
+    def compile_push_local(self, slot, nxt) -> object:
+        ''' Compiles push of a parameter or local '''
+        push = self.stack.append
+        frames = self.frames
+
+        def push_local():
+            push(frames[self.fp + slot])
+            return nxt
+
+        return push_local
+
+    def compile_pop_local(self, slot, nxt) -> object:
+        ''' Compiles pop of the top value into a parameter or local '''
+        pop = self.stack.pop
+        frames = self.frames
+
+        def pop_local():
+            frames[self.fp + slot] = pop()
+            return nxt
+
+        return pop_local
+
+    def compile_print_local(self, slot, nxt) -> object:
+        ''' Compiles print of a parameter or local '''
+        append = self.out.append
+        frames = self.frames
+
+        def print_local():
+            append(frames[self.fp + slot])
+            return nxt
+
+        return print_local
+
+    def compile_read_local(self, op, slot, nxt) -> object:
+        ''' Compiles read of an integer or a float into a parameter or local '''
+        read = self.read_int_local if op == OPCODE['READ_INT_LOCAL'] else self.read_real_local
+
+        def read_local():
+            read(slot)
+            return nxt
+
+        return read_local
+
+    def compile_print_i(self, address, nxt) -> object:
+        ''' Compiles print of a variable '''
+        append = self.out.append
+        data = self.data_array
+
+        def print_i():
+            append(data[address])
+            return nxt
+
+        return print_i
+
+    def compile_print_c(self, address, nxt) -> object:
+        ''' Compiles print of a char variable '''
+        append = self.out.append
+        data = self.data_array
+
+        def print_c():
+            append(data[address])
+            return nxt
+
+        return print_c
+
+    def compile_print_lit(self, value, nxt) -> object:
+        ''' Compiles print of a literal '''
+        append = self.out.append
+
+        def print_lit():
+            append(value)
+            return nxt
+
+        return print_lit
+
+    def compile_print_new_line(self, _, nxt) -> object:
+        ''' Compiles print of \n '''
+        return self.compile_print_lit('\n', nxt)
+
+    def compile_print_str_lit(self, text, nxt) -> object:
+        ''' Compiles print of a literal string '''
+        append = self.out.append
+        pop = self.stack.pop
+
+        def print_str_lit():
+            # the string length is still pushed right before the string
+            pop()
+            append(text)
+            return nxt
+
+        return print_str_lit
+
+    def compile_ret_and_print(self, _, nxt) -> object:
+        ''' Compiles print through an address on the stack '''
+        append = self.out.append
+        pop = self.stack.pop
+        data = self.data_array
+
+        def ret_and_print():
+            append(data[pop()])
+            return nxt
+
+        return ret_and_print
+
+    def compile_halt(self, _, nxt) -> object:
+        ''' Compiles end of execution '''
+        halt = self.halt
+
+        def halt_execution():
+            halt(None)
+            return -1
+
+        return halt_execution
@@ -0,0 +1,93 @@
+from constants import *
+from emulator import Emulator
+from transpiler import Unstructured, compile_loop
+
+class LoopProfile(object):
+    ''' Loop Profile Class - execution counter and tier state of one loop '''
+
+    def __init__(self, header, back_edge) -> None:
+        ''' Initializes artibutes '''
+        self.header = header
+        self.back_edge = back_edge
+        self.count = 0
+        self.compiled = False
+        self.failed = False
+
+    def __repr__(self) -> str:
+        ''' Creates a string representation of the class '''
+        if self.compiled:
+            state = 'compiled'
+        elif self.failed:
+            state = 'not compilable'
+        else:
+            state = 'interpreted'
+
+        return f'<loop {self.header}-{self.back_edge}, {self.count} back jumps, {state}>'
+
+class TieredEmulator(Emulator):
+    ''' Tiered Emulator Class - interprets the program, counting the jumps back to the
+    start of each loop. Once a loop reaches the threshold it is transpiled into a
+    Python function, which runs it from then on. '''
+    HOT_THRESHOLD = 1000
+
+    def __init__(self, program, out=None, inputs=None, hot_threshold=HOT_THRESHOLD) -> None:
+        ''' Initializes artibutes '''
+        self.hot_threshold = hot_threshold
+        self.loops = {}
+        super().__init__(program, out, inputs)
+
+    def load(self, instructions) -> list:
+        ''' Binds each decoded instruction to its handler, jumps back to an earlier
+        instruction are bound to the counting handler '''
+        self.instructions = instructions
+        code = super().load(instructions)
+
+        for index, (op, target) in enumerate(instructions):
+            if (op == OPCODE['JMP'] or op == OPCODE['JFALSE']) and target <= index:
+                self.loops[index] = LoopProfile(target, index)
+                code[index] = (self.back_jump, self.loops[index])
+
+        return code
+
+    def back_jump(self, loop) -> None:
+        ''' Jumps back to the start of a loop, compiling it once it gets hot '''
+        if self.instructions[loop.back_edge][0] == OPCODE['JFALSE']:
+            self.sp -= 1
+            if self.stack[self.sp]:
+                return
+
+        self.ip = loop.header
+        loop.count += 1
+
+        if loop.count == self.hot_threshold:
+            self.tier_up(loop)
+
+    def tier_up(self, loop) -> None:
+        ''' Compiles a loop, any later arrival at its header runs the compiled function '''
+        try:
+            function = compile_loop(self.instructions, loop.header, loop.back_edge)
+        except Unstructured:
+            loop.failed = True
+            return
+
+        loop.compiled = True
+        self.code[loop.header] = (self.run_compiled, function)
+
+    def run_compiled(self, function) -> None:
+        ''' Runs a compiled loop and continues right after it '''
+        self.ip = function(self)
+
+    def report(self) -> str:
+        ''' Describes every loop and whether it was compiled
+
+        Returns
+        -------
+        str
+            one line per loop
+        '''
+        lines = [f'Tier-up threshold: {self.hot_threshold} back jumps']
+
+        for loop in self.loops.values():
+            lines.append(repr(loop))
+
+        return '\n'.join(lines)
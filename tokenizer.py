@@ -140,6 +140,39 @@ def case_comment(text):
     
     raise LalgError('Invalid comment')
 
+def case_quote(text):
+    ''' If a ' is found, goes over the following characters until the string
+    literal is closed.
+
+    Parameters
+    ----------
+    text : str
+        original code
+
+    Raises
+    ------
+    LalgError
+        if string is not closed
+
+    Returns
+    -------
+    str
+        full string literal, quotes included
+    '''
+    index = 1
+
+    while index < len(text):
+        char = text[index]
+
+        if char == '\'':
+            return text[:index + 1]
+        elif char == '\n':
+            break
+        else:
+            index += 1
+
+    raise LalgError('Invalid string')
+
 def case_digit(text):
     ''' If a digit is found, goes over the following characters building the whole 
     number, whether is an integer or a real number.
@@ -283,6 +316,12 @@ def get_token(code):
             token_list.append(Token(';', TOKEN_SEMICOLON, row, column))
             column += 1
         
+        elif symbol == QUOTE:
+            word = case_quote(code.contents[index:])
+            index += len(word)
+            token_list.append(Token(word, TOKEN_STRING_LIT, row, column))
+            column += len(word)
+
         elif symbol == COMMENT:
             word = case_comment(code.contents[index:])
             index += len(word)
@@ -0,0 +1,651 @@
+from collections import OrderedDict
+
+from helper import *
+from constants import *
+from emulator import Emulator
+from loader.lalg_error import LalgError
+
+# code objects already compiled, keyed by the decoded instructions, the least
+# recently used ones are dropped past CODE_CACHE_SIZE so a long running host does
+# not keep every program it ever ran
+CODE_CACHE = OrderedDict()
+CODE_CACHE_SIZE = 256
+
+FUNCTION_NAME = 'lalg_program'
+LOOP_NAME = 'lalg_loop'
+
+# expressions for binary op codes, a is the second value and b the top of the stack
+BINARY_EXPRESSIONS = {
+    OPCODE['ADD']: '({a} + {b})',
+    OPCODE['SUB']: '({a} - {b})',
+    OPCODE['MULTIPLY']: '({a} * {b})',
+    OPCODE['DIVIDE']: '({a} / {b})',
+    OPCODE['DIV']: '({a} / {b})',
+    OPCODE['FADD']: '({a} + {b})',
+    OPCODE['FSUB']: '({a} - {b})',
+    OPCODE['FMULTIPLY']: '({a} * {b})',
+    OPCODE['FDIVIDE']: '({a} / bits_to_float({b}))',
+    OPCODE['GTE']: '({a} >= {b})',
+    OPCODE['GTR']: '({a} < {b})',
+    OPCODE['LTE']: '({a} <= {b})',
+    OPCODE['LES']: '({a} > {b})',
+    OPCODE['EQL']: '({a} == {b})',
+    OPCODE['NEQ']: '({a} != {b})',
+}
+
+# op codes that write a variable with the top of the stack
+STORE_OPCODES = {OPCODE['POP'], OPCODE['POP_CHAR'], OPCODE['POP_REAL_LIT']}
+
+# op codes that add a variable to the output
+PRINT_OPCODES = {OPCODE['PRINT_I'], OPCODE['PRINT_R'], OPCODE['PRINT_C']}
+
+# op codes that write a variable
+WRITE_OPCODES = STORE_OPCODES | {OPCODE['READ_INT'], OPCODE['READ_REAL']}
+
+# op codes that read or write a variable
+VARIABLE_OPCODES = WRITE_OPCODES | PRINT_OPCODES | {OPCODE['PUSH']}
+
+# op codes that can not be expressed with variables as Python locals
+INDIRECT_OPCODES = {OPCODE['DUMP'], OPCODE['RETRIEVE'], OPCODE['RET_AND_PRINT']}
+
+SUPPORTED_OPCODES = set(BINARY_EXPRESSIONS) | STORE_OPCODES | PRINT_OPCODES | {
+    OPCODE['CVR'],
+    OPCODE['HALT'],
+    OPCODE['JFALSE'],
+    OPCODE['JMP'],
+    OPCODE['NEW_LINE'],
+    OPCODE['PRINT_ILIT'],
+    OPCODE['PRINT_STR_LIT'],
+    OPCODE['PRINT_STR'],
+    OPCODE['PUSH'],
+    OPCODE['PUSH_CHAR'],
+    OPCODE['PUSHI'],
+    OPCODE['PUSH_CONST'],
+    OPCODE['READ_INT'],
+    OPCODE['READ_REAL'],
+    OPCODE['VLOOP'],
+    OPCODE['XCHG'],
+}
+
+class Unstructured(Exception):
+    ''' Raised when the control flow can not be expressed with Python loops and ifs '''
+
+    pass
+
+class Transpiler(object):
+    ''' Transpiler Class - turns decoded instructions into the source of one Python function
+
+    Variables become locals named v<address> and the stack operations become
+    expressions. Jumps become while loops and ifs when the control flow allows
+    it, otherwise every basic block becomes a branch of a dispatch loop.
+    '''
+
+    def __init__(self, instructions) -> None:
+        ''' Initializes artibutes
+
+        Raises
+        ------
+        LalgError
+            if an instruction uses indirect addressing
+        '''
+        self.instructions = instructions
+        self.lines = []
+        self.temps = 0
+
+        for op, _ in instructions:
+            if op in INDIRECT_OPCODES:
+                raise LalgError(f'Operation {op} can not be transpiled')
+
+        self.reachable = self.find_reachable()
+        self.back_edges = self.find_back_edges()
+
+    def successors(self, index) -> list:
+        ''' Gets the instructions that can run right after the given one '''
+        op, operand = self.instructions[index]
+
+        if op == OPCODE['JMP']:
+            return [operand]
+        elif op == OPCODE['JFALSE']:
+            return [index + 1, operand]
+        elif op == OPCODE['HALT'] or op not in SUPPORTED_OPCODES:
+            return []
+        else:
+            return [index + 1]
+
+    def find_reachable(self) -> set:
+        ''' Finds the instructions reachable from the first one '''
+        reachable = set()
+        pending = [0]
+
+        while pending:
+            index = pending.pop()
+
+            if index not in reachable and index < len(self.instructions):
+                reachable.add(index)
+                pending.extend(self.successors(index))
+
+        return reachable
+
+    def find_back_edges(self) -> dict:
+        ''' Finds loops, as jumps to an earlier instruction
+
+        Returns
+        -------
+        dict
+            index of the loop header to the index of its last back edge
+        '''
+        back_edges = {}
+
+        for index in sorted(self.reachable):
+            op, operand = self.instructions[index]
+
+            if op in JUMP_OPCODES and operand <= index:
+                back_edges[operand] = index
+
+        return back_edges
+
+    def source(self) -> str:
+        ''' Generates the function source
+
+        Returns
+        -------
+        str
+            source of a function receiving the Emulator that runs the program
+        '''
+        self.lines = [
+            f'def {FUNCTION_NAME}(emulator):',
+            '    append = emulator.out.append',
+            '    read_int = emulator.read_int',
+            '    read_real = emulator.read_real',
+            '    data = emulator.data_array',
+        ]
+
+        variables = sorted({operand for op, operand in self.instructions if op in VARIABLE_OPCODES})
+        for address in variables:
+            self.lines.append(f'    v{address} = data[{address}]')
+
+        try:
+            body = self.structured()
+        except Unstructured:
+            body = self.dispatch()
+
+        self.lines.extend(body)
+        return '\n'.join(self.lines) + '\n'
+
+    def loop_source(self, header, back_edge) -> str:
+        ''' Generates the source of a function running a single loop. Variables are
+        loaded from and stored back to the Emulator data array.
+
+        Parameters
+        ----------
+        header : int
+            index of the first instruction of the loop
+        back_edge : int
+            index of the jump back to the header
+
+        Raises
+        ------
+        Unstructured
+            if the loop can not be expressed as a Python while loop
+
+        Returns
+        -------
+        str
+            source of a function receiving the Emulator, it returns the index where the
+            execution continues
+        '''
+        region = self.instructions[header:back_edge + 1]
+
+        if any(op == OPCODE['HALT'] or op not in SUPPORTED_OPCODES for op, _ in region):
+            raise Unstructured()
+
+        variables = sorted({operand for op, operand in region if op in VARIABLE_OPCODES})
+        written = sorted({operand for op, operand in region if op in WRITE_OPCODES})
+        lines = [
+            f'def {LOOP_NAME}(emulator):',
+            '    data = emulator.data_array',
+            '    append = emulator.out.append',
+            '    read_int = emulator.read_int',
+            '    read_real = emulator.read_real',
+        ]
+
+        for address in variables:
+            lines.append(f'    v{address} = data[{address}]')
+
+        lines.append(f'    exit = {back_edge + 1}')
+        self.emit_loop(header, back_edge, '    ', lines)
+
+        for address in written:
+            lines.append(f'    data[{address}] = v{address}')
+
+        lines.append('    return exit')
+        return '\n'.join(lines) + '\n'
+
+    def new_temp(self) -> str:
+        ''' Creates a new temporary local name '''
+        self.temps += 1
+        return f't{self.temps}'
+
+    def emit_simple(self, index, stack, lines, indent, pop) -> None:
+        ''' Translates an instruction without control flow
+
+        Parameters
+        ----------
+        index : int
+            instruction index
+        stack : list
+            symbolic stack of (expression, variables read) pairs
+        lines : list
+            lines generated so far
+        indent : str
+            current indentation
+        pop : function
+            gets the top of the symbolic stack
+        '''
+        op, operand = self.instructions[index]
+
+        if op == OPCODE['PUSHI'] or op == OPCODE['PUSH_CONST']:
+            stack.append((repr(operand), frozenset()))
+        elif op == OPCODE['PUSH_CHAR']:
+            stack.append((repr(chr(operand)), frozenset()))
+        elif op == OPCODE['PUSH']:
+            stack.append((f'v{operand}', frozenset([operand])))
+        elif op in BINARY_EXPRESSIONS:
+            b, b_vars = pop()
+            a, a_vars = pop()
+            stack.append((BINARY_EXPRESSIONS[op].format(a=a, b=b), a_vars | b_vars))
+        elif op == OPCODE['CVR']:
+            a, a_vars = pop()
+            stack.append((f'float({a})', a_vars))
+        elif op == OPCODE['XCHG']:
+            b = pop()
+            a = pop()
+            stack.append(b)
+            stack.append(a)
+        elif op in STORE_OPCODES:
+            value, _ = pop()
+            self.spill_readers(operand, stack, lines, indent)
+
+            if op == OPCODE['POP_REAL_LIT']:
+                value = f"float('{{0:.2f}}'.format(bits_to_float({value})))"
+
+            lines.append(f'{indent}v{operand} = {value}')
+        elif op == OPCODE['READ_INT'] or op == OPCODE['READ_REAL']:
+            self.spill_readers(operand, stack, lines, indent)
+            read = 'read_int' if op == OPCODE['READ_INT'] else 'read_real'
+            lines.append(f'{indent}v{operand} = {read}({operand})')
+        elif op in PRINT_OPCODES:
+            lines.append(f'{indent}append(v{operand})')
+        elif op == OPCODE['PRINT_ILIT'] or op == OPCODE['PRINT_STR']:
+            lines.append(f'{indent}append({operand!r})')
+        elif op == OPCODE['NEW_LINE']:
+            lines.append(f"{indent}append('\\n')")
+        elif op == OPCODE['PRINT_STR_LIT']:
+            # the string length is still pushed right before the string
+            pop()
+            lines.append(f'{indent}append({operand!r})')
+        elif op == OPCODE['VLOOP']:
+            # variables are Python locals here, the loop that follows runs as compiled
+            pass
+        else:
+            lines.append(f"{indent}raise LalgError('Operation {op} is not supported')")
+
+    def spill_readers(self, address, stack, lines, indent) -> None:
+        ''' Saves into temporaries the pending expressions that read a variable about
+        to be written, so they keep the old value '''
+        for position, (expression, variables) in enumerate(stack):
+            if address in variables:
+                temp = self.new_temp()
+                lines.append(f'{indent}{temp} = {expression}')
+                stack[position] = (temp, frozenset())
+
+    def structured(self) -> list:
+        ''' Translates the whole program into loops and ifs
+
+        Raises
+        ------
+        Unstructured
+            if the control flow does not fit
+
+        Returns
+        -------
+        list
+            lines of the function body
+        '''
+        lines = []
+        self.emit_range(0, len(self.instructions), '    ', None, None, lines)
+        return lines
+
+    def emit_range(self, lo, hi, indent, loop, follow, lines) -> None:
+        ''' Translates the instructions from lo up to hi
+
+        Parameters
+        ----------
+        lo, hi : int
+            instruction indexes, hi is not included
+        indent : str
+            current indentation
+        loop : tuple or None
+            header, back edge and exit indexes of the innermost loop
+        follow : int or None
+            instruction reached when the range ends
+        lines : list
+            lines generated so far
+        '''
+        stack = []
+        first = len(lines)
+
+        def pop():
+            if not stack:
+                raise Unstructured()
+            return stack.pop()
+
+        index = lo
+        while index < hi:
+            if index not in self.reachable:
+                index += 1
+                continue
+
+            # a loop starts here, unless this range is the loop body itself
+            if index in self.back_edges and not (loop is not None and loop[0] == index and index == lo):
+                end = self.back_edges[index]
+
+                if end >= hi or stack:
+                    raise Unstructured()
+
+                self.emit_loop(index, end, indent, lines)
+                index = end + 1
+                continue
+
+            op, operand = self.instructions[index]
+
+            if loop is not None and index == loop[1]:
+                # back edge of the loop being translated
+                if op == OPCODE['JFALSE']:
+                    condition, _ = pop()
+                    lines.append(f'{indent}if {condition}:')
+                    lines.append(f'{indent}    break')
+
+                if stack:
+                    raise Unstructured()
+
+                index += 1
+            elif op == OPCODE['JMP']:
+                if stack:
+                    raise Unstructured()
+
+                if loop is not None and operand == loop[0]:
+                    lines.append(f'{indent}continue')
+                elif loop is not None and operand == loop[2]:
+                    lines.append(f'{indent}break')
+                elif operand != follow:
+                    raise Unstructured()
+
+                # anything left in the range would only be reachable through a label
+                if any(i in self.reachable for i in range(index + 1, hi)):
+                    raise Unstructured()
+
+                index = hi
+            elif op == OPCODE['JFALSE']:
+                condition, _ = pop()
+
+                if stack:
+                    raise Unstructured()
+
+                index = self.emit_if(index, hi, condition, indent, loop, follow, lines)
+            elif op == OPCODE['HALT']:
+                # whatever is left on the stack is never used
+                stack.clear()
+                lines.append(f'{indent}return')
+                index += 1
+            else:
+                self.emit_simple(index, stack, lines, indent, pop)
+                index += 1
+
+        if stack:
+            raise Unstructured()
+
+        if len(lines) == first:
+            lines.append(f'{indent}pass')
+
+    def emit_if(self, index, hi, condition, indent, loop, follow, lines) -> int:
+        ''' Translates a conditional jump going forward into an if
+
+        Returns
+        -------
+        int
+            index where the translation continues
+        '''
+        target = self.instructions[index][1]
+
+        if loop is not None and target == loop[2]:
+            lines.append(f'{indent}if not {condition}:')
+            lines.append(f'{indent}    break')
+            return index + 1
+
+        if loop is not None and target == loop[0]:
+            lines.append(f'{indent}if not {condition}:')
+            lines.append(f'{indent}    continue')
+            return index + 1
+
+        if target <= index:
+            raise Unstructured()
+
+        if target > hi:
+            if target != follow:
+                raise Unstructured()
+
+            lines.append(f'{indent}if {condition}:')
+            self.emit_range(index + 1, hi, indent + '    ', loop, follow, lines)
+            return hi
+
+        # a forward jump right before the target skips the else part
+        last = target - 1
+        op, end = self.instructions[last]
+        is_else = last > index and last in self.reachable and op == OPCODE['JMP'] and end >= target
+        if is_else and loop is not None and end in (loop[0], loop[2]):
+            is_else = False
+
+        if is_else:
+            if end > hi:
+                if end != follow:
+                    raise Unstructured()
+                end = hi
+
+            lines.append(f'{indent}if {condition}:')
+            self.emit_range(index + 1, last, indent + '    ', loop, end, lines)
+            lines.append(f'{indent}else:')
+            self.emit_range(target, end, indent + '    ', loop, end, lines)
+            return end
+
+        lines.append(f'{indent}if {condition}:')
+        self.emit_range(index + 1, target, indent + '    ', loop, target, lines)
+        return target
+
+    def emit_loop(self, header, back_edge, indent, lines) -> None:
+        ''' Translates the instructions from header to its back edge into a while loop '''
+        body = []
+        inner = indent + '    '
+        self.emit_range(header, back_edge + 1, inner, (header, back_edge, back_edge + 1), header, body)
+
+        # a loop starting with its exit test becomes a while with that condition
+        if len(body) > 2 and body[0].startswith(f'{inner}if not ') and body[1] == f'{inner}    break':
+            condition = body[0][len(f'{inner}if not '):-1]
+            lines.append(f'{indent}while {condition}:')
+            lines.extend(body[2:])
+        else:
+            lines.append(f'{indent}while True:')
+            lines.extend(body)
+
+    def dispatch(self) -> list:
+        ''' Translates every basic block into a branch of a dispatch loop, used when
+        the control flow can not be structured
+
+        Returns
+        -------
+        list
+            lines of the function body
+        '''
+        self.temps = 0
+        leaders = {0}
+
+        for index in self.reachable:
+            op, operand = self.instructions[index]
+
+            if op in JUMP_OPCODES:
+                leaders.add(operand)
+                leaders.add(index + 1)
+            elif not self.successors(index):
+                leaders.add(index + 1)
+
+        leaders = sorted(leader for leader in leaders if leader in self.reachable)
+        lines = ['    stack = []', '    label = 0', '    while True:']
+        keyword = 'if'
+
+        for position, leader in enumerate(leaders):
+            end = leaders[position + 1] if position + 1 < len(leaders) else len(self.instructions)
+            lines.append(f'        {keyword} label == {leader}:')
+            self.emit_block(leader, end, '            ', lines)
+            keyword = 'elif'
+
+        return lines
+
+    def emit_block(self, lo, hi, indent, lines) -> None:
+        ''' Translates one basic block of the dispatch loop '''
+        stack = []
+
+        def pop():
+            if stack:
+                return stack.pop()
+
+            # values left on the real stack by the previous block
+            temp = self.new_temp()
+            lines.append(f'{indent}{temp} = stack.pop()')
+            return (temp, frozenset())
+
+        def spill():
+            for expression, _ in stack:
+                lines.append(f'{indent}stack.append({expression})')
+            stack.clear()
+
+        for index in range(lo, hi):
+            op, operand = self.instructions[index]
+
+            if op == OPCODE['JMP']:
+                spill()
+                lines.append(f'{indent}label = {operand}')
+                return
+            elif op == OPCODE['JFALSE']:
+                condition, _ = pop()
+                spill()
+                lines.append(f'{indent}label = {index + 1} if {condition} else {operand}')
+                return
+            elif op == OPCODE['HALT']:
+                lines.append(f'{indent}return')
+                return
+            else:
+                self.emit_simple(index, stack, lines, indent, pop)
+
+                if op not in SUPPORTED_OPCODES:
+                    return
+
+        spill()
+        lines.append(f'{indent}label = {hi}')
+
+def cached_code(key, source, name) -> object:
+    ''' Gets a compiled code object from CODE_CACHE, compiling it on a miss
+
+    Parameters
+    ----------
+    key : tuple
+        what the code was generated from
+    source : function
+        generates the Python source, only called on a miss
+    name : str
+        name of the function defined by the source
+
+    Returns
+    -------
+    code
+        code object defining the function
+    '''
+    code = CODE_CACHE.get(key)
+
+    if code is None:
+        code = compile(source(), f'<{name}>', 'exec')
+        CODE_CACHE[key] = code
+
+        if len(CODE_CACHE) > CODE_CACHE_SIZE:
+            CODE_CACHE.popitem(last=False)
+    else:
+        CODE_CACHE.move_to_end(key)
+
+    return code
+
+def compile_function(instructions) -> object:
+    ''' Transpiles decoded instructions into a Python function, the code object is
+    cached so the same program is only compiled once
+
+    Parameters
+    ----------
+    instructions : list
+        (op code, operand) pairs generated by decoder.decode
+
+    Returns
+    -------
+    function
+        function receiving the Emulator that runs the program
+    '''
+    code = cached_code(tuple(instructions), lambda: Transpiler(instructions).source(), FUNCTION_NAME)
+    namespace = {'bits_to_float': bits_to_float, 'LalgError': LalgError}
+    exec(code, namespace)
+    return namespace[FUNCTION_NAME]
+
+def compile_loop(instructions, header, back_edge) -> object:
+    ''' Transpiles one loop of the decoded instructions into a Python function, the
+    code object is cached so each loop is only compiled once
+
+    Parameters
+    ----------
+    instructions : list
+        (op code, operand) pairs generated by decoder.decode
+    header : int
+        index of the first instruction of the loop
+    back_edge : int
+        index of the jump back to the header
+
+    Raises
+    ------
+    Unstructured
+        if the loop can not be expressed as a Python while loop
+
+    Returns
+    -------
+    function
+        function receiving the Emulator that runs the loop, see Transpiler.loop_source
+    '''
+    code = cached_code((tuple(instructions), header, back_edge),
+                       lambda: Transpiler(instructions).loop_source(header, back_edge), LOOP_NAME)
+    namespace = {'bits_to_float': bits_to_float, 'LalgError': LalgError}
+    exec(code, namespace)
+    return namespace[LOOP_NAME]
+
+class PythonEmulator(Emulator):
+    ''' Python Emulator Class - runs the program transpiled into a Python function '''
+    SUPPORTS_LIMITS = False
+    SUPPORTS_CHECKPOINTS = False
+
+    def load(self, instructions) -> list:
+        ''' Transpiles the decoded instructions '''
+        self.function = compile_function(instructions)
+        return instructions
+
+    def start(self) -> None:
+        ''' Runs the transpiled function until HALT '''
+        try:
+            self.function(self)
+        except OverflowError:
+            # only integer arrays are bounded, Python ints never overflow
+            raise LalgError('Integer overflow')
+
+        self.flush()
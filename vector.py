@@ -0,0 +1,549 @@
+import operator
+
+from constants import *
+from decoder import stack_depths
+from emulator import Emulator
+from output import MemorySink
+from vectorize import INTEGER_LIMIT
+from loader.lalg_error import LalgError, LanesFailed
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# binary op codes, called with the second and the top values of the stack, in the
+# same order the Emulator handlers use them
+BINARY_FUNCTIONS = {
+    OPCODE['ADD']: operator.add,
+    OPCODE['SUB']: operator.sub,
+    OPCODE['MULTIPLY']: operator.mul,
+    OPCODE['DIVIDE']: operator.truediv,
+    OPCODE['DIV']: operator.truediv,
+    OPCODE['FADD']: operator.add,
+    OPCODE['FSUB']: operator.sub,
+    OPCODE['FMULTIPLY']: operator.mul,
+    OPCODE['EQL']: operator.eq,
+    OPCODE['NEQ']: operator.ne,
+    OPCODE['GTE']: operator.ge,
+    OPCODE['GTR']: operator.lt,
+    OPCODE['LTE']: operator.le,
+    OPCODE['LES']: operator.gt,
+}
+
+DIVISION_OPCODES = {OPCODE['DIVIDE'], OPCODE['DIV']}
+
+# op codes giving an integer when both values are, int64 arrays would wrap past 64 bits
+ARITHMETIC_OPCODES = {OPCODE['ADD'], OPCODE['SUB'], OPCODE['MULTIPLY'], OPCODE['FADD'], OPCODE['FSUB'],
+    OPCODE['FMULTIPLY']}
+
+# array dtypes for values of one kind, see value_kind
+KIND_DTYPES = {'b': 'bool', 'i': 'int64', 'f': 'float64'}
+
+def value_kind(value) -> str:
+    ''' Gets the kind of a lane value or array, as in numpy.dtype.kind
+
+    Returns
+    -------
+    str
+        'b' for bools, 'i' for integers, 'f' for reals and 'O' for anything else
+    '''
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind
+
+    if isinstance(value, (bool, np.bool_)):
+        return 'b'
+    if isinstance(value, (int, np.integer)):
+        return 'i'
+    if isinstance(value, (float, np.floating)):
+        return 'f'
+
+    return 'O'
+
+def python_value(value) -> object:
+    ''' Converts a NumPy scalar into the Python value the Emulator would hold '''
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+class Scalarize(Exception):
+    ''' Raised by an instruction the lanes can not run together, every lane then
+    continues in its own Emulator '''
+    pass
+
+class VectorEmulator(object):
+    ''' Vector Emulator Class - runs one program over many inputs at once. Every
+    variable and stack entry holds one value per lane, a NumPy array, or a single
+    value while it is the same for all lanes. Instructions run once for all lanes
+    at the same instruction.
+
+    While the lanes diverge at a JFALSE, the lanes with the lowest ip run and the
+    others wait, masked out, until they meet again. If too few lanes are active
+    for too long, or an instruction has no vector version, every lane finishes in
+    its own Emulator. Integers are int64 arrays while they fit well inside 64
+    bits, and arrays of Python ints once they grow past INTEGER_LIMIT, so they
+    never wrap. A lane dividing by zero stops the lanes running together, the
+    others finish in their own Emulator and the failure is reported once they do.
+    '''
+    # steps between divergence checks, lanes run alone once fewer than
+    # MIN_ACTIVE_LANES plus MIN_ACTIVE of all lanes are active on average
+    DIVERGENCE_WINDOW = 256
+    MIN_ACTIVE_LANES = 32
+    MIN_ACTIVE = 0.02
+
+    def __init__(self, program, inputs, outs=None) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        program : Program
+            compiled program
+        inputs : list
+            one input provider per lane
+        outs : list or None
+            one sink per lane, a MemorySink for each lane if None
+
+        Raises
+        ------
+        LalgError
+            if NumPy is not installed
+        '''
+        if np is None:
+            raise LalgError('VectorEmulator needs numpy')
+
+        self.program = program
+        self.lanes = len(inputs)
+        self.inputs = list(inputs)
+        self.outs = [MemorySink() for _ in inputs] if outs is None else list(outs)
+
+        self.ip = 0
+        self.pc = None
+        self.converged = True
+        self.jumped = False
+        self.live = np.ones(self.lanes, dtype=bool)
+        self.remaining = self.lanes
+        self.steps = 0
+        self.scalar_lanes = 0
+        self.errors = {}
+
+        self.stack = [0] * program.stack_size
+        self.data = [0 if value is None else value for value in program.data_segment]
+        self.depths = stack_depths(program.instructions)
+        self.operations = self.build_operations()
+        self.code = self.load(program.instructions)
+
+    def build_operations(self) -> list:
+        ''' Builds the handler table, indexed by operation code
+
+        Returns
+        -------
+        list
+            handler for each possible operation code, None if there is no vector version
+        '''
+        handlers = {
+            OPCODE['CVR']: self.cvr,
+            OPCODE['HALT']: self.halt,
+            OPCODE['JFALSE']: self.jfalse,
+            OPCODE['JMP']: self.jmp,
+            OPCODE['NEW_LINE']: self.print_new_line,
+            OPCODE['POP']: self.pop,
+            OPCODE['PRINT_I']: self.print_i,
+            OPCODE['PRINT_ILIT']: self.print_lit,
+            OPCODE['PRINT_R']: self.print_i,
+            OPCODE['PRINT_STR']: self.print_lit,
+            OPCODE['PUSH']: self.push,
+            OPCODE['PUSHI']: self.pushi,
+            OPCODE['PUSH_CONST']: self.pushi,
+            OPCODE['XCHG']: self.xchg,
+            OPCODE['READ_INT']: self.read_int,
+            OPCODE['READ_REAL']: self.read_real,
+            OPCODE['VLOOP']: self.vloop,
+        }
+
+        for op, function in BINARY_FUNCTIONS.items():
+            handlers[op] = self.binary(function, op in DIVISION_OPCODES, op in ARITHMETIC_OPCODES)
+
+        operations = [None] * 256
+        for op, handler in handlers.items():
+            operations[op] = handler
+
+        return operations
+
+    def load(self, instructions) -> list:
+        ''' Binds each decoded instruction to its handler and stack depth
+
+        Parameters
+        ----------
+        instructions : tuple
+            (op code, operand) pairs generated by decoder.decode
+
+        Returns
+        -------
+        list
+            (handler, operand, depth) tuples, executed by start
+        '''
+        code = []
+
+        for (op, operand), depth in zip(instructions, self.depths):
+            handler = self.operations[op]
+
+            if handler is None:
+                code.append((self.scalarize_here, op, depth))
+            else:
+                code.append((handler, operand, depth))
+
+        return code
+
+    def start(self) -> None:
+        ''' Runs every lane until HALT
+
+        Raises
+        ------
+        LalgError
+            if an integer overflows
+        LanesFailed
+            if some lanes fail, after the other lanes finished
+        '''
+        try:
+            # masked out lanes compute values that are thrown away, e.g. 1 / 0
+            with np.errstate(all='ignore'):
+                while self.remaining:
+                    if self.converged:
+                        self.run_converged()
+                    else:
+                        self.run_diverged()
+        except Scalarize:
+            self.scalarize()
+        except OverflowError:
+            raise LalgError('Integer overflow')
+
+        if self.errors:
+            raise LanesFailed(self.errors, self.outs)
+
+    def run_converged(self) -> None:
+        ''' Runs instructions while every live lane is at the same one '''
+        code = self.code
+        mask = None if self.remaining == self.lanes else self.live.copy()
+
+        while self.converged:
+            handler, operand, depth = code[self.ip]
+            self.ip += 1
+            self.steps += 1
+            handler(operand, depth, mask)
+
+    def run_diverged(self) -> None:
+        ''' Runs the lanes with the lowest ip until every live lane meets again '''
+        code = self.code
+        pc = self.pc
+        steps = 0
+        active_lanes = 0
+        min_active = self.DIVERGENCE_WINDOW * (self.MIN_ACTIVE_LANES + self.MIN_ACTIVE * self.lanes)
+
+        while self.remaining:
+            # lanes that halted wait past the last instruction
+            ip = int(pc.min())
+            mask = pc == ip
+            active = int(np.count_nonzero(mask))
+            total = self.remaining
+
+            if active == total:
+                self.ip = ip
+                self.converged = True
+                return
+
+            steps += 1
+            active_lanes += active
+            if steps == self.DIVERGENCE_WINDOW:
+                if active_lanes < min_active:
+                    raise Scalarize()
+                steps = 0
+                active_lanes = 0
+
+            handler, operand, depth = code[ip]
+            self.ip = ip + 1
+            self.jumped = False
+            self.steps += 1
+            handler(operand, depth, mask)
+
+            if not self.jumped:
+                pc[mask] = self.ip
+
+    def write(self, old, value, mask) -> object:
+        ''' Merges a new value into the active lanes
+
+        Parameters
+        ----------
+        old : array or scalar
+            value kept by the lanes that are masked out
+        value : array or scalar
+            value given to the active lanes
+        mask : array or None
+            active lanes, None if every lane is
+
+        Returns
+        -------
+        array or scalar
+            merged value
+        '''
+        if mask is None:
+            if isinstance(value, np.ndarray) and value.dtype == object:
+                return self.narrow(value)
+            return value
+
+        # lanes at different instructions may hold different types in the same slot,
+        # then every lane keeps its own Python value. Bools are only tested by
+        # JFALSE, they can be merged with integers.
+        kinds = {value_kind(old), value_kind(value)}
+        if len(kinds) > 1 and not kinds <= {'b', 'i'}:
+            return np.where(mask, self.boxed(value), self.boxed(old))
+
+        return np.where(mask, value, old)
+
+    def boxed(self, value) -> object:
+        ''' Converts a value into an array of Python values, one per lane '''
+        if isinstance(value, np.ndarray):
+            if value.dtype == object:
+                return value
+            value = value.tolist()
+
+        array = np.empty(self.lanes, dtype=object)
+        array[:] = value
+        return array
+
+    def narrow(self, values) -> object:
+        ''' Converts an array of Python values back into a typed array once all of
+        them have the same kind '''
+        items = [python_value(item) for item in values.tolist()]
+        kinds = set(map(value_kind, items))
+
+        if len(kinds) == 1 and kinds <= KIND_DTYPES.keys():
+            try:
+                return np.array(items, dtype=KIND_DTYPES[kinds.pop()])
+            except OverflowError:
+                pass
+
+        return values
+
+    def active_lanes(self, mask) -> list:
+        ''' Gets the indexes of the active lanes '''
+        return np.flatnonzero(self.live if mask is None else mask).tolist()
+
+    def lane_value(self, value, lane) -> object:
+        ''' Gets the Python value one lane holds '''
+        if isinstance(value, np.ndarray):
+            return python_value(value[lane])
+
+        return value
+
+    def binary(self, function, division, arithmetic) -> object:
+        ''' Creates the handler of an op code combining the two top values of the stack
+
+        Parameters
+        ----------
+        function : function
+            called with the second and the top values
+        division : bool
+            if a zero top value fails, as it does in the Emulator
+        arithmetic : bool
+            if integer values give an integer, which must not wrap
+
+        Returns
+        -------
+        function
+            handler
+        '''
+        stack = self.stack
+
+        def handler(_, depth, mask):
+            second = stack[depth - 2]
+            top = stack[depth - 1]
+
+            kinds = {value_kind(second), value_kind(top)}
+
+            # Python values are combined as the Emulator would
+            if 'O' in kinds:
+                second = self.boxed(second)
+                top = self.boxed(top)
+            elif arithmetic and kinds <= {'b', 'i'} and self.near_limit(function, second, top, mask):
+                second = self.boxed(second)
+                top = self.boxed(top)
+
+            # every lane runs the division again in its own Emulator, only the lanes
+            # dividing by zero fail
+            if division:
+                zero = top == 0
+                if mask is not None and isinstance(zero, np.ndarray):
+                    zero = zero & mask
+                if np.any(zero):
+                    self.ip -= 1
+                    raise Scalarize()
+
+            stack[depth - 2] = self.write(second, function(second, top), mask)
+
+        return handler
+
+    def near_limit(self, function, second, top, mask) -> bool:
+        ''' Checks if an integer operation on arrays could leave INTEGER_LIMIT in an
+        active lane, it is estimated with reals, which do not wrap '''
+        if not isinstance(second, np.ndarray) and not isinstance(top, np.ndarray):
+            return False
+
+        estimate = function(np.asarray(second, dtype=float), np.asarray(top, dtype=float))
+        if mask is not None:
+            estimate = np.where(mask, estimate, 0.0)
+
+        return bool(np.any(np.abs(estimate) >= INTEGER_LIMIT))
+
+    def scalarize_here(self, op, depth, mask) -> None:
+        ''' Handler for op codes without a vector version, the lanes continue from it
+        in their own Emulator '''
+        self.ip -= 1
+        raise Scalarize()
+
+    def scalarize(self) -> None:
+        ''' Runs every live lane to the end in its own Emulator, a lane that fails is
+        recorded in errors and the others still run '''
+        for lane in np.flatnonzero(self.live).tolist():
+            ip = self.ip if self.converged else int(self.pc[lane])
+            emulator = Emulator(self.program, self.outs[lane], self.inputs[lane])
+            depth = self.depths[ip]
+
+            emulator.ip = ip
+            emulator.stack[:depth] = [self.lane_value(value, lane) for value in self.stack[:depth]]
+            emulator.sp = depth
+            emulator.data_array = [self.lane_value(value, lane) for value in self.data]
+
+            try:
+                emulator.start()
+            except Exception as error:
+                self.errors[lane] = error
+
+            self.scalar_lanes += 1
+
+        self.live[:] = False
+        self.remaining = 0
+
+    def pushi(self, value, depth, mask) -> None:
+        ''' Pushes a literal to the stack '''
+        self.stack[depth] = self.write(self.stack[depth], value, mask)
+
+    def push(self, address, depth, mask) -> None:
+        ''' Pushes a variable to the stack '''
+        self.stack[depth] = self.write(self.stack[depth], self.data[address], mask)
+
+    def pop(self, address, depth, mask) -> None:
+        ''' Pops the top of the stack into a variable '''
+        self.data[address] = self.write(self.data[address], self.stack[depth - 1], mask)
+
+    def xchg(self, _, depth, mask) -> None:
+        ''' Swaps two top values from stack '''
+        stack = self.stack
+        second, top = stack[depth - 2], stack[depth - 1]
+        stack[depth - 2] = self.write(second, top, mask)
+        stack[depth - 1] = self.write(top, second, mask)
+
+    def cvr(self, _, depth, mask) -> None:
+        ''' Converts top value to float '''
+        top = self.stack[depth - 1]
+        value = top.astype(float) if isinstance(top, np.ndarray) else float(top)
+        self.stack[depth - 1] = self.write(top, value, mask)
+
+    def jmp(self, target, depth, mask) -> None:
+        ''' Jumps to position '''
+        self.ip = target
+
+    def vloop(self, loop, depth, mask) -> None:
+        ''' Goes on into the compiled loop, the lanes already run it as arrays '''
+        pass
+
+    def jfalse(self, target, depth, mask) -> None:
+        ''' Jumps if false, the lanes split when they do not agree '''
+        condition = self.stack[depth - 1]
+
+        if not isinstance(condition, np.ndarray):
+            if not condition:
+                self.ip = target
+            return
+
+        active = self.live if mask is None else mask
+        taken = active & ~condition.astype(bool)
+
+        if not taken.any():
+            return
+
+        if np.array_equal(taken, active):
+            self.ip = target
+            return
+
+        if self.converged:
+            self.pc = np.full(self.lanes, self.ip)
+            self.pc[~self.live] = len(self.code)
+            self.converged = False
+
+        self.pc[active] = self.ip
+        self.pc[taken] = target
+        self.jumped = True
+
+    def halt(self, _, depth, mask) -> None:
+        ''' Finishes the active lanes '''
+        for lane in self.active_lanes(mask):
+            self.outs[lane].flush()
+
+        if mask is None:
+            self.live[:] = False
+            self.remaining = 0
+        else:
+            self.live &= ~mask
+            self.remaining = int(np.count_nonzero(self.live))
+
+            if not self.converged:
+                self.pc[mask] = len(self.code)
+
+        self.converged = False
+        self.jumped = True
+
+    def print_i(self, address, depth, mask) -> None:
+        ''' Adds a variable to the output of the active lanes '''
+        value = self.data[address]
+        values = value.tolist() if isinstance(value, np.ndarray) else None
+
+        for lane in self.active_lanes(mask):
+            self.outs[lane].append(value if values is None else python_value(values[lane]))
+
+    def print_lit(self, value, depth, mask) -> None:
+        ''' Adds a literal to the output of the active lanes '''
+        for lane in self.active_lanes(mask):
+            self.outs[lane].append(value)
+
+    def print_new_line(self, _, depth, mask) -> None:
+        ''' Adds \\n to the output of the active lanes '''
+        self.print_lit('\n', depth, mask)
+
+    def read(self, address, mask, convert) -> None:
+        ''' Reads one value per active lane into a variable
+
+        Raises
+        ------
+        LalgError
+            if a value is not valid
+            if a lane has no more input
+        '''
+        lanes = self.active_lanes(mask)
+
+        try:
+            values = [convert(self.inputs[lane].read()) for lane in lanes]
+        except ValueError:
+            raise LalgError("Value entered is not valid")
+
+        column = np.zeros(self.lanes, dtype=np.asarray(values).dtype)
+        column[lanes] = values
+        self.data[address] = self.write(self.data[address], column, mask)
+
+    def read_int(self, address, depth, mask) -> None:
+        ''' Reads an integer per active lane '''
+        self.read(address, mask, int)
+
+    def read_real(self, address, depth, mask) -> None:
+        ''' Reads a real per active lane '''
+        self.read(address, mask, float)
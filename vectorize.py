@@ -0,0 +1,280 @@
+import operator
+
+from helper import *
+from constants import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# op codes a vectorized loop body may use, besides POP
+EXPRESSION_OPCODES = {
+    OPCODE['PUSH'], OPCODE['PUSHI'], OPCODE['PUSH_CONST'], OPCODE['ADD'], OPCODE['SUB'],
+    OPCODE['MULTIPLY'], OPCODE['DIVIDE'], OPCODE['DIV'], OPCODE['FADD'], OPCODE['FSUB'],
+    OPCODE['FMULTIPLY'],
+}
+
+# called with the second and the top values of the stack, as in the Emulator
+FUNCTIONS = {
+    OPCODE['ADD']: operator.add,
+    OPCODE['SUB']: operator.sub,
+    OPCODE['MULTIPLY']: operator.mul,
+    OPCODE['DIVIDE']: operator.truediv,
+    OPCODE['DIV']: operator.truediv,
+    OPCODE['FADD']: operator.add,
+    OPCODE['FSUB']: operator.sub,
+    OPCODE['FMULTIPLY']: operator.mul,
+}
+
+DIVISION_OPCODES = {OPCODE['DIVIDE'], OPCODE['DIV']}
+ADD_OPCODES = {OPCODE['ADD'], OPCODE['FADD']}
+SUB_OPCODES = {OPCODE['SUB'], OPCODE['FSUB']}
+
+# integers must stay well inside 64 bits, or the loop runs one iteration at a time
+INTEGER_LIMIT = 2 ** 62
+
+class Unvectorizable(Exception):
+    ''' Raised when a loop can not be computed at once this time, it then runs as
+    compiled '''
+    pass
+
+class CountedLoop(object):
+    ''' Counted Loop Class - a for loop whose body only sums or sets variables from
+    the counter, constants and variables the loop does not change. VLOOP computes
+    it with NumPy over every value of the counter at once. '''
+    # fewer iterations are not worth building arrays for
+    MIN_ITERATIONS = 64
+
+    def __init__(self, counter, bound, exit, statements) -> None:
+        ''' Initializes artibutes
+
+        Parameters
+        ----------
+        counter : int
+            address of the loop variable
+        bound : int
+            last value of the loop variable
+        exit : int
+            byte address, or instruction index once decoded, right after the loop
+        statements : tuple
+            (kind, address, expression) triples, kind is 'sum', 'difference' or
+            'set' and expression a tuple of (op code, operand) pairs
+        '''
+        self.counter = counter
+        self.bound = bound
+        self.exit = exit
+        self.statements = statements
+
+    def relocated(self, exit) -> object:
+        ''' Creates the same loop with another exit '''
+        return CountedLoop(self.counter, self.bound, exit, self.statements)
+
+    def __repr__(self) -> str:
+        ''' Creates a string representation of the class '''
+        kinds = ', '.join(f'{kind} v{address}' for kind, address, _ in self.statements)
+        return f'<counted loop v{self.counter} to {self.bound}: {kinds}>'
+
+    def run(self, data) -> bool:
+        ''' Computes the whole loop, leaving the variables as the loop would
+
+        Parameters
+        ----------
+        data : list or array
+            data segment, with the loop variable at its first value
+
+        Returns
+        -------
+        bool
+            False if the loop must run as compiled instead
+        '''
+        if np is None:
+            return False
+
+        first = data[self.counter]
+        if self.bound - first + 1 < self.MIN_ITERATIONS:
+            return False
+
+        counter = np.arange(first, self.bound + 1, dtype=np.int64)
+        results = []
+
+        try:
+            with np.errstate(all='ignore'):
+                for kind, address, expression in self.statements:
+                    results.append((address, self.compute(kind, data[address], expression, counter, data)))
+        except (Unvectorizable, OverflowError):
+            return False
+
+        # nothing is written unless every statement could be computed
+        for address, value in results:
+            data[address] = value
+
+        data[self.counter] = self.bound + 1
+        return True
+
+    def compute(self, kind, value, expression, counter, data) -> object:
+        ''' Computes the value a variable has after the loop
+
+        Raises
+        ------
+        Unvectorizable
+            if the result may differ from running the loop
+
+        Returns
+        -------
+        int or float
+            final value
+        '''
+        values = self.evaluate(expression, counter, data)
+        values = np.broadcast_to(values, counter.shape)
+
+        if kind == 'set':
+            return values[-1].item()
+
+        if isinstance(value, int) and values.dtype.kind == 'i':
+            # integer sums do not depend on the order, but must not overflow
+            if abs(value) + np.abs(values.astype(float)).sum() >= INTEGER_LIMIT:
+                raise Unvectorizable()
+
+            total = int(values.sum())
+            return value + total if kind == 'sum' else value - total
+
+        # reals are accumulated one by one, rounding as the loop would
+        function = np.add if kind == 'sum' else np.subtract
+        return function.accumulate(np.concatenate(([value], values)))[-1].item()
+
+    def evaluate(self, expression, counter, data) -> object:
+        ''' Evaluates an expression for every value of the counter
+
+        Raises
+        ------
+        Unvectorizable
+            if a division by zero or an integer overflow may happen
+
+        Returns
+        -------
+        array or scalar
+            one value per iteration, or one for all of them
+        '''
+        stack = []
+
+        for op, operand in expression:
+            if op == OPCODE['PUSH']:
+                stack.append(counter if operand == self.counter else data[operand])
+            elif op == OPCODE['PUSHI'] or op == OPCODE['PUSH_CONST']:
+                stack.append(operand)
+            else:
+                top = stack.pop()
+                second = stack.pop()
+
+                # the loop raises at the failing iteration, after its earlier ones
+                if op in DIVISION_OPCODES and np.any(top == 0):
+                    raise Unvectorizable()
+
+                value = FUNCTIONS[op](second, top)
+                if np.asarray(value).dtype.kind == 'i' and np.any(np.abs(np.asarray(value, dtype=float)) >= INTEGER_LIMIT):
+                    raise Unvectorizable()
+
+                stack.append(value)
+
+        return stack.pop()
+
+def scan(byte_array, constants) -> list:
+    ''' Decodes a loop body, it has no jumps
+
+    Returns
+    -------
+    list or None
+        (op code, operand) pairs, None if an op code can not be vectorized
+    '''
+    instructions = []
+    ip = 0
+
+    while ip < len(byte_array):
+        op = byte_array[ip]
+        ip += 1
+        operand = None
+
+        if op not in EXPRESSION_OPCODES and op != OPCODE['POP']:
+            return None
+
+        if op in IMMEDIATE_OPCODES:
+            operand = byte_unpacker(byte_array[ip:ip + 4])
+            ip += 4
+
+            if op == OPCODE['PUSH_CONST']:
+                operand = constants[operand]
+
+        instructions.append((op, operand))
+
+    return instructions
+
+def is_expression(instructions) -> bool:
+    ''' Checks if instructions compute exactly one value '''
+    depth = 0
+
+    for op, _ in instructions:
+        pops, pushes = STACK_EFFECTS[op]
+        if depth < pops:
+            return False
+        depth += pushes - pops
+
+    return depth == 1
+
+def analyze(byte_array, constants, counter) -> tuple:
+    ''' Finds the statements of a for loop body that can be vectorized
+
+    Parameters
+    ----------
+    byte_array : bytes
+        loop body generated by the Parser, without the counter increment
+    constants : list
+        real constant pool
+    counter : int
+        address of the loop variable
+
+    Returns
+    -------
+    tuple or None
+        (kind, address, expression) triples, None if the body can not be vectorized
+    '''
+    instructions = scan(byte_array, constants)
+    if not instructions:
+        return None
+
+    # splits the body into assignments, each one ends with its POP
+    assignments = []
+    start = 0
+    for index, (op, operand) in enumerate(instructions):
+        if op == OPCODE['POP']:
+            assignments.append((operand, instructions[start:index]))
+            start = index + 1
+
+    if start != len(instructions):
+        return None
+
+    written = {address for address, _ in assignments}
+    if counter in written or len(written) != len(assignments):
+        return None
+
+    statements = []
+    for address, expression in assignments:
+        kind = 'set'
+
+        # v := v + e and v := v - e accumulate, e must not read v
+        first, last = expression[0], expression[-1]
+        if first == (OPCODE['PUSH'], address) and (last[0] in ADD_OPCODES or last[0] in SUB_OPCODES):
+            if is_expression(expression[1:-1]):
+                kind = 'sum' if last[0] in ADD_OPCODES else 'difference'
+                expression = expression[1:-1]
+
+        if not is_expression(expression):
+            return None
+
+        # iterations are independent only if no expression reads a written variable
+        if any(op == OPCODE['PUSH'] and operand in written for op, operand in expression):
+            return None
+
+        statements.append((kind, address, tuple(expression)))
+
+    return tuple(statements)
@@ -0,0 +1,104 @@
+from constants import *
+from decoder import stack_depths
+from loader.lalg_error import LalgError, VerificationError
+
+# op codes reading or writing a variable whose address is only known while running
+INDIRECT_OPCODES = {OPCODE['DUMP'], OPCODE['RETRIEVE'], OPCODE['RET_AND_PRINT']}
+
+# op codes a verified program may use
+VERIFIABLE_OPCODES = set(STACK_EFFECTS) - INDIRECT_OPCODES
+
+def loop_addresses(loop) -> list:
+    ''' Lists every variable a counted loop reads or writes '''
+    addresses = [loop.counter]
+
+    for _, address, expression in loop.statements:
+        addresses.append(address)
+        addresses.extend(operand for op, operand in expression if op == OPCODE['PUSH'])
+
+    return addresses
+
+def verify(instructions, data_size, opcodes=VERIFIABLE_OPCODES) -> list:
+    ''' Proves that decoded instructions can run without any check while running.
+
+    Every op code must be one the engine implements, every jump must land on an
+    instruction, every variable address must be inside the data segment, every
+    frame slot inside the frame of its procedure, and the stack must never
+    underflow and have the same depth on every path into an instruction. The last
+    instruction must not fall through past the end.
+
+    Parameters
+    ----------
+    instructions : list
+        (op code, operand) pairs generated by decoder.decode
+    data_size : int
+        number of slots in the data segment
+    opcodes : set
+        op codes the engine running the instructions implements
+
+    Raises
+    ------
+    VerificationError
+        if any of the checks fails
+
+    Returns
+    -------
+    list
+        stack depth before each instruction, None for instructions never reached
+    '''
+    if not instructions:
+        raise VerificationError('Program has no instructions')
+
+    size = len(instructions)
+
+    for index, (op, operand) in enumerate(instructions):
+        if op not in opcodes or op not in VERIFIABLE_OPCODES:
+            raise VerificationError(f'Operation {op} at instruction {index} can not be verified')
+
+        if op in JUMP_OPCODES and not 0 <= operand < size:
+            raise VerificationError(f'Jump target {operand} at instruction {index} is not an instruction')
+
+        if op in ADDRESS_OPCODES and not 0 <= operand < data_size:
+            raise VerificationError(f'Address {operand} at instruction {index} is outside the data segment')
+
+        if op == OPCODE['VLOOP']:
+            if not 0 <= operand.exit < size:
+                raise VerificationError(f'Loop exit {operand.exit} at instruction {index} is not an instruction')
+
+            if any(not 0 <= address < data_size for address in loop_addresses(operand)):
+                raise VerificationError(f'Loop at instruction {index} is outside the data segment')
+
+        if op == OPCODE['CALL']:
+            if not 0 <= operand.entry < operand.end <= size:
+                raise VerificationError(f'Procedure {operand.name} at instruction {index} is not made of instructions')
+
+            if instructions[operand.end - 1][0] != OPCODE['RET']:
+                raise VerificationError(f'Procedure {operand.name} does not end with RET')
+
+    if instructions[-1][0] not in (OPCODE['HALT'], OPCODE['JMP']):
+        raise VerificationError('Last instruction falls through past the end')
+
+    try:
+        depths = stack_depths(instructions)
+    except LalgError as error:
+        raise VerificationError(str(error))
+
+    # frame slots are checked against the procedure whose body holds them
+    owners = {}
+    for op, operand in instructions:
+        if op == OPCODE['CALL']:
+            for index in range(operand.entry, operand.end):
+                owners[index] = operand
+
+    local_opcodes = set(FRAME_OPCODES.values())
+    for index, (op, operand) in enumerate(instructions):
+        if depths[index] is None:
+            continue
+
+        if op in local_opcodes and (index not in owners or not 0 <= operand < owners[index].size):
+            raise VerificationError(f'Slot {operand} at instruction {index} is outside the frame')
+
+        if op == OPCODE['RET'] and index not in owners:
+            raise VerificationError(f'Return at instruction {index} is outside a procedure')
+
+    return depths